@@ -1,29 +1,76 @@
 from fastapi import FastAPI, Depends, HTTPException, Form, Request, Response, File, UploadFile
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, ForeignKey, Table
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, Column, String, Integer, DateTime, ForeignKey, Table, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, ImageChops
 import secrets
 import os
+import sys
 import shutil
 import subprocess
+import hashlib
+import tempfile
+import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import uuid
+import json
+import re
+import struct
+import numpy as np
 import geopandas as gpd
 import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 
+# Extent strings are parsed the same way here and in the pipeline (scripts/extent_format.py)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "scripts"))
+from extent_format import parse_bounding_box, parse_origin
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./users.db")
 SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+RASTER_RESOLUTION = float(os.getenv("RASTER_RESOLUTION", "1.0"))  # Project pixel size in meters
+COMPOSITE_TILE_SIZE = int(os.getenv("COMPOSITE_TILE_SIZE", "256"))  # Composite tile edge in pixels
+RASTER_FORMAT = os.getenv("RASTER_FORMAT", "png")  # Rasterized GeoPackage output, see RASTER_FORMATS
+
+PIPELINE_SCRIPT = Path(os.getenv("PIPELINE_SCRIPT", "../scripts/pipeline.py"))  # Mesh + tile pipeline
+PIPELINE_PYTHON = os.getenv("PIPELINE_PYTHON", sys.executable)  # Interpreter with dtcc/trimesh installed
+BUILD_WORKERS = int(os.getenv("BUILD_WORKERS", "1"))  # Tile builds run at once
+BUILD_TILE_SIZE = 0.20  # Default printed tile edge in meters, as in the scripts
+MESH_LOD_CHUNK_TRIANGLES = int(os.getenv("MESH_LOD_CHUNK_TRIANGLES", "200000"))  # Max triangles per viewer chunk
+HEIGHTMAP_FORMAT = os.getenv("HEIGHTMAP_FORMAT", "png")  # 16-bit mesh heightmaps: "png" or "geotiff"
+HEIGHTMAP_BATCH = 4_000_000  # Candidate pixels rasterized per batch
+BLOB_DIR = "static/assets/blobs"  # Uploads stored once per content, by sha256
+ASSET_GC_INTERVAL = int(os.getenv("ASSET_GC_INTERVAL", "3600"))  # Seconds between orphaned-asset sweeps (0 = off)
+ASSET_GC_GRACE = int(os.getenv("ASSET_GC_GRACE", "3600"))  # Unreferenced files younger than this are kept
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # Where assets live: "local" or "s3"
+S3_BUCKET = os.getenv("S3_BUCKET", "dtcc-table")
+S3_PREFIX = os.getenv("S3_PREFIX", "")  # Prepended to asset keys in the bucket
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # For S3-compatible stores such as MinIO
+S3_REGION = os.getenv("S3_REGION")
+S3_PART_SIZE = int(os.getenv("S3_PART_SIZE", str(16 * 1024 * 1024)))  # Multipart upload part size in bytes
+ASSET_URL_TTL = int(os.getenv("ASSET_URL_TTL", "3600"))  # Lifetime of presigned asset URLs in seconds
+ASSET_CACHE_BYTES = int(os.getenv("ASSET_CACHE_BYTES", str(2 * 1024 ** 3)))  # Local copies of S3 assets kept
+ASSET_CACHE_LEASE = int(os.getenv("ASSET_CACHE_LEASE", "600"))  # Seconds a local copy stays after its last use
+
+# Output format -> file extension for rasterized GeoPackages
+RASTER_FORMATS = {
+    "png": ".png",       # 1-bit, grayscale or paletted PNG
+    "webp": ".webp",     # lossless WebP
+    "geotiff": ".tif",   # deflate-compressed, tiled GeoTIFF with georeferencing
+}
 
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
@@ -62,6 +109,7 @@ class Project(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     created_by = Column(String)
     files = relationship("UploadedFile", back_populates="project", cascade="all, delete-orphan")
+    builds = relationship("TileBuild", back_populates="project", cascade="all, delete-orphan")
     assigned_users = relationship("User", secondary=user_projects, back_populates="assigned_projects")
 
 class UploadedFile(Base):
@@ -76,13 +124,204 @@ class UploadedFile(Base):
     bounding_box = Column(String)  # Format: "width x height" in meters
     origin = Column(String)  # Format: "x, y" in meters
     processed_size = Column(String)  # For GeoPackages: stores "clipped" or "expanded" with size
+    placement_status = Column(String)  # "valid", "partial", "outside" or "invalid" against the project extent
+    visible = Column(Integer, default=1)  # Included in the project's table composite
+    raster_options = Column(String)  # For GeoPackages: JSON rasterize_geopackage options (attribute, colormap, ...)
+    build_id = Column(Integer)  # TileBuild that produced this file (tiles and previews)
+    sha256 = Column(String, index=True)  # Content hash of the original upload, see Blob
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     uploaded_by = Column(String)
     project_id = Column(Integer, ForeignKey("projects.id"))
     project = relationship("Project", back_populates="files")
 
+class Blob(Base):
+    __tablename__ = "blobs"
+    
+    path = Column(String, primary_key=True)  # BLOB_DIR/<sha256[:2]>/<sha256><ext>
+    sha256 = Column(String, index=True)
+    size = Column(Integer)
+    ref_count = Column(Integer, default=0)  # UploadedFile rows whose original upload this is
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TileBuild(Base):
+    __tablename__ = "tile_builds"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    params = Column(String)  # JSON parameters the build was run with
+    params_hash = Column(String, index=True)  # Identical parameters reuse a finished build
+    status = Column(String, default="queued")  # "queued", "running", "done" or "failed"
+    progress = Column(Integer, default=0)  # Percent
+    message = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    created_by = Column(String)
+    project_id = Column(Integer, ForeignKey("projects.id"))
+    project = relationship("Project", back_populates="builds")
+
 Base.metadata.create_all(bind=engine)
 
+build_executor = ThreadPoolExecutor(max_workers=BUILD_WORKERS)
+asset_gc_executor = ThreadPoolExecutor(max_workers=1)  # Sweeps never overlap
+
+class LocalStorage:
+    """
+    Assets as files under static/assets, served by the /static mount.
+
+    Every driver addresses assets by the relative path stored on UploadedFile
+    (its key), and keeps the working copy of an asset at that same path, so
+    processing code can read and write plain files. put publishes a file or
+    folder written there, fetch makes sure a local copy exists.
+    """
+    def put(self, key):
+        pass
+    
+    def fetch(self, key):
+        """Local path of an asset, or None if it does not exist"""
+        return key if os.path.exists(key) else None
+    
+    def exists(self, key):
+        return os.path.exists(key)
+    
+    def delete(self, key):
+        """Remove a file, or a folder with everything in it"""
+        if os.path.isdir(key):
+            shutil.rmtree(key, ignore_errors=True)
+        elif os.path.exists(key):
+            os.remove(key)
+        # Empty folders below static/assets/<kind> (blob prefixes, mesh LODs) go with their last file
+        parent = os.path.dirname(key)
+        while parent.count("/") > 2 and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+    
+    def url(self, key):
+        return f"/{key}"
+    
+    def list(self, prefix):
+        """(key, mtime) of every stored file under a folder"""
+        for root, _, files in os.walk(prefix):
+            for name in files:
+                path = os.path.join(root, name)
+                yield Path(path).as_posix(), os.path.getmtime(path)
+
+class S3Storage(LocalStorage):
+    """
+    Assets in an S3-compatible bucket, with the local files as an LRU read-through cache.
+
+    put uploads in S3_PART_SIZE multipart chunks, fetch downloads missing files,
+    and URLs are presigned. Local copies of stored objects are evicted, least
+    recently used first, once they take more than ASSET_CACHE_BYTES. Copies used
+    in the last ASSET_CACHE_LEASE seconds are leased to whoever is reading them,
+    and copies rewritten since they were stored are not uploaded yet; neither is
+    evicted.
+    """
+    def __init__(self):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        self.client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL, region_name=S3_REGION)
+        self.transfer = TransferConfig(multipart_threshold=S3_PART_SIZE, multipart_chunksize=S3_PART_SIZE)
+        self.cache = None  # key -> (size, mtime, last use) of local copies known to be stored, oldest use first
+        self.cache_bytes = 0
+        self.lock = threading.Lock()
+    
+    def object_key(self, key):
+        return f"{S3_PREFIX}{key}"
+    
+    def put(self, key):
+        paths = [key] if os.path.isfile(key) else [path for path, _ in LocalStorage.list(self, key)]
+        for path in paths:
+            self.client.upload_file(path, S3_BUCKET, self.object_key(path), Config=self.transfer)
+            self.touch(path)
+    
+    def fetch(self, key):
+        # A copy evicted between the check and the touch is downloaded again
+        while not self.touch(key):
+            os.makedirs(os.path.dirname(key) or ".", exist_ok=True)
+            tmp_path = f"{key}.part{threading.get_ident()}"
+            try:
+                self.client.download_file(S3_BUCKET, self.object_key(key), tmp_path, Config=self.transfer)
+            except self.client.exceptions.ClientError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return None
+            os.replace(tmp_path, key)
+        return key
+    
+    def exists(self, key):
+        """A stored file, or a folder with at least one stored file"""
+        # A key sorts before every other key it prefixes, so one listed object answers each question
+        for prefix in (key, key.rstrip("/") + "/"):
+            response = self.client.list_objects_v2(Bucket=S3_BUCKET, Prefix=self.object_key(prefix), MaxKeys=1)
+            contents = response.get("Contents", [])
+            if contents and (prefix.endswith("/") or contents[0]["Key"] == self.object_key(key)):
+                return True
+        return False
+    
+    def delete(self, key):
+        keys = [name for name, _ in self.list(key) if name == key or name.startswith(key.rstrip("/") + "/")]
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(Bucket=S3_BUCKET, Delete={
+                "Objects": [{"Key": self.object_key(name)} for name in keys[i:i + 1000]], "Quiet": True})
+        with self.lock:
+            for name in keys:
+                self.cache_bytes -= self.cache.pop(name, (0,))[0] if self.cache else 0
+        super().delete(key)
+    
+    def url(self, key):
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": S3_BUCKET, "Key": self.object_key(key)}, ExpiresIn=ASSET_URL_TTL)
+    
+    def list(self, prefix):
+        pages = self.client.get_paginator("list_objects_v2").paginate(Bucket=S3_BUCKET, Prefix=self.object_key(prefix))
+        for page in pages:
+            for item in page.get("Contents", []):
+                yield item["Key"][len(S3_PREFIX):], item["LastModified"].timestamp()
+    
+    def touch(self, key):
+        """
+        Mark a stored key's local copy as just used, then evict the least recently used ones over the budget.
+
+        Returns:
+            False if there is no local copy to mark
+        """
+        with self.lock:
+            if self.cache is None:
+                # Local copies of objects stored before a restart, oldest access first
+                self.cache = OrderedDict()
+                local = [(os.path.getatime(name), name) for name, _ in self.list("static/assets")
+                         if os.path.isfile(name)]
+                for used, name in sorted(local):
+                    self.cache[name] = (os.path.getsize(name), os.path.getmtime(name), used)
+                self.cache_bytes = sum(size for size, _, _ in self.cache.values())
+            if not os.path.isfile(key):
+                return False
+            now = time.time()
+            self.cache_bytes -= self.cache.pop(key, (0,))[0]
+            self.cache[key] = (os.path.getsize(key), os.path.getmtime(key), now)
+            self.cache_bytes += self.cache[key][0]
+            while self.cache_bytes > ASSET_CACHE_BYTES:
+                name, (size, mtime, used) = next(iter(self.cache.items()))
+                if used >= now - ASSET_CACHE_LEASE:
+                    break  # This and every later copy is leased
+                del self.cache[name]
+                self.cache_bytes -= size
+                if os.path.exists(name) and os.path.getmtime(name) == mtime:
+                    os.remove(name)
+            return True
+
+def make_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage()
+    if STORAGE_BACKEND != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Use local or s3")
+    return LocalStorage()
+
+storage = make_storage()
+
+def asset_url(key):
+    """URL a browser can load an asset from"""
+    return storage.url(key) if key else ""
+
 def get_db():
     db = SessionLocal()
     try:
@@ -359,8 +598,16 @@ async def delete_project(project_id: int, db: Session = Depends(get_db), request
     if not user.is_admin and project.created_by != user.username:
         return HTMLResponse(content='<div class="error">You can only delete your own projects</div>', status_code=403)
     
+    build_ids = [build.id for build in project.builds]
+    for uploaded_file in project.files:
+        release_blob(uploaded_file, db)
     db.delete(project)
     db.commit()
+    shutil.rmtree(composite_dir(project_id), ignore_errors=True)
+    for build_id in build_ids:
+        storage.delete(build_dir(build_id))
+    # Uploads, thumbnails and derived files of the deleted rows
+    schedule_asset_gc()
     
     projects = db.query(Project).order_by(Project.created_at.desc()).all()
     return templates.TemplateResponse("projects_table.html", {"request": Request(scope={"type": "http"}), "projects": projects, "user": user})
@@ -387,6 +634,8 @@ async def update_project(
     if not user.is_admin and project.created_by != user.username:
         return HTMLResponse(content='<div class="error">You can only edit your own projects</div>', status_code=403)
     
+    extent_changed = (project.bounding_box, project.origin) != (bounding_box, origin)
+    table_changed = project.table_dimension != table_dimension
     project.name = name
     project.description = description
     project.bounding_box = bounding_box
@@ -394,8 +643,20 @@ async def update_project(
     project.origin = origin
     db.commit()
     
+    # Re-rasterizing layers and mesh heightmaps can take a while; keep it off the event loop
+    await run_in_threadpool(rederive_project_files, project, db, extent_changed, table_changed)
+    
     return HTMLResponse(content='<div class="success">Project updated successfully</div>')
 
+def rederive_project_files(project, db: Session, extent_changed, table_changed):
+    """Bring a project's derived files in line with an edited extent or table size"""
+    # Flag assets that no longer fit the edited extent, and move the rest onto the new pixel grid
+    if extent_changed:
+        revalidate_project_files(project, db)
+        refresh_project_composite(project, db)
+    if extent_changed or table_changed:
+        refresh_mesh_heightmaps(project, db)
+
 @app.get("/project/{project_id}", response_class=HTMLResponse)
 async def project_detail(project_id: int, request: Request, db: Session = Depends(get_db)):
     user = get_current_user(request, db)
@@ -416,7 +677,7 @@ async def project_detail(project_id: int, request: Request, db: Session = Depend
     uploaded_files = db.query(UploadedFile).filter(UploadedFile.project_id == project_id).order_by(UploadedFile.uploaded_at.desc()).all()
     sidebar_projects = get_user_accessible_projects(user, db)
     content_template = templates.get_template("project_detail.html")
-    page_content = content_template.render(project=project, user=user, uploaded_files=uploaded_files)
+    page_content = content_template.render(project=project, user=user, uploaded_files=uploaded_files, mesh_lod_url=mesh_lod_url, asset_url=asset_url)
     
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
@@ -565,7 +826,100 @@ def generate_geopackage_thumbnail(gpkg_path, thumbnail_path):
             pass
         img.save(thumbnail_path)
 
-def rasterize_geopackage(gpkg_path, output_path, project_bounds, project_origin, resolution=1.0):
+def raster_format_for_path(path):
+    """Look up the RASTER_FORMATS key from a raster file extension"""
+    ext = Path(path).suffix.lower()
+    for output_format, format_ext in RASTER_FORMATS.items():
+        if format_ext == ext:
+            return output_format
+    return RASTER_FORMAT
+
+def save_raster(band, output_path, output_format, transform, palette=None, alpha=None):
+    """
+    Encode a single-band uint8 raster without intermediate full-size copies.
+
+    Args:
+        band: (height, width) uint8 array, 0 = empty. A pure 0/255 band is
+            written as a 1-bit mask, other values as grayscale or palette indices
+        output_path: Path where the raster will be saved
+        output_format: One of RASTER_FORMATS
+        transform: Affine transform of the project grid (used for GeoTIFF)
+        palette: Optional (256, 3) uint8 colormap indexed by band values
+        alpha: Optional (height, width) uint8 coverage for anti-aliased palette output
+    """
+    height, width = band.shape
+    if output_format == "geotiff":
+        import rasterio
+        with rasterio.open(
+            output_path, 'w', driver='GTiff',
+            width=width, height=height, count=1 if alpha is None else 2, dtype='uint8',
+            crs='EPSG:3006', transform=transform,
+            compress='deflate', predictor=2, tiled=True, blockxsize=256, blockysize=256,
+            **({'alpha': 'YES'} if alpha is not None else {'photometric': 'PALETTE'} if palette is not None else {}),
+        ) as dst:
+            dst.write(band, 1)
+            if palette is not None:
+                dst.write_colormap(1, {i: tuple(color) + (0 if i == 0 else 255,) for i, color in enumerate(palette)})
+            if alpha is not None:
+                dst.write(alpha, 2)
+        return
+    if output_format not in ("png", "webp"):
+        raise ValueError(f"Unknown raster format '{output_format}'. Use one of: {', '.join(RASTER_FORMATS)}")
+
+    if palette is not None and alpha is not None:
+        # Anti-aliased classes need per-pixel alpha
+        img = Image.fromarray(np.dstack([palette[band], alpha]), mode='RGBA')
+    elif palette is not None:
+        img = Image.frombuffer('P', (width, height), np.ascontiguousarray(band), 'raw', 'P', 0, 1)
+        img.putpalette(palette.tobytes())
+        img.info['transparency'] = 0
+        if output_format == "webp":
+            img = img.convert('RGBA')
+    elif output_format == "png" and not np.any((band != 0) & (band != 255)):
+        # Pack 8 pixels per byte and hand the buffer straight to a 1-bit image
+        packed = np.packbits(band, axis=1)
+        img = Image.frombuffer('1', (width, height), packed, 'raw', '1', 0, 1)
+    else:
+        # fromarray shares the band buffer for mode 'L'
+        img = Image.fromarray(band, mode='L')
+
+    if output_format == "png":
+        img.save(output_path, 'PNG', optimize=True)
+    else:
+        img.save(output_path, 'WEBP', lossless=True, method=6)
+
+def colormap_palette(colormap):
+    """(256, 3) uint8 palette from a matplotlib colormap; index 0 stays black for empty pixels"""
+    cmap = matplotlib.colormaps[colormap]
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    palette[1:] = (cmap(np.linspace(0.0, 1.0, 255))[:, :3] * 255).round().astype(np.uint8)
+    return palette
+
+def attribute_burn_values(gdf, attribute):
+    """
+    Map an attribute column to burn values 1..255.
+
+    Numeric columns (e.g. building height) are scaled linearly over their range,
+    other columns (e.g. land use class) are numbered by category.
+
+    Returns:
+        Tuple of (geometries, values, categorical) with rows lacking a value dropped
+    """
+    if attribute not in gdf.columns:
+        raise ValueError(f"Attribute '{attribute}' not found. Available: {', '.join(c for c in gdf.columns if c != 'geometry')}")
+    gdf = gdf[gdf[attribute].notna()]
+    column = gdf[attribute]
+    if np.issubdtype(column.dtype, np.number):
+        low, high = column.min(), column.max()
+        scaled = (column.to_numpy(dtype=float) - low) / (high - low) if high > low else np.ones(len(column))
+        values = (1 + np.round(scaled * 254)).astype(np.uint8)
+        return gdf.geometry, values, False
+    codes, _ = column.factorize(sort=True)
+    values = (1 + np.minimum(codes, 254)).astype(np.uint8)
+    return gdf.geometry, values, True
+
+def rasterize_geopackage(gpkg_path, output_path, project_bounds, project_origin, resolution=RASTER_RESOLUTION,
+                         output_format=None, attribute=None, colormap=None, supersample=1):
     """
     Rasterize GeoPackage to match project bounds.
     
@@ -574,7 +928,11 @@ def rasterize_geopackage(gpkg_path, output_path, project_bounds, project_origin,
         output_path: Path where the rasterized image will be saved
         project_bounds: Project bounding box as "width,height" string
         project_origin: Project origin as "x,y" string
-        resolution: Pixel size in meters (default 1.0m per pixel)
+        resolution: Pixel size in meters (default RASTER_RESOLUTION)
+        output_format: One of RASTER_FORMATS (default: from the output_path extension)
+        attribute: Optional column whose values are burned instead of a plain mask
+        colormap: Matplotlib colormap name for attribute values (default "viridis")
+        supersample: Subpixels per pixel edge for anti-aliasing (1 = off)
     
     Returns:
         Tuple of (success, processing_type, project_size)
@@ -636,27 +994,49 @@ def rasterize_geopackage(gpkg_path, output_path, project_bounds, project_origin,
         from rasterio.transform import from_bounds
         transform = from_bounds(proj_minx, proj_miny, proj_maxx, proj_maxy, width_pixels, height_pixels)
         
-        # Initialize raster with black (0 values)
-        raster = np.zeros((height_pixels, width_pixels), dtype=np.uint8)
+        categorical = False
+        if attribute:
+            geometries, values, categorical = attribute_burn_values(gdf_clipped, attribute)
+        else:
+            geometries, values = gdf_clipped.geometry, np.full(len(gdf_clipped), 255, dtype=np.uint8)
         
-        if not gdf_clipped.empty:
-            # Rasterize the clipped geometries
-            shapes = [(geom, 255) for geom in gdf_clipped.geometry]
-            rasterized = features.rasterize(
-                shapes,
-                out_shape=(height_pixels, width_pixels),
-                transform=transform,
+        # Rasterize on a finer grid when anti-aliasing
+        supersample = max(1, int(supersample))
+        fine_shape = (height_pixels * supersample, width_pixels * supersample)
+        if len(values):
+            # Rasterize the clipped geometries in a single pass over (geometry, value) pairs
+            raster = features.rasterize(
+                zip(geometries, values),
+                out_shape=fine_shape,
+                transform=from_bounds(proj_minx, proj_miny, proj_maxx, proj_maxy, fine_shape[1], fine_shape[0]),
                 fill=0,
                 dtype=np.uint8
             )
-            raster = rasterized
+        else:
+            # Empty raster (black)
+            raster = np.zeros(fine_shape, dtype=np.uint8)
+        
+        alpha = None
+        if supersample > 1:
+            # Reduce each supersample x supersample block to one pixel
+            blocks = raster.reshape(height_pixels, supersample, width_pixels, supersample)
+            covered = np.count_nonzero(blocks, axis=(1, 3)).astype(np.uint16)
+            coverage = (covered * 255 // (supersample * supersample)).astype(np.uint8)
+            if categorical:
+                # Classes cannot be averaged; keep the highest class in the block
+                raster = blocks.max(axis=(1, 3))
+                alpha = coverage
+            elif attribute:
+                # Mean value of the covered subpixels
+                totals = blocks.sum(axis=(1, 3), dtype=np.uint32)
+                raster = (totals // np.maximum(covered, 1)).astype(np.uint8)
+                alpha = coverage
+            else:
+                raster = coverage
         
-        # Convert to PIL Image and save
-        img = Image.fromarray(raster, mode='L')
-        # Convert to RGB for better compatibility
-        img_rgb = Image.new('RGB', img.size, (0, 0, 0))
-        img_rgb.paste(img, mask=img)
-        img_rgb.save(output_path, 'PNG')
+        palette = colormap_palette(colormap or "viridis") if attribute else None
+        save_raster(raster, output_path, output_format or raster_format_for_path(output_path), transform,
+                    palette=palette, alpha=alpha)
         
         return True, processing_type, f"{proj_width},{proj_height}"
         
@@ -664,6 +1044,229 @@ def rasterize_geopackage(gpkg_path, output_path, project_bounds, project_origin,
         print(f"Error rasterizing GeoPackage: {e}")
         return False, None, None
 
+def resample_image_to_project(image_path, output_path, image_extent, proj_extent, resolution=RASTER_RESOLUTION):
+    """
+    Crop an image to the project extent and resample it onto the project pixel grid.
+
+    The output is a transparent RGBA PNG with the same size and pixel grid as the
+    rasterize_geopackage output, with the image placed at its real-world position.
+
+    Args:
+        image_path: Path to the source PNG/JPEG
+        output_path: Path where the resampled PNG will be saved
+        image_extent: Image extent as (minx, miny, maxx, maxy) in meters
+        proj_extent: Project extent as (minx, miny, maxx, maxy) in meters
+        resolution: Pixel size in meters (default RASTER_RESOLUTION)
+
+    Returns:
+        The clipped image extent as (minx, miny, maxx, maxy)
+    """
+    status, clipped = batch_validate_placement([image_extent], proj_extent)
+    if status[0] not in (PLACEMENT_VALID, PLACEMENT_PARTIAL):
+        raise ValueError("Image does not overlap the project extent")
+    clip = clipped[0]
+
+    # Target window on the project grid
+    width_pixels = int((proj_extent[2] - proj_extent[0]) / resolution)
+    height_pixels = int((proj_extent[3] - proj_extent[1]) / resolution)
+    left = int(round((clip[0] - proj_extent[0]) / resolution))
+    right = max(int(round((clip[2] - proj_extent[0]) / resolution)), left + 1)
+    top = int(round((proj_extent[3] - clip[3]) / resolution))
+    bottom = max(int(round((proj_extent[3] - clip[1]) / resolution)), top + 1)
+
+    with Image.open(image_path) as img:
+        # Let JPEG decode at a reduced scale when the grid is much coarser than the image
+        img_width_m = image_extent[2] - image_extent[0]
+        img_height_m = image_extent[3] - image_extent[1]
+        img.draft('RGB', (max(int(img_width_m / resolution), 1), max(int(img_height_m / resolution), 1)))
+
+        # Source window in (possibly draft-reduced) image pixels
+        px_per_m_x = img.width / img_width_m
+        px_per_m_y = img.height / img_height_m
+        source_box = (
+            (clip[0] - image_extent[0]) * px_per_m_x,
+            (image_extent[3] - clip[3]) * px_per_m_y,
+            (clip[2] - image_extent[0]) * px_per_m_x,
+            (image_extent[3] - clip[1]) * px_per_m_y,
+        )
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+        window = img.resize((right - left, bottom - top), Image.Resampling.LANCZOS,
+                            box=source_box, reducing_gap=3.0)
+
+    canvas = Image.new('RGBA', (width_pixels, height_pixels), (0, 0, 0, 0))
+    canvas.paste(window, (left, top))
+    canvas.save(output_path, 'PNG', optimize=True)
+    return clip
+
+def source_asset_path(uploaded_file):
+    """Path of the original upload behind a derived (rasterized or resampled) asset"""
+    suffix = Path(uploaded_file.original_filename).suffix
+    if uploaded_file.sha256:
+        return blob_path(uploaded_file.sha256, suffix)
+    # Uploaded before the blob store, under a uuid name
+    unique_id = Path(uploaded_file.file_path).stem.split('_')[0]
+    return f"static/assets/{unique_id}{suffix.lower()}"
+
+def blob_path(sha256, suffix):
+    suffix = suffix.lower()
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256}{'.jpg' if suffix == '.jpeg' else suffix}"
+
+def store_blob(fileobj, suffix, db: Session):
+    """
+    Stream an upload into the content-addressed blob store.
+
+    Identical content (with the same kind of extension) is stored once; the
+    returned Blob is shared, and its ref_count is left for the caller to bump
+    when an UploadedFile starts referencing it.
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=BLOB_DIR, suffix=".part")
+    with os.fdopen(fd, "wb") as out:
+        while chunk := fileobj.read(1 << 20):
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    path = blob_path(digest.hexdigest(), suffix)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        os.utime(path)  # Fresh mtime keeps a blob about to be referenced again out of the collector's reach
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    blob = db.query(Blob).filter(Blob.path == path).first()
+    if not blob:
+        try:
+            # A concurrent upload of the same content may insert the row first
+            with db.begin_nested():
+                blob = Blob(path=path, sha256=digest.hexdigest(), size=size, ref_count=0)
+                db.add(blob)
+        except IntegrityError:
+            blob = db.query(Blob).filter(Blob.path == path).one()
+    return blob
+
+def release_blob(uploaded_file, db: Session):
+    """Drop a deleted file's reference to its original upload; the collector removes unreferenced blobs"""
+    if not uploaded_file.sha256:
+        return
+    blob = db.query(Blob).filter(Blob.path == source_asset_path(uploaded_file)).first()
+    if blob and blob.ref_count:
+        blob.ref_count -= 1
+
+def derived_key(content_id, *params):
+    """Name for a file derived from an upload: identical content and parameters share one output"""
+    return hashlib.sha256(json.dumps([content_id, *params]).encode()).hexdigest()[:24]
+
+def reusable_file(db: Session, file_path):
+    """An existing row whose derived file can be shared instead of processing the upload again"""
+    if not storage.exists(file_path):
+        return None
+    return db.query(UploadedFile).filter(UploadedFile.file_path == file_path).first()
+
+def asset_keys(uploaded_file):
+    """Storage keys of everything an UploadedFile uses; the mesh LOD is a folder"""
+    keys = [uploaded_file.file_path, uploaded_file.thumbnail_path]
+    if uploaded_file.build_id is None:
+        keys.append(source_asset_path(uploaded_file))
+    if uploaded_file.file_type in ("mesh", "tile"):
+        keys.append(mesh_lod_dir(uploaded_file.file_path))
+    if uploaded_file.file_type == "heightmap":
+        keys.append(heightmap_info_path(uploaded_file.file_path))
+    return list(dict.fromkeys(key for key in keys if key))
+
+def publish_file(uploaded_file):
+    """Put the locally written files of an UploadedFile into storage, skipping ones already stored"""
+    for key in asset_keys(uploaded_file):
+        if not os.path.exists(key):
+            continue
+        if not storage.exists(key):
+            storage.put(key)
+        elif os.path.isfile(key):
+            storage.fetch(key)  # Already stored; the local copy joins the read-through cache
+
+def live_asset_paths(db: Session):
+    """Every file or folder under static/assets that a project, build or UploadedFile still uses"""
+    live = set()
+    for uploaded_file in db.query(UploadedFile).all():
+        live.update(asset_keys(uploaded_file))
+    live.update(composite_dir(project_id) for project_id, in db.query(Project.id))
+    live.update(build_dir(build_id) for build_id, in db.query(TileBuild.id))
+    return {os.path.normpath(path) for path in live if path}
+
+def collect_orphaned_assets():
+    """
+    Mark and sweep the asset storage: remove files that no row references.
+
+    Blob ref_counts are reconciled against the UploadedFile rows first (project
+    deletes cascade past release_blob), holding the database write lock so an
+    upload cannot commit a new reference between the count and the update.
+    Anything modified in the last ASSET_GC_GRACE seconds, locally or in the
+    store, is kept, since uploads and builds write their files before
+    committing the rows that reference them.
+
+    Returns:
+        Number of files removed
+    """
+    db = SessionLocal()
+    try:
+        # A no-op write takes the write lock; uploads commit their ref_count bump after or before the recount
+        db.execute(update(Blob).values(ref_count=Blob.ref_count))
+        references = {}
+        for uploaded_file in db.query(UploadedFile).filter(UploadedFile.sha256.isnot(None)):
+            path = source_asset_path(uploaded_file)
+            references[path] = references.get(path, 0) + 1
+        for blob in db.query(Blob).all():
+            blob.ref_count = references.get(blob.path, 0)
+        db.commit()
+        live = live_asset_paths(db)
+    finally:
+        db.close()
+
+    cutoff = time.time() - ASSET_GC_GRACE
+    removed = 0
+    # Local files that never reached the store (failed uploads, build working files) are swept too
+    keys = dict(LocalStorage.list(storage, "static/assets"))
+    if type(storage) is not LocalStorage:
+        # A local copy touched by a new upload is newer than the stored object
+        for key, mtime in storage.list("static/assets"):
+            keys[key] = max(mtime, keys.get(key, mtime))
+    for key, mtime in keys.items():
+        path = Path(key)
+        # Files inside a live folder (build outputs, composites, mesh LODs) are live too
+        if path.name.startswith(".") or mtime > cutoff or any(
+                os.path.normpath(p) in live for p in (path, *path.parents)):
+            continue
+        storage.delete(key)
+        removed += 1
+
+    db = SessionLocal()
+    try:
+        # Blobs whose files were just swept
+        for blob in db.query(Blob).filter(Blob.ref_count == 0).all():
+            if not storage.exists(blob.path):
+                db.delete(blob)
+        db.commit()
+    finally:
+        db.close()
+    if removed:
+        print(f"Asset collector removed {removed} orphaned file(s)")
+    return removed
+
+def schedule_asset_gc():
+    asset_gc_executor.submit(collect_orphaned_assets)
+
+def start_asset_gc():
+    """Sweep orphaned assets now and then every ASSET_GC_INTERVAL seconds, in the background"""
+    if ASSET_GC_INTERVAL <= 0:
+        return
+    def loop():
+        while True:
+            asset_gc_executor.submit(collect_orphaned_assets).result()
+            time.sleep(ASSET_GC_INTERVAL)
+    threading.Thread(target=loop, daemon=True).start()
+
 @app.delete("/files/{file_id}")
 async def delete_file(file_id: int, request: Request = None, db: Session = Depends(get_db)):
     user = get_current_user(request, db)
@@ -681,49 +1284,24 @@ async def delete_file(file_id: int, request: Request = None, db: Session = Depen
     if not user.is_admin and project.created_by != user.username:
         return JSONResponse(content={"error": "Permission denied"}, status_code=403)
     
-    # Delete physical files
-    try:
-        if os.path.exists(uploaded_file.file_path):
-            os.remove(uploaded_file.file_path)
-        if os.path.exists(uploaded_file.thumbnail_path):
-            os.remove(uploaded_file.thumbnail_path)
-    except Exception as e:
-        print(f"Error deleting files: {e}")
+    # Build outputs belong to their row alone. Uploads and the files derived from them
+    # can be shared with other rows, so the asset collector removes them once unreferenced
+    if uploaded_file.build_id is not None:
+        try:
+            for key in asset_keys(uploaded_file):
+                storage.delete(key)
+        except Exception as e:
+            print(f"Error deleting files: {e}")
     
     # Delete database record
+    release_blob(uploaded_file, db)
     db.delete(uploaded_file)
     db.commit()
+    refresh_project_composite(project, db)
+    schedule_asset_gc()
     
     return JSONResponse(content={"success": True, "message": "File deleted successfully"})
 
-def parse_bounding_box(bbox_str):
-    """Parse bounding box string 'width x height' and return (width, height) as floats"""
-    if not bbox_str:
-        return None, None
-    try:
-        parts = bbox_str.lower().replace('×', 'x').split('x')
-        if len(parts) != 2:
-            return None, None
-        width = float(parts[0].strip())
-        height = float(parts[1].strip())
-        return width, height
-    except:
-        return None, None
-
-def parse_origin(origin_str):
-    """Parse origin string 'x, y' and return (x, y) as floats"""
-    if not origin_str:
-        return None, None
-    try:
-        parts = origin_str.replace('(', '').replace(')', '').split(',')
-        if len(parts) != 2:
-            return None, None
-        x = float(parts[0].strip())
-        y = float(parts[1].strip())
-        return x, y
-    except:
-        return None, None
-
 def validate_image_placement(image_bbox_str, image_origin_str, project_bbox_str, project_origin_str):
     """Check if image fits within project boundaries considering both bounding box and origin"""
     # Parse image dimensions and origin
@@ -773,12 +1351,416 @@ def validate_image_placement(image_bbox_str, image_origin_str, project_bbox_str,
     
     return True, "Valid"
 
+PLACEMENT_VALID = "valid"
+PLACEMENT_PARTIAL = "partial"
+PLACEMENT_OUTSIDE = "outside"
+PLACEMENT_INVALID = "invalid"
+PLACEMENT_MISALIGNED = "misaligned"  # Fits, but its grid-aligned file could not be re-derived
+
+def extents_to_array(files):
+    """Stack file extents into an (N, 4) array of (minx, miny, maxx, maxy), NaN where unparseable"""
+    extents = np.full((len(files), 4), np.nan)
+    for i, uploaded_file in enumerate(files):
+        width, height = parse_bounding_box(uploaded_file.bounding_box)
+        x, y = parse_origin(uploaded_file.origin)
+        if None not in (width, height, x, y):
+            extents[i] = (x, y, x + width, y + height)
+    return extents
+
+def project_extent(project):
+    """Return the project extent as (minx, miny, maxx, maxy), or None without a valid bounding box"""
+    width, height = parse_bounding_box(project.bounding_box)
+    if width is None or height is None:
+        return None
+    x, y = parse_origin(project.origin)
+    if x is None or y is None:
+        x, y = 0.0, 0.0
+    return np.array([x, y, x + width, y + height])
+
+def batch_validate_placement(extents, proj_extent):
+    """
+    Classify many asset extents against one project extent in a single vectorized pass.
+
+    Args:
+        extents: (N, 4) array of (minx, miny, maxx, maxy), NaN rows are invalid
+        proj_extent: (4,) project extent
+
+    Returns:
+        Tuple of (status, clipped) where status is an (N,) array of PLACEMENT_* values
+        and clipped is the (N, 4) intersection of each extent with the project
+    """
+    extents = np.asarray(extents, dtype=float).reshape(-1, 4)
+    proj_extent = np.asarray(proj_extent, dtype=float)
+
+    valid = ~np.isnan(extents).any(axis=1)
+    inside = valid & (extents[:, :2] >= proj_extent[:2]).all(axis=1) & (extents[:, 2:] <= proj_extent[2:]).all(axis=1)
+    clipped = np.hstack([np.maximum(extents[:, :2], proj_extent[:2]), np.minimum(extents[:, 2:], proj_extent[2:])])
+    overlaps = valid & (clipped[:, :2] < clipped[:, 2:]).all(axis=1)
+
+    status = np.full(len(extents), PLACEMENT_INVALID, dtype=object)
+    status[valid] = PLACEMENT_OUTSIDE
+    status[overlaps] = PLACEMENT_PARTIAL
+    status[inside] = PLACEMENT_VALID
+    return status, clipped
+
+def format_extent(extent):
+    """Format an extent back into the ('w x h', 'x, y') strings stored on UploadedFile"""
+    minx, miny, maxx, maxy = (round(float(v), 3) for v in extent)
+    return f"{round(maxx - minx, 3)} x {round(maxy - miny, 3)}", f"{minx}, {miny}"
+
+def aligned_file_path(uploaded_file, extent, project):
+    """
+    Path of the grid-aligned file derived from an image or GeoPackage for the current project extent.
+
+    The name is keyed by the project extent (see derived_key), so a file_path
+    that differs from it was derived for another grid.
+    """
+    content_id = uploaded_file.sha256 or Path(source_asset_path(uploaded_file)).stem
+    if uploaded_file.file_type == "geopackage":
+        raster_format = raster_format_for_path(uploaded_file.file_path)
+        key = derived_key(content_id, "raster", project.bounding_box, project.origin, RASTER_RESOLUTION,
+                          raster_format, uploaded_file.raster_options)
+        return f"static/assets/{key}_raster{RASTER_FORMATS[raster_format]}"
+    key = derived_key(content_id, "grid", extent.tolist(), project_extent(project).tolist(), RASTER_RESOLUTION)
+    return f"static/assets/{key}_grid.png"
+
+def clip_file_to_extent(uploaded_file, extent, clip, project, db: Session):
+    """
+    Re-derive the grid-aligned file of an image or GeoPackage from its original upload.
+
+    Used when the asset was derived for another project extent, and to crop a
+    partially placed asset to the project. Returns True if the asset now fits.
+    """
+    if uploaded_file.file_type == "geopackage":
+        # Re-rasterize the original GeoPackage against the current project extent
+        gpkg_path = storage.fetch(source_asset_path(uploaded_file))
+        if not gpkg_path:
+            return False
+        # Rasters are shared between identical uploads, so the new extent gets its own
+        raster_path = aligned_file_path(uploaded_file, extent, project)
+        thumbnail_path = f"static/assets/thumbnails/{Path(raster_path).name.split('_')[0]}_thumb.jpg"
+        existing = reusable_file(db, raster_path)
+        if existing:
+            uploaded_file.processed_size = existing.processed_size
+        else:
+            success, processing_type, project_size = rasterize_geopackage(
+                gpkg_path, raster_path, project.bounding_box, project.origin,
+                **json.loads(uploaded_file.raster_options or "{}")
+            )
+            if not success:
+                return False
+            uploaded_file.processed_size = f"{processing_type}:{project_size}" if processing_type else None
+            generate_image_thumbnail(raster_path, thumbnail_path)
+        uploaded_file.file_path = raster_path
+        uploaded_file.filename = os.path.basename(raster_path)
+        uploaded_file.thumbnail_path = thumbnail_path
+        publish_file(uploaded_file)
+        return True
+
+    image_path = storage.fetch(source_asset_path(uploaded_file)) if uploaded_file.file_type == "image" else None
+    if not image_path:
+        # Videos cannot be cropped in place; they stay flagged
+        return False
+
+    # Re-derive the grid-aligned copy from the original upload
+    grid_path = aligned_file_path(uploaded_file, extent, project)
+    thumbnail_path = f"static/assets/thumbnails/{Path(grid_path).name.split('_')[0]}_thumb.jpg"
+    if not reusable_file(db, grid_path):
+        resample_image_to_project(image_path, grid_path, extent, project_extent(project))
+        generate_image_thumbnail(grid_path, thumbnail_path)
+
+    uploaded_file.file_path = grid_path
+    uploaded_file.filename = os.path.basename(grid_path)
+    uploaded_file.thumbnail_path = thumbnail_path
+    uploaded_file.processed_size = None
+    if not np.allclose(clip, extent):
+        width, height = format_extent(clip)[0].split(' x ')
+        uploaded_file.processed_size = f"clipped:{width},{height}"
+    publish_file(uploaded_file)
+    return True
+
+def realign_file(uploaded_file, file_status, extent, clip, project, db: Session, auto_clip=False):
+    """
+    Placement status of an asset after moving it onto the current project pixel grid.
+
+    Valid and partially placed images and GeoPackages whose file was derived for
+    another project extent are re-derived; with auto_clip, partially placed ones
+    are cropped as well. One that needs re-deriving but cannot be is flagged
+    misaligned instead of silently staying on the old grid.
+    """
+    misaligned = (uploaded_file.file_type in ("image", "geopackage")
+                  and file_status in (PLACEMENT_VALID, PLACEMENT_PARTIAL)
+                  and uploaded_file.file_path != aligned_file_path(uploaded_file, extent, project))
+    if not (misaligned or (auto_clip and file_status == PLACEMENT_PARTIAL)):
+        return file_status
+    try:
+        if clip_file_to_extent(uploaded_file, extent, clip, project, db):
+            return PLACEMENT_VALID
+    except Exception as e:
+        print(f"Error clipping file {uploaded_file.id}: {e}")
+    return PLACEMENT_MISALIGNED if misaligned else file_status
+
+def revalidate_project_files(project, db: Session, auto_clip=False):
+    """
+    Re-check every asset of a project against the current project extent.
+
+    Statuses are stored on each UploadedFile. Images and GeoPackages whose
+    grid-aligned file was derived for another project extent are re-derived
+    for the current one. With auto_clip, partially placed images are cropped
+    and GeoPackages are re-rasterized to the project extent as well.
+
+    Returns:
+        Dict mapping file id to its placement status
+    """
+    files = db.query(UploadedFile).filter(UploadedFile.project_id == project.id).all()
+    proj_extent = project_extent(project)
+    if not files or proj_extent is None:
+        return {}
+
+    extents = extents_to_array(files)
+    status, clipped = batch_validate_placement(extents, proj_extent)
+
+    results = {}
+    for uploaded_file, file_status, extent, clip in zip(files, status, extents, clipped):
+        file_status = realign_file(uploaded_file, file_status, extent, clip, project, db, auto_clip=auto_clip)
+        uploaded_file.placement_status = file_status
+        results[uploaded_file.id] = file_status
+    db.commit()
+    return results
+
+@app.post("/admin/projects/{project_id}/revalidate")
+async def revalidate_project(
+    project_id: int,
+    auto_clip: str = Form(None),
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        return JSONResponse(content={"error": "Project not found"}, status_code=404)
+    if project_extent(project) is None:
+        return JSONResponse(content={"error": "Project does not have a valid bounding box defined"}, status_code=400)
+
+    results = await run_in_threadpool(revalidate_project_files, project, db, auto_clip=bool(auto_clip))
+    if auto_clip:
+        await run_in_threadpool(refresh_project_composite, project, db)
+    counts = {s: 0 for s in (PLACEMENT_VALID, PLACEMENT_PARTIAL, PLACEMENT_OUTSIDE, PLACEMENT_INVALID, PLACEMENT_MISALIGNED)}
+    for file_status in results.values():
+        counts[file_status] += 1
+
+    return JSONResponse(content={"success": True, "counts": counts, "files": results})
+
+def composite_dir(project_id):
+    return f"static/assets/composites/{project_id}"
+
+def layer_bbox(img):
+    """Pixel bbox of the lit/opaque part of a layer, or None if it is empty"""
+    if 'A' in img.getbands():
+        return img.getchannel('A').getbbox()
+    return img.getbbox()
+
+def blend_layer(tile, layer):
+    """Blend one layer crop onto an RGB composite tile in place order"""
+    if layer.mode == 'P' and 'transparency' in layer.info:
+        layer = layer.convert('RGBA')
+    if 'A' in layer.getbands():
+        layer = layer.convert('RGBA')
+        tile.paste(layer.convert('RGB'), mask=layer.getchannel('A'))
+        return tile
+    # Opaque masks (rasterized GeoPackages) are black where empty: add them like projected light
+    return ImageChops.lighter(tile, layer.convert('RGB'))
+
+def project_composite_layers(project, db: Session, grid_size):
+    """
+    Visible raster layers of a project on its pixel grid, bottom layer first.
+
+    Layers derived for another grid (an earlier project extent, or uploaded
+    before grid resampling) are re-derived first. Layers that cannot be are
+    left out and flagged misaligned, so the file list shows why.
+    """
+    files = db.query(UploadedFile).filter(
+        UploadedFile.project_id == project.id,
+        UploadedFile.file_type.in_(("image", "geopackage")),
+    ).order_by(UploadedFile.uploaded_at.asc()).all()
+    extents = extents_to_array(files)
+    status, clipped = batch_validate_placement(extents, project_extent(project))
+    layers = {}
+    for uploaded_file, file_status, extent, clip in zip(files, status, extents, clipped):
+        if uploaded_file.visible == 0:
+            continue
+        placed = file_status
+        file_status = realign_file(uploaded_file, file_status, extent, clip, project, db)
+        if file_status in (PLACEMENT_VALID, PLACEMENT_PARTIAL) and storage.fetch(uploaded_file.file_path):
+            with Image.open(uploaded_file.file_path) as img:
+                if img.size != grid_size:
+                    file_status = PLACEMENT_MISALIGNED
+        if file_status != placed:
+            # Re-derived or flagged here; other statuses are left to revalidate_project_files
+            uploaded_file.placement_status = file_status
+        if file_status not in (PLACEMENT_VALID, PLACEMENT_PARTIAL) or not os.path.exists(uploaded_file.file_path):
+            continue
+        layers[str(uploaded_file.id)] = {
+            "path": uploaded_file.file_path,
+            "mtime": os.path.getmtime(uploaded_file.file_path),
+        }
+    db.commit()
+    return layers
+
+def update_project_composite(project, db: Session):
+    """
+    Flatten the visible layers of a project into one tiled composite image.
+
+    Only tiles touched by added, removed or modified layers are recomposited;
+    the tile grid and per-layer extents are tracked in a manifest.json next to
+    the tiles. The flattened image is written to composite.png.
+
+    Returns:
+        Path of composite.png, or None when the project has no pixel grid
+    """
+    proj_extent = project_extent(project)
+    if proj_extent is None:
+        return None
+    grid_size = (int((proj_extent[2] - proj_extent[0]) / RASTER_RESOLUTION),
+                 int((proj_extent[3] - proj_extent[1]) / RASTER_RESOLUTION))
+    out_dir = composite_dir(project.id)
+    manifest_path = f"{out_dir}/manifest.json"
+    composite_path = f"{out_dir}/composite.png"
+    os.makedirs(out_dir, exist_ok=True)
+
+    manifest = {"size": None, "tile_size": None, "layers": {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    layers = project_composite_layers(project, db, grid_size)
+    rebuild = (manifest["size"] != list(grid_size) or manifest["tile_size"] != COMPOSITE_TILE_SIZE
+               or not os.path.exists(composite_path))
+
+    # Collect the pixel boxes that need recompositing
+    dirty_boxes = []
+    for layer_id, layer in layers.items():
+        previous = manifest["layers"].get(layer_id)
+        if previous and previous["path"] == layer["path"] and previous["mtime"] == layer["mtime"]:
+            layer["bbox"] = previous["bbox"]
+            continue
+        with Image.open(layer["path"]) as img:
+            layer["bbox"] = layer_bbox(img)
+        if previous and previous["bbox"]:
+            dirty_boxes.append(previous["bbox"])
+        if layer["bbox"]:
+            dirty_boxes.append(layer["bbox"])
+    for layer_id, previous in manifest["layers"].items():
+        if layer_id not in layers and previous["bbox"]:
+            dirty_boxes.append(previous["bbox"])
+
+    tiles_x = -(-grid_size[0] // COMPOSITE_TILE_SIZE)
+    tiles_y = -(-grid_size[1] // COMPOSITE_TILE_SIZE)
+    if rebuild:
+        dirty = {(tx, ty) for tx in range(tiles_x) for ty in range(tiles_y)}
+    else:
+        dirty = set()
+        for left, top, right, bottom in dirty_boxes:
+            for tx in range(left // COMPOSITE_TILE_SIZE, (right - 1) // COMPOSITE_TILE_SIZE + 1):
+                for ty in range(top // COMPOSITE_TILE_SIZE, (bottom - 1) // COMPOSITE_TILE_SIZE + 1):
+                    dirty.add((tx, ty))
+    if not dirty:
+        return composite_path
+
+    def tile_box(tx, ty):
+        return (tx * COMPOSITE_TILE_SIZE, ty * COMPOSITE_TILE_SIZE,
+                min((tx + 1) * COMPOSITE_TILE_SIZE, grid_size[0]),
+                min((ty + 1) * COMPOSITE_TILE_SIZE, grid_size[1]))
+
+    tiles = {key: Image.new('RGB', (tile_box(*key)[2] - tile_box(*key)[0], tile_box(*key)[3] - tile_box(*key)[1]))
+             for key in dirty}
+    for layer in layers.values():
+        if not layer["bbox"]:
+            continue
+        left, top, right, bottom = layer["bbox"]
+        with Image.open(layer["path"]) as img:
+            for key in tiles:
+                box = tile_box(*key)
+                if box[0] >= right or box[2] <= left or box[1] >= bottom or box[3] <= top:
+                    continue
+                tiles[key] = blend_layer(tiles[key], img.crop(box))
+
+    for (tx, ty), tile in tiles.items():
+        tile.save(f"{out_dir}/tile_{tx}_{ty}.png", 'PNG')
+
+    # Reassemble the flattened image, patching only dirty tiles into an existing one
+    if rebuild:
+        composite = Image.new('RGB', grid_size)
+    else:
+        with Image.open(composite_path) as existing:
+            composite = existing.convert('RGB')
+    for (tx, ty), tile in tiles.items():
+        composite.paste(tile, tile_box(tx, ty)[:2])
+    composite.save(composite_path, 'PNG')
+
+    with open(manifest_path, 'w') as f:
+        json.dump({"size": list(grid_size), "tile_size": COMPOSITE_TILE_SIZE, "layers": layers}, f)
+    return composite_path
+
+def refresh_project_composite(project, db: Session):
+    """Update the composite after a layer change without failing the request"""
+    try:
+        update_project_composite(project, db)
+    except Exception as e:
+        print(f"Error updating composite for project {project.id}: {e}")
+
+def user_can_access_project(user, project, db: Session):
+    if user.is_admin or project.created_by == user.username:
+        return True
+    user_obj = db.query(User).filter(User.id == user.id).first()
+    return bool(user_obj) and project.id in [p.id for p in user_obj.assigned_projects]
+
+@app.get("/projects/{project_id}/composite")
+async def project_composite(project_id: int, request: Request, db: Session = Depends(get_db)):
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        return JSONResponse(content={"error": "Project not found"}, status_code=404)
+    if not user_can_access_project(user, project, db):
+        return JSONResponse(content={"error": "Permission denied"}, status_code=403)
+
+    composite_path = await run_in_threadpool(update_project_composite, project, db)
+    if not composite_path:
+        return JSONResponse(content={"error": "Project does not have a valid bounding box defined"}, status_code=400)
+    return FileResponse(composite_path, media_type="image/png", headers={"Cache-Control": "no-cache"})
+
+@app.post("/files/{file_id}/visibility")
+async def set_file_visibility(file_id: int, visible: str = Form(...), request: Request = None, db: Session = Depends(get_db)):
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+
+    uploaded_file = db.query(UploadedFile).filter(UploadedFile.id == file_id).first()
+    if not uploaded_file:
+        return JSONResponse(content={"error": "File not found"}, status_code=404)
+
+    project = db.query(Project).filter(Project.id == uploaded_file.project_id).first()
+    if not user.is_admin and project.created_by != user.username:
+        return JSONResponse(content={"error": "Permission denied"}, status_code=403)
+
+    uploaded_file.visible = 1 if visible in ("1", "true", "on") else 0
+    db.commit()
+    await run_in_threadpool(refresh_project_composite, project, db)
+
+    return JSONResponse(content={"success": True, "visible": bool(uploaded_file.visible)})
+
 @app.post("/ingest/direct")
 async def upload_file(
     file: UploadFile = File(...),
     project_id: int = Form(...),
     bounding_box: str = Form(None),
     origin: str = Form(None),
+    raster_format: str = Form(None),
+    raster_attribute: str = Form(None),
+    raster_colormap: str = Form(None),
+    raster_supersample: int = Form(1),
     request: Request = None,
     db: Session = Depends(get_db)
 ):
@@ -793,7 +1775,7 @@ async def upload_file(
     if not user.is_admin and project.created_by != user.username:
         return JSONResponse(content={"error": "Permission denied"}, status_code=403)
     
-    allowed_extensions = {'.png', '.jpg', '.jpeg', '.mp4', '.webm', '.mov', '.gpkg'}
+    allowed_extensions = {'.png', '.jpg', '.jpeg', '.mp4', '.webm', '.mov', '.gpkg', '.stl'}
     file_ext = Path(file.filename).suffix.lower()
     
     if file_ext not in allowed_extensions:
@@ -802,37 +1784,93 @@ async def upload_file(
             status_code=400
         )
     
-    unique_id = str(uuid.uuid4())
-    safe_filename = f"{unique_id}{file_ext}"
-    file_path = f"static/assets/{safe_filename}"
-    thumbnail_path = f"static/assets/thumbnails/{unique_id}_thumb.jpg"
+    # Check the form options before the body is read and stored as a blob
+    if file_ext == '.gpkg':
+        raster_format = raster_format or RASTER_FORMAT
+        if raster_format not in RASTER_FORMATS:
+            return JSONResponse(content={"error": f"Unknown raster format. Allowed formats: {', '.join(RASTER_FORMATS)}"}, status_code=400)
+        if raster_colormap and raster_colormap not in matplotlib.colormaps:
+            return JSONResponse(content={"error": f"Unknown colormap '{raster_colormap}'"}, status_code=400)
+    elif file_ext == '.stl':
+        # Meshes from the scripts are in project coordinates, so they default to the project extent
+        if not bounding_box or not origin:
+            if project_extent(project) is None:
+                return JSONResponse(content={"error": "Bounding box and origin required when the project has none"}, status_code=400)
+            bounding_box, origin = format_extent(project_extent(project))
+    else:
+        # For non-geopackage files, validate placement
+        if not bounding_box or not origin:
+            return JSONResponse(content={"error": "Bounding box and origin required for non-GeoPackage files"}, status_code=400)
+        
+        is_valid, error_msg = validate_image_placement(
+            bounding_box, origin, project.bounding_box, project.origin
+        )
+        if not is_valid and file_ext in ['.png', '.jpg', '.jpeg'] and project_extent(project) is not None:
+            # Images overlapping the project are cropped to it instead of rejected
+            image_extent = extents_to_array([UploadedFile(bounding_box=bounding_box, origin=origin)])[0]
+            status, _ = batch_validate_placement([image_extent], project_extent(project))
+            is_valid = status[0] == PLACEMENT_PARTIAL
+        if not is_valid:
+            return JSONResponse(content={"error": error_msg}, status_code=400)
     
+    # Hashing, rasterizing, mesh LODs and heightmaps can take a while; keep them off the event loop
+    return await run_in_threadpool(ingest_upload, file, file_ext, project, user, bounding_box, origin,
+                                   raster_format, raster_attribute, raster_colormap, raster_supersample, db)
+
+def ingest_upload(file, file_ext, project, user, bounding_box, origin, raster_format, raster_attribute,
+                  raster_colormap, raster_supersample, db: Session):
+    """Store an accepted upload and derive its project files (runs in the threadpool)"""
     os.makedirs("static/assets", exist_ok=True)
     os.makedirs("static/assets/thumbnails", exist_ok=True)
     
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Identical uploads share one blob, and outputs derived from it with the same parameters
+        blob = store_blob(file.file, file_ext, db)
+        file_path = blob.path
+        safe_filename = os.path.basename(file_path)
+        thumbnail_path = f"static/assets/thumbnails/{blob.sha256}_thumb.jpg"
         
         # Initialize processed_size
         processed_size = None
+        placement_status = PLACEMENT_VALID
+        raster_options = None
         
         # Handle GeoPackage files differently
         if file_ext == '.gpkg':
-            # Extract bounds from the GeoPackage
-            bounds_data = extract_geopackage_bounds(file_path)
-            bounding_box = bounds_data['bounding_box']
-            origin = bounds_data['origin']
-            
             # Generate rasterized version aligned with project bounds
-            raster_filename = f"{unique_id}_raster.png"
+            options = {
+                "attribute": raster_attribute or None,
+                "colormap": raster_colormap or None,
+                "supersample": min(max(raster_supersample, 1), 8),
+            }
+            raster_options = json.dumps({k: v for k, v in options.items() if v not in (None, 1)})
+            key = derived_key(blob.sha256, "raster", project.bounding_box, project.origin, RASTER_RESOLUTION,
+                              raster_format, raster_options)
+            raster_filename = f"{key}_raster{RASTER_FORMATS[raster_format]}"
             raster_path = f"static/assets/{raster_filename}"
+            thumbnail_path = f"static/assets/thumbnails/{key}_thumb.jpg"
+            
+            existing = reusable_file(db, raster_path)
+            if existing:
+                # Same GeoPackage rasterized onto the same grid before
+                bounding_box, origin = existing.bounding_box, existing.origin
+                processed_size = existing.processed_size
+                file_path = raster_path
+                safe_filename = raster_filename
+            else:
+                # Extract bounds from the GeoPackage
+                bounds_data = extract_geopackage_bounds(file_path)
+                bounding_box = bounds_data['bounding_box']
+                origin = bounds_data['origin']
             
             # Rasterize the GeoPackage according to project bounds
-            if project.bounding_box and project.origin:
+            if not existing and project.bounding_box and project.origin:
                 success, processing_type, project_size = rasterize_geopackage(
-                    file_path, raster_path, project.bounding_box, project.origin
+                    file_path, raster_path, project.bounding_box, project.origin,
+                    **json.loads(raster_options)
                 )
+                if not success and raster_options != "{}":
+                    raise ValueError("Failed to rasterize GeoPackage with the given attribute/colormap options")
                 if success and processing_type:
                     processed_size = f"{processing_type}:{project_size}"
                 # Update file_path to point to the rasterized version
@@ -840,28 +1878,38 @@ async def upload_file(
                 safe_filename = raster_filename
             
             # Generate thumbnail from the rasterized image or original gpkg
-            if os.path.exists(raster_path):
-                generate_image_thumbnail(raster_path, thumbnail_path)
-            else:
-                generate_geopackage_thumbnail(file_path, thumbnail_path)
+            if not existing and not (os.path.exists(raster_path) and generate_image_thumbnail(raster_path, thumbnail_path)):
+                generate_geopackage_thumbnail(blob.path, thumbnail_path)
             
             file_type = "geopackage"
+        elif file_ext == '.stl':
+            thumbnail_path = f"static/assets/thumbnails/{blob.sha256}_thumb.png"
+            if not (storage.exists(f"{mesh_lod_dir(file_path)}/lod.json") and storage.exists(thumbnail_path)):
+                render_mesh_preview(file_path, thumbnail_path, size=(200, 200), tris=build_mesh_lod(file_path))
+            file_type = "mesh"
         else:
-            # For non-geopackage files, validate placement
-            if not bounding_box or not origin:
-                return JSONResponse(content={"error": "Bounding box and origin required for non-GeoPackage files"}, status_code=400)
-            
-            is_valid, error_msg = validate_image_placement(
-                bounding_box, origin, project.bounding_box, project.origin
-            )
-            if not is_valid:
-                return JSONResponse(content={"error": error_msg}, status_code=400)
-            
+            image_extent = extents_to_array([UploadedFile(bounding_box=bounding_box, origin=origin)])[0]
             if file_ext in ['.png', '.jpg', '.jpeg']:
-                generate_image_thumbnail(file_path, thumbnail_path)
+                # Resample onto the project pixel grid; the original is kept as the source
+                key = derived_key(blob.sha256, "grid", image_extent.tolist(), project_extent(project).tolist(), RASTER_RESOLUTION)
+                grid_filename = f"{key}_grid.png"
+                grid_path = f"static/assets/{grid_filename}"
+                thumbnail_path = f"static/assets/thumbnails/{key}_thumb.jpg"
+                existing = reusable_file(db, grid_path)
+                if existing:
+                    processed_size = existing.processed_size
+                else:
+                    clip = resample_image_to_project(file_path, grid_path, image_extent, project_extent(project))
+                    if not np.allclose(clip, image_extent):
+                        width, height = format_extent(clip)[0].split(' x ')
+                        processed_size = f"clipped:{width},{height}"
+                    generate_image_thumbnail(grid_path, thumbnail_path)
+                file_path = grid_path
+                safe_filename = grid_filename
                 file_type = "image"
             elif file_ext in ['.mp4', '.webm', '.mov']:
-                generate_video_thumbnail(file_path, thumbnail_path)
+                if not storage.exists(thumbnail_path):
+                    generate_video_thumbnail(file_path, thumbnail_path)
                 file_type = "video"
         
         uploaded_file = UploadedFile(
@@ -873,26 +1921,748 @@ async def upload_file(
             bounding_box=bounding_box,
             origin=origin,
             processed_size=processed_size,
+            placement_status=placement_status,
+            raster_options=raster_options,
+            sha256=blob.sha256,
             uploaded_by=user.username,
-            project_id=project_id
+            project_id=project.id
         )
         db.add(uploaded_file)
+        blob.ref_count = Blob.ref_count + 1  # In SQL, so concurrent uploads of the same content both count
+        publish_file(uploaded_file)
+        if file_type == "mesh":
+            params = tile_build_params(project)
+            add_mesh_heightmap(uploaded_file, project, mesh_heightmap_key(uploaded_file, project, params), params, db)
         db.commit()
+        if file_type in ("image", "geopackage"):
+            refresh_project_composite(project, db)
         
         return JSONResponse(content={
             "success": True,
             "file_id": uploaded_file.id,
             "filename": uploaded_file.original_filename,
-            "thumbnail": f"/{thumbnail_path}"
+            "thumbnail": asset_url(thumbnail_path)
         })
         
     except Exception as e:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        if os.path.exists(thumbnail_path):
-            os.remove(thumbnail_path)
+        # Blobs and derived files may be shared; whatever this upload left unreferenced is swept later
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
+def build_dir(build_id):
+    return f"static/assets/builds/{build_id}"
+
+def sqlite_database_path():
+    """Filesystem path of the SQLite database, which the pipeline reads the project from"""
+    if not DATABASE_URL.startswith("sqlite:///"):
+        return None
+    return str(Path(DATABASE_URL[len("sqlite:///"):]).resolve())
+
+def tile_build_params(project, max_mesh_size=None, tile_size=None):
+    """Everything a tile build depends on, or None if the project cannot be built"""
+    width, height = parse_bounding_box(project.bounding_box)
+    table_width, table_height = parse_bounding_box(project.table_dimension)
+    if None in (width, height, table_width, table_height):
+        return None
+    tile_size = tile_size or BUILD_TILE_SIZE
+    params = {
+        "origin": project.origin,
+        "bounding_box": project.bounding_box,
+        "table_dimension": project.table_dimension,
+        "tile_size": tile_size,
+        "tiles_x": max(1, round(table_width / tile_size)),
+        "tiles_y": max(1, round(table_height / tile_size)),
+    }
+    if max_mesh_size:
+        params["max_mesh_size"] = max_mesh_size
+    return params
+
+def build_tile_extents(project, params):
+    """
+    World extent (minx, miny, maxx, maxy) of each printed tile of a build, keyed by (col, row).
+
+    Laid out like the pipeline: square tiles of tile_size at the width scale,
+    from the project's left edge and top edge, row 0 at the bottom. A table
+    that is not a whole number of tiles leaves them short of or past the
+    project's right and bottom edges.
+    """
+    extent = project_extent(project)
+    width, _ = parse_bounding_box(project.bounding_box)
+    table_width, _ = parse_bounding_box(project.table_dimension)
+    edge = params["tile_size"] * width / table_width
+    bottom = extent[3] - params["tiles_y"] * edge
+    return {
+        (col, row): (extent[0] + col * edge, bottom + row * edge, extent[0] + (col + 1) * edge, bottom + (row + 1) * edge)
+        for row in range(params["tiles_y"]) for col in range(params["tiles_x"])
+    }
+
+def read_stl_triangles(stl_path):
+    """Triangles of a binary or ASCII STL as an (N, 3, 3) float32 array"""
+    record = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+    with open(stl_path, "rb") as f:
+        header = f.read(84)
+        count = int(np.frombuffer(header[80:84], dtype="<u4")[0]) if len(header) == 84 else 0
+        if header.startswith(b"solid") and os.path.getsize(stl_path) != 84 + count * record.itemsize:
+            f.seek(0)
+            values = re.findall(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)", f.read())
+            return np.array(values, dtype=np.float32).reshape(-1, 3, 3)
+        return np.frombuffer(f.read(count * record.itemsize), dtype=record, count=count)["vertices"]
+
+def render_mesh_preview(stl_path, output_path, size=(800, 800), tris=None):
+    """Top-down, height-colored render of a mesh (or of its given triangles); higher faces are drawn last"""
+    from matplotlib.collections import PolyCollection
+    if tris is None:
+        tris = read_stl_triangles(stl_path)
+    if not len(tris):
+        return False
+    z = tris[:, :, 2].mean(axis=1)
+    order = np.argsort(z)
+    tris, z = tris[order], z[order]
+    
+    # Shade by how much each face points up, so walls and roofs read apart
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    shade = np.abs(normals[:, 2]) / np.maximum(np.linalg.norm(normals, axis=1), 1e-12)
+    span = max(float(z.max() - z.min()), 1e-9)
+    colors = plt.get_cmap("terrain")(0.15 + 0.7 * (z - z.min()) / span)
+    colors[:, :3] *= (0.55 + 0.45 * shade)[:, None]
+    
+    fig = plt.figure(figsize=(size[0] / 100, size[1] / 100), dpi=100)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.add_collection(PolyCollection(tris[:, :, :2], facecolors=colors, edgecolors="none"))
+    ax.set_xlim(tris[:, :, 0].min(), tris[:, :, 0].max())
+    ax.set_ylim(tris[:, :, 1].min(), tris[:, :, 1].max())
+    ax.set_aspect("equal")
+    ax.axis("off")
+    fig.savefig(output_path, dpi=100, facecolor="white")
+    plt.close(fig)
+    return True
+
+def mesh_lod_dir(mesh_path):
+    """Folder of a mesh asset's level-of-detail pyramid, next to the mesh"""
+    path = Path(mesh_path)
+    return (path.parent / f"{path.stem}_lod").as_posix()
+
+def mesh_lod_url(uploaded_file):
+    return f"/files/{uploaded_file.id}/lod"
+
+def cluster_mesh(verts, faces, cell):
+    """Vertex-clustering simplification: one vertex per occupied `cell`-sized grid cell"""
+    q = np.floor((verts - verts.min(axis=0)) / cell).astype(np.int64)
+    span = q.max(axis=0) + 1
+    _, cluster = np.unique((q[:, 0] * span[1] + q[:, 1]) * span[2] + q[:, 2], return_inverse=True)
+    cluster = cluster.reshape(-1)
+    weight = np.bincount(cluster)
+    merged = np.stack([np.bincount(cluster, weights=verts[:, k]) for k in range(3)], axis=1) / weight[:, None]
+    faces = cluster[faces]
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])]
+    _, keep = np.unique(np.sort(faces, axis=1), axis=0, return_index=True)
+    return merged, faces[np.sort(keep)]
+
+def compact_mesh(verts, faces):
+    used, faces = np.unique(faces, return_inverse=True)
+    return verts[used], faces.reshape(-1, 3)
+
+def write_mesh_glb(path, verts, faces):
+    """
+    Single-mesh binary glTF with 16-bit quantized positions (KHR_mesh_quantization);
+    the node's translation/scale map them back to the mesh's own coordinates
+    """
+    lo = verts.min(axis=0)
+    extent = np.maximum(verts.max(axis=0) - lo, 1e-9)
+    q = np.zeros((len(verts), 4), dtype="<u2")  # 4-byte aligned vertex stride
+    q[:, :3] = np.round((verts - lo) / extent * 65535)
+    index_type, component = ("<u2", 5123) if len(verts) < 65536 else ("<u4", 5125)
+    positions, indices = q.tobytes(), faces.astype(index_type).tobytes()
+    indices += b"\0" * (-len(indices) % 4)
+    gltf = {
+        "asset": {"version": "2.0", "generator": "dtcc-table backend"},
+        "extensionsUsed": ["KHR_mesh_quantization"], "extensionsRequired": ["KHR_mesh_quantization"],
+        "scene": 0, "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "translation": lo.tolist(), "scale": extent.tolist()}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "material": 0}]}],
+        "materials": [{"pbrMetallicRoughness": {"baseColorFactor": [0.85, 0.85, 0.85, 1.0],
+                                                "metallicFactor": 0.0, "roughnessFactor": 0.9}}],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5123, "normalized": True, "count": len(verts), "type": "VEC3",
+             "min": q[:, :3].min(axis=0).tolist(), "max": q[:, :3].max(axis=0).tolist()},
+            {"bufferView": 1, "componentType": component, "count": faces.size, "type": "SCALAR"},
+        ],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(positions), "byteStride": 8, "target": 34962},
+            {"buffer": 0, "byteOffset": len(positions), "byteLength": faces.size * np.dtype(index_type).itemsize,
+             "target": 34963},
+        ],
+        "buffers": [{"byteLength": len(positions) + len(indices)}],
+    }
+    body = json.dumps(gltf, separators=(",", ":")).encode()
+    body += b" " * (-len(body) % 4)
+    binary = positions + indices
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", b"glTF", 2, 28 + len(body) + len(binary)))
+        f.write(struct.pack("<I4s", len(body), b"JSON") + body)
+        f.write(struct.pack("<I4s", len(binary), b"BIN\0") + binary)
+
+def build_mesh_lod(stl_path):
+    """
+    Level-of-detail pyramid of a mesh for the web viewer, as a quadtree of GLB chunks.
+
+    Level l splits the mesh's XY extent into 2^l x 2^l chunks (triangles go to
+    the chunk holding their centroid). The deepest level keeps the original
+    triangles with at most about MESH_LOD_CHUNK_TRIANGLES per chunk; coarser
+    levels are vertex-clustered on a grid fine enough for about as many
+    triangles per chunk over flat ground, so every chunk stays small and the
+    viewer can refine only where it zooms.
+    Returns the coarsest level's triangles, for the thumbnail.
+    """
+    tris = read_stl_triangles(stl_path)
+    if not len(tris):
+        raise ValueError("The mesh has no triangles")
+    verts, faces = np.unique(tris.reshape(-1, 3).astype(np.float64), axis=0, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    lo, hi = verts.min(axis=0), verts.max(axis=0)
+    size = max(float((hi - lo)[:2].max()), 1e-9)
+    depth = max(0, int(np.ceil(np.log(len(faces) / MESH_LOD_CHUNK_TRIANGLES) / np.log(4))))
+    centroids = verts[faces].mean(axis=1)[:, :2]
+    cells = np.sqrt(MESH_LOD_CHUNK_TRIANGLES / 2)  # A grid of n x n cells triangulates into 2n² faces
+
+    out_dir = Path(mesh_lod_dir(stl_path))
+    shutil.rmtree(out_dir, ignore_errors=True)
+    out_dir.mkdir(parents=True)
+    chunks, coarsest = [], []
+    for level in range(depth + 1):
+        n = 2 ** level
+        ij = np.clip(np.floor((centroids - lo[:2]) / (size / n)).astype(np.int64), 0, n - 1)
+        chunk_id = ij[:, 0] * n + ij[:, 1]
+        order = np.argsort(chunk_id, kind="stable")
+        ids, starts = np.unique(chunk_id[order], return_index=True)
+        for chunk, group in zip(ids, np.split(order, starts[1:])):
+            chunk_verts, chunk_faces = compact_mesh(verts, faces[group])
+            if level < depth:
+                chunk_verts, chunk_faces = cluster_mesh(chunk_verts, chunk_faces, size / n / cells)
+            if not len(chunk_faces):
+                continue
+            i, j = divmod(int(chunk), n)
+            name = f"{level}_{i}_{j}.glb"
+            write_mesh_glb(out_dir / name, chunk_verts, chunk_faces)
+            chunks.append({"level": level, "i": i, "j": j, "file": name, "triangles": int(len(chunk_faces)),
+                           "bounds": [chunk_verts.min(axis=0).tolist(), chunk_verts.max(axis=0).tolist()]})
+            if level == 0:
+                coarsest.append(chunk_verts[chunk_faces])
+    with open(out_dir / "lod.json", "w") as f:
+        json.dump({"bounds": [lo.tolist(), hi.tolist()], "depth": depth, "triangles": int(len(faces)),
+                   "chunks": chunks}, f)
+    return np.concatenate(coarsest).astype(np.float32)
+
+def mesh_to_project(tris, mesh_extent, project):
+    """
+    Mesh triangles in project coordinates (meters).
+
+    A mesh whose XY bounds fit its asset extent is taken to be in project
+    coordinates already. Otherwise it is a print-scale mesh from the scripts,
+    anchored at the asset origin and scaled by the project's table scale
+    (project width / table width).
+
+    Returns:
+        Tuple of (triangles as float64, scale from mesh units to meters)
+    """
+    tris = np.asarray(tris, dtype=np.float64)
+    lo, hi = tris[..., :2].reshape(-1, 2).min(axis=0), tris[..., :2].reshape(-1, 2).max(axis=0)
+    margin = 0.01 * (mesh_extent[2:] - mesh_extent[:2])
+    if (lo >= mesh_extent[:2] - margin).all() and (hi <= mesh_extent[2:] + margin).all():
+        return tris, 1.0
+    width, _ = parse_bounding_box(project.bounding_box)
+    table_width, _ = parse_bounding_box(project.table_dimension)
+    scale = width / table_width if width and table_width else (mesh_extent[2] - mesh_extent[0]) / (hi[0] - lo[0])
+    tris = tris * scale
+    tris[..., :2] += mesh_extent[:2]
+    return tris, float(scale)
+
+def rasterize_heightmap(tris, proj_extent, resolution=RASTER_RESOLUTION):
+    """
+    Z-buffer rasterization of the top surface of a mesh onto the project pixel grid.
+
+    Uses the same grid as rasterize_geopackage: int(size / resolution) pixels
+    per axis over the project extent, row 0 at the top. Each pixel gets the
+    highest mesh surface at its center. Triangles are expanded into candidate
+    pixels within their bounding boxes and tested with barycentric weights,
+    HEIGHTMAP_BATCH candidates at a time.
+
+    Returns:
+        (height, width) float32 array, NaN where the mesh does not cover a pixel
+    """
+    minx, miny, maxx, maxy = proj_extent
+    width = int((maxx - minx) / resolution)
+    height = int((maxy - miny) / resolution)
+    # Pixel coordinates with pixel centers on integers
+    x = (tris[..., 0] - minx) * (width / (maxx - minx)) - 0.5
+    y = (maxy - tris[..., 1]) * (height / (maxy - miny)) - 0.5
+    z = tris[..., 2]
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+    c0 = np.clip(np.ceil(x.min(axis=1)), 0, width).astype(np.int64)
+    c1 = np.clip(np.floor(x.max(axis=1)), -1, width - 1).astype(np.int64)
+    r0 = np.clip(np.ceil(y.min(axis=1)), 0, height).astype(np.int64)
+    r1 = np.clip(np.floor(y.max(axis=1)), -1, height - 1).astype(np.int64)
+    nx, ny = c1 - c0 + 1, r1 - r0 + 1
+    # Walls are vertical (zero area from above) and never the top surface
+    ids = np.flatnonzero((np.abs(area) > 1e-12) & (nx > 0) & (ny > 0))
+    counts = nx[ids] * ny[ids]
+
+    zbuf = np.full(width * height, -np.inf)
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(ids):
+        begin = ends[start] - counts[start]
+        stop = max(int(np.searchsorted(ends, begin + HEIGHTMAP_BATCH, side="right")), start + 1)
+        batch_counts = counts[start:stop]
+        t = np.repeat(ids[start:stop], batch_counts)
+        k = np.arange(len(t)) - np.repeat(ends[start:stop] - batch_counts - begin, batch_counts)
+        c = c0[t] + k % nx[t]
+        r = r0[t] + k // nx[t]
+        px, py = x[t], y[t]
+        w0 = ((px[:, 1] - c) * (py[:, 2] - r) - (px[:, 2] - c) * (py[:, 1] - r)) / area[t]
+        w1 = ((px[:, 2] - c) * (py[:, 0] - r) - (px[:, 0] - c) * (py[:, 2] - r)) / area[t]
+        w2 = 1.0 - w0 - w1
+        inside = (w0 >= -1e-9) & (w1 >= -1e-9) & (w2 >= -1e-9)
+        zt = z[t[inside]]
+        np.maximum.at(zbuf, r[inside] * width + c[inside],
+                      w0[inside] * zt[:, 0] + w1[inside] * zt[:, 1] + w2[inside] * zt[:, 2])
+        start = stop
+    zbuf[np.isinf(zbuf)] = np.nan
+    return zbuf.reshape(height, width).astype(np.float32)
+
+def tile_height_ranges(heights, proj_extent, tile_extents):
+    """Min/max Z of each build tile ("col,row", row 0 at the bottom) over a project heightmap"""
+    height, width = heights.shape
+    minx, miny, maxx, maxy = proj_extent
+    ranges = {}
+    for (col, row), (x0, y0, x1, y1) in tile_extents.items():
+        c0, c1 = (np.clip(np.round((np.array([x0, x1]) - minx) * width / (maxx - minx)), 0, width)).astype(int)
+        r0, r1 = (np.clip(np.round((maxy - np.array([y1, y0])) * height / (maxy - miny)), 0, height)).astype(int)
+        block = heights[r0:r1, c0:c1]
+        if np.isfinite(block).any():
+            ranges[f"{col},{row}"] = [float(np.nanmin(block)), float(np.nanmax(block))]
+    return ranges
+
+def save_heightmap(heights, output_path, proj_extent, output_format=HEIGHTMAP_FORMAT):
+    """
+    Encode a heightmap as 16-bit grayscale: 0 is no data, 1..65535 span [z_min, z_max].
+
+    Returns:
+        Tuple of (z_min, z_step), so that z = z_min + (value - 1) * z_step
+    """
+    from rasterio.transform import from_bounds
+    valid = np.isfinite(heights)
+    z_min = float(heights[valid].min()) if valid.any() else 0.0
+    z_max = float(heights[valid].max()) if valid.any() else 0.0
+    z_step = (z_max - z_min) / 65534 or 1.0
+    band = np.zeros(heights.shape, dtype=np.uint16)
+    band[valid] = 1 + np.round((heights[valid] - z_min) / z_step).astype(np.uint16)
+    height, width = band.shape
+    if output_format == "geotiff":
+        import rasterio
+        with rasterio.open(
+            output_path, 'w', driver='GTiff', width=width, height=height, count=1, dtype='uint16',
+            crs='EPSG:3006', transform=from_bounds(*proj_extent, width, height), nodata=0,
+            compress='deflate', predictor=2, tiled=True, blockxsize=256, blockysize=256,
+        ) as dst:
+            dst.write(band, 1)
+            # Readers that honor scale/offset get meters directly
+            dst.scales = (z_step,)
+            dst.offsets = (z_min - z_step,)
+    elif output_format == "png":
+        Image.fromarray(band).save(output_path, 'PNG', optimize=True)
+    else:
+        raise ValueError(f"Unknown heightmap format '{output_format}'. Use png or geotiff")
+    return z_min, z_step
+
+def heightmap_info_path(heightmap_path):
+    return f"{os.path.splitext(heightmap_path)[0]}.json"
+
+def write_heightmap(mesh_file, project, proj_extent, heightmap_path, thumbnail_path, output_format, tiles=None, tris=None):
+    """Rasterize a mesh asset into its heightmap, sidecar and thumbnail (see create_heightmap)"""
+    if tris is None:
+        tris = read_stl_triangles(mesh_file.file_path)
+    tris, scale = mesh_to_project(tris, extents_to_array([mesh_file])[0], project)
+    heights = rasterize_heightmap(tris, proj_extent)
+    z_min, z_step = save_heightmap(heights, heightmap_path, proj_extent, output_format)
+    info = {
+        "z_min": z_min,
+        "z_max": float(np.nanmax(heights)) if np.isfinite(heights).any() else z_min,
+        "z_step": z_step,
+        "nodata": 0,
+        "mesh_scale": scale,
+        "size": [heights.shape[1], heights.shape[0]],
+        "tiles": tile_height_ranges(heights, proj_extent, tiles) if tiles else {},
+    }
+    with open(heightmap_info_path(heightmap_path), "w") as f:
+        json.dump(info, f)
+
+    shaded = matplotlib.colormaps["terrain"]((heights - z_min) / max(info["z_max"] - z_min, 1e-9))
+    shaded[~np.isfinite(heights)] = 0
+    with Image.fromarray((shaded[..., :3] * 255).astype(np.uint8)) as img:
+        img.thumbnail((200, 200))
+        img.save(thumbnail_path)
+
+def create_heightmap(mesh_file, project, unique_id, tiles=None, tris=None):
+    """
+    Heightmap asset of a mesh asset, on the project pixel grid.
+
+    Writes the 16-bit raster, a thumbnail and a JSON sidecar with the value
+    encoding and the min/max Z of each build tile, all in meters.
+
+    Args:
+        mesh_file: UploadedFile of the mesh (its extent places the mesh)
+        project: The mesh's project
+        unique_id: File name prefix for the heightmap and its thumbnail; existing
+            outputs with this prefix are reused (see derived_key)
+        tiles: Optional build tile extents (see build_tile_extents) for the per-tile ranges
+        tris: Mesh triangles, if already read
+
+    Returns:
+        The heightmap UploadedFile (not yet added to the session), or None
+        when the project has no extent
+    """
+    proj_extent = project_extent(project)
+    if proj_extent is None:
+        return None
+    output_format = HEIGHTMAP_FORMAT if HEIGHTMAP_FORMAT in ("png", "geotiff") else "png"
+    out_dir = build_dir(mesh_file.build_id) if mesh_file.build_id else "static/assets"
+    heightmap_path = f"{out_dir}/{unique_id}_height{RASTER_FORMATS[output_format]}"
+    thumbnail_path = f"static/assets/thumbnails/{unique_id}_height_thumb.png"
+    outputs = (heightmap_path, heightmap_info_path(heightmap_path), thumbnail_path)
+    if all(storage.exists(path) for path in outputs):
+        # Same mesh, placement and grid as an earlier upload
+        if os.path.exists(heightmap_path):
+            os.utime(heightmap_path)
+    else:
+        write_heightmap(mesh_file, project, proj_extent, heightmap_path, thumbnail_path, output_format, tiles, tris)
+
+    bounding_box, origin = format_extent(proj_extent)
+    return UploadedFile(
+        filename=Path(heightmap_path).name,
+        original_filename=f"{Path(mesh_file.original_filename).stem} heightmap{RASTER_FORMATS[output_format]}",
+        file_path=heightmap_path,
+        thumbnail_path=thumbnail_path,
+        file_type="heightmap",
+        bounding_box=bounding_box,
+        origin=origin,
+        placement_status=PLACEMENT_VALID,
+        visible=0,
+        uploaded_by=mesh_file.uploaded_by,
+        project_id=project.id,
+        build_id=mesh_file.build_id,
+    )
+
+def mesh_heightmap_key(mesh_file, project, params):
+    """File name prefix of an uploaded mesh's heightmap for the current project extent and table"""
+    return derived_key(mesh_file.sha256 or Path(mesh_file.file_path).stem, "height", mesh_file.bounding_box,
+                       mesh_file.origin, project.bounding_box, project.origin, project.table_dimension,
+                       RASTER_RESOLUTION, HEIGHTMAP_FORMAT, params)
+
+def refresh_mesh_heightmaps(project, db: Session):
+    """
+    Re-rasterize the heightmaps of a project's uploaded meshes after an extent or table edit.
+
+    Build heightmaps belong to their build's parameters and are left alone.
+    """
+    heightmaps = db.query(UploadedFile).filter(UploadedFile.project_id == project.id,
+                                               UploadedFile.file_type == "heightmap",
+                                               UploadedFile.build_id.is_(None)).all()
+    meshes = db.query(UploadedFile).filter(UploadedFile.project_id == project.id,
+                                           UploadedFile.file_type == "mesh",
+                                           UploadedFile.build_id.is_(None)).all()
+    for heightmap in heightmaps:
+        db.delete(heightmap)
+    params = tile_build_params(project)
+    for mesh_file in meshes:
+        if storage.fetch(mesh_file.file_path):
+            add_mesh_heightmap(mesh_file, project, mesh_heightmap_key(mesh_file, project, params), params, db)
+    db.commit()
+    if heightmaps:
+        schedule_asset_gc()
+
+def add_mesh_heightmap(mesh_file, project, unique_id, params, db: Session):
+    """Add a mesh's heightmap asset to the session; a failed heightmap does not fail the mesh"""
+    try:
+        tiles = build_tile_extents(project, params) if params else None
+        heightmap = create_heightmap(mesh_file, project, unique_id, tiles=tiles)
+    except Exception as e:
+        print(f"Error creating heightmap: {e}")
+        return None
+    if heightmap is not None:
+        db.add(heightmap)
+        publish_file(heightmap)
+    return heightmap
+
+def attach_build_files(build, project, db: Session):
+    """Add the build's tile STLs, the scaled city mesh, its heightmap and a table preview to the project as UploadedFile rows"""
+    params = json.loads(build.params)
+    out_dir = Path(build_dir(build.id))
+    tile_extents = build_tile_extents(project, params)
+    os.makedirs("static/assets/thumbnails", exist_ok=True)
+    
+    files = []
+    for stl in sorted((out_dir / "tiles").glob("tile_*.stl")):
+        col, row = (int(v) for v in stl.stem.split("_")[1:3])
+        bounding_box, origin = format_extent(tile_extents[col, row])
+        thumbnail_path = f"static/assets/thumbnails/build{build.id}_{stl.stem}_thumb.png"
+        render_mesh_preview(stl, thumbnail_path, size=(200, 200), tris=build_mesh_lod(stl))
+        files.append(UploadedFile(
+            filename=stl.name,
+            original_filename=f"Build {build.id} {stl.name}",
+            file_path=stl.as_posix(),
+            thumbnail_path=thumbnail_path,
+            file_type="tile",
+            bounding_box=bounding_box,
+            origin=origin,
+            placement_status=PLACEMENT_VALID,
+            visible=0,
+        ))
+    
+    scaled_mesh = out_dir / "scaled_mesh.stl"
+    preview_path = out_dir / "preview.png"
+    if scaled_mesh.exists() and render_mesh_preview(scaled_mesh, preview_path, size=(1200, 1200)):
+        thumbnail_path = f"static/assets/thumbnails/build{build.id}_preview_thumb.jpg"
+        generate_image_thumbnail(str(preview_path), thumbnail_path)
+        bounding_box, origin = format_extent(extent)
+        files.append(UploadedFile(
+            filename=preview_path.name,
+            original_filename=f"Build {build.id} preview.png",
+            file_path=preview_path.as_posix(),
+            thumbnail_path=thumbnail_path,
+            file_type="preview",
+            bounding_box=bounding_box,
+            origin=origin,
+            placement_status=PLACEMENT_VALID,
+            visible=0,
+        ))
+        thumbnail_path = f"static/assets/thumbnails/build{build.id}_scaled_mesh_thumb.png"
+        render_mesh_preview(scaled_mesh, thumbnail_path, size=(200, 200), tris=build_mesh_lod(scaled_mesh))
+        files.append(UploadedFile(
+            filename=scaled_mesh.name,
+            original_filename=f"Build {build.id} scaled_mesh.stl",
+            file_path=scaled_mesh.as_posix(),
+            thumbnail_path=thumbnail_path,
+            file_type="mesh",
+            bounding_box=bounding_box,
+            origin=origin,
+            placement_status=PLACEMENT_VALID,
+            visible=0,
+        ))
+    
+    for uploaded_file in files:
+        uploaded_file.uploaded_by = build.created_by
+        uploaded_file.project_id = project.id
+        uploaded_file.build_id = build.id
+        db.add(uploaded_file)
+        publish_file(uploaded_file)
+    for mesh_file in [f for f in files if f.file_type == "mesh"]:
+        heightmap = add_mesh_heightmap(mesh_file, project, f"build{build.id}_scaled_mesh", params, db)
+        if heightmap is not None:
+            files.append(heightmap)
+    db.commit()
+    return files
+
+def run_tile_build(build_id):
+    """Worker: run the mesh + tile pipeline for one build, recording progress as it goes"""
+    db = SessionLocal()
+    build = db.query(TileBuild).filter(TileBuild.id == build_id).first()
+    try:
+        params = json.loads(build.params)
+        build.status = "running"
+        build.message = "Starting pipeline…"
+        db.commit()
+        
+        out_dir = Path(build_dir(build.id)).resolve()
+        cmd = [
+            PIPELINE_PYTHON, str(PIPELINE_SCRIPT.resolve()),
+            "--project", str(build.project_id), "--db", sqlite_database_path(), "--jobs", "1",
+            "--set", f"name=build_{build.id}", "--set", f'output_dir="{out_dir.as_posix()}"',
+            "--set", f"tile_size={params['tile_size']}",
+        ]
+        if "max_mesh_size" in params:
+            cmd += ["--set", f"max_mesh_size={params['max_mesh_size']}"]
+        
+        proc = subprocess.Popen(cmd, cwd=str(PIPELINE_SCRIPT.resolve().parent.parent),
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        total = params["tiles_x"] * params["tiles_y"]
+        tiles_done, tiles_failed = 0, 0
+        tail = deque(maxlen=20)
+        for line in proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            tail.append(line)
+            if line.startswith(("TILE_OK", "TILE_EMPTY", "TILE_FAILED")):
+                # Meshing is the first half of the build, tiling the second
+                tiles_done += 1
+                tiles_failed += line.startswith("TILE_FAILED")
+                build.progress = 50 + min(50 * tiles_done // total, 49)
+                build.message = f"Tiles {tiles_done}/{total}"
+            elif not line.startswith(("Exported", "Unchanged", "JOB_", "TILE_")):
+                build.progress = min((build.progress or 0) + 5, 45) if tiles_done == 0 else build.progress
+                build.message = line[:200]
+            else:
+                continue
+            db.commit()
+        
+        if proc.wait() != 0:
+            raise RuntimeError("Pipeline failed: " + " | ".join(list(tail)[-3:]))
+        
+        project = db.query(Project).filter(Project.id == build.project_id).first()
+        files = attach_build_files(build, project, db)
+        build.status = "done"
+        build.progress = 100
+        build.message = f"{sum(f.file_type == 'tile' for f in files)} tile(s) built"
+        if tiles_failed:
+            build.message += f", {tiles_failed} failed"
+    except Exception as e:
+        db.rollback()
+        build.status = "failed"
+        build.message = str(e)[:500]
+    finally:
+        build.finished_at = datetime.utcnow()
+        db.commit()
+        db.close()
+
+def cached_build(project, params_hash, db: Session):
+    """A finished or in-progress build of the same parameters whose outputs still exist"""
+    builds = db.query(TileBuild).filter(
+        TileBuild.project_id == project.id,
+        TileBuild.params_hash == params_hash,
+        TileBuild.status.in_(("queued", "running", "done")),
+    ).order_by(TileBuild.created_at.desc()).all()
+    for build in builds:
+        if build.status != "done":
+            return build
+        files = db.query(UploadedFile).filter(UploadedFile.build_id == build.id).all()
+        if files and all(storage.exists(f.file_path) for f in files):
+            return build
+    return None
+
+def build_status(build, db: Session):
+    files = db.query(UploadedFile).filter(UploadedFile.build_id == build.id).all()
+    return {
+        "build_id": build.id,
+        "status": build.status,
+        "progress": build.progress or 0,
+        "message": build.message,
+        "params": json.loads(build.params),
+        "created_at": build.created_at.isoformat() if build.created_at else None,
+        "finished_at": build.finished_at.isoformat() if build.finished_at else None,
+        "files": [{"id": f.id, "filename": f.original_filename, "file_type": f.file_type, "url": asset_url(f.file_path)} for f in files],
+    }
+
+@app.post("/projects/{project_id}/builds")
+async def start_tile_build(
+    project_id: int,
+    max_mesh_size: float = Form(None),
+    tile_size: float = Form(None),
+    request: Request = None,
+    db: Session = Depends(get_db)
+):
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+    
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        return JSONResponse(content={"error": "Project not found"}, status_code=404)
+    if not user.is_admin and project.created_by != user.username:
+        return JSONResponse(content={"error": "Permission denied"}, status_code=403)
+    
+    if (max_mesh_size is not None and max_mesh_size <= 0) or (tile_size is not None and tile_size <= 0):
+        return JSONResponse(content={"error": "Mesh size and tile size must be positive"}, status_code=400)
+    params = tile_build_params(project, max_mesh_size, tile_size)
+    if params is None:
+        return JSONResponse(content={"error": "Project needs a bounding box and a table dimension"}, status_code=400)
+    if sqlite_database_path() is None:
+        return JSONResponse(content={"error": "Tile builds need a SQLite database"}, status_code=400)
+    
+    params_json = json.dumps(params, sort_keys=True)
+    params_hash = hashlib.sha256(params_json.encode()).hexdigest()
+    build = cached_build(project, params_hash, db)
+    if build:
+        return JSONResponse(content={**build_status(build, db), "cached": True})
+    
+    build = TileBuild(params=params_json, params_hash=params_hash, created_by=user.username, project_id=project.id)
+    db.add(build)
+    db.commit()
+    build_executor.submit(run_tile_build, build.id)
+    return JSONResponse(content={**build_status(build, db), "cached": False})
+
+@app.get("/projects/{project_id}/builds/{build_id}")
+async def get_tile_build(project_id: int, build_id: int, request: Request, db: Session = Depends(get_db)):
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+    
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        return JSONResponse(content={"error": "Project not found"}, status_code=404)
+    if not user_can_access_project(user, project, db):
+        return JSONResponse(content={"error": "Permission denied"}, status_code=403)
+    
+    build = db.query(TileBuild).filter(TileBuild.id == build_id, TileBuild.project_id == project_id).first()
+    if not build:
+        return JSONResponse(content={"error": "Build not found"}, status_code=404)
+    return JSONResponse(content=build_status(build, db))
+
+@app.get("/files/{file_id}/heightmap")
+async def get_heightmap(file_id: int, request: Request, col: int = None, row: int = None, db: Session = Depends(get_db)):
+    """Value encoding and per-tile min/max Z of a heightmap, or the range of one tile with col/row"""
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+    
+    uploaded_file = db.query(UploadedFile).filter(UploadedFile.id == file_id, UploadedFile.file_type == "heightmap").first()
+    if not uploaded_file or not storage.fetch(heightmap_info_path(uploaded_file.file_path)):
+        return JSONResponse(content={"error": "Heightmap not found"}, status_code=404)
+    project = db.query(Project).filter(Project.id == uploaded_file.project_id).first()
+    if not project or not user_can_access_project(user, project, db):
+        return JSONResponse(content={"error": "Permission denied"}, status_code=403)
+    
+    with open(heightmap_info_path(uploaded_file.file_path)) as f:
+        info = json.load(f)
+    if col is not None and row is not None:
+        z_range = info["tiles"].get(f"{col},{row}")
+        if z_range is None:
+            return JSONResponse(content={"error": "No heights for this tile"}, status_code=404)
+        return JSONResponse(content={"col": col, "row": row, "z_min": z_range[0], "z_max": z_range[1]})
+    return JSONResponse(content=dict(info, url=asset_url(uploaded_file.file_path)))
+
+@app.get("/files/{file_id}/lod")
+async def get_mesh_lod(file_id: int, request: Request, db: Session = Depends(get_db)):
+    """Level-of-detail index of a mesh for the web viewer, with a URL for each chunk"""
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+    
+    uploaded_file = db.query(UploadedFile).filter(UploadedFile.id == file_id,
+                                                  UploadedFile.file_type.in_(("mesh", "tile"))).first()
+    lod_dir = mesh_lod_dir(uploaded_file.file_path) if uploaded_file else None
+    if not uploaded_file or not storage.fetch(f"{lod_dir}/lod.json"):
+        return JSONResponse(content={"error": "Mesh preview not found"}, status_code=404)
+    project = db.query(Project).filter(Project.id == uploaded_file.project_id).first()
+    if not project or not user_can_access_project(user, project, db):
+        return JSONResponse(content={"error": "Permission denied"}, status_code=403)
+    
+    with open(f"{lod_dir}/lod.json") as f:
+        lod = json.load(f)
+    for chunk in lod["chunks"]:
+        chunk["url"] = asset_url(f"{lod_dir}/{chunk['file']}")
+    return JSONResponse(content=lod)
+
+def fail_interrupted_builds():
+    """Builds still queued or running when the server stopped will never finish"""
+    db = SessionLocal()
+    try:
+        for build in db.query(TileBuild).filter(TileBuild.status.in_(("queued", "running"))).all():
+            build.status = "failed"
+            build.message = "Interrupted by a server restart"
+        db.commit()
+    finally:
+        db.close()
+
 def init_admin_user():
     db = SessionLocal()
     try:
@@ -917,5 +2687,7 @@ def init_admin_user():
 
 if __name__ == "__main__":
     admin_password = init_admin_user()
+    fail_interrupted_builds()
+    start_asset_gc()
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
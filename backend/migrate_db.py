@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Database migration script to add processed_size column
+Database migration script to add new columns
 Run this on your deployment to update the existing database
 """
 
@@ -9,6 +9,16 @@ import os
 import shutil
 from datetime import datetime
 
+# (table, column, SQL type) - applied in order, skipped if already present
+COLUMNS = [
+    ("uploaded_files", "processed_size", "VARCHAR"),
+    ("uploaded_files", "placement_status", "VARCHAR"),
+    ("uploaded_files", "visible", "INTEGER DEFAULT 1"),
+    ("uploaded_files", "raster_options", "VARCHAR"),
+    ("uploaded_files", "build_id", "INTEGER"),
+    ("uploaded_files", "sha256", "VARCHAR"),
+]
+
 def migrate_database():
     db_path = 'users.db'
     
@@ -27,27 +37,27 @@ def migrate_database():
     cursor = conn.cursor()
     
     try:
-        # Check if column already exists
-        cursor.execute("PRAGMA table_info(uploaded_files)")
-        columns = cursor.fetchall()
-        column_names = [col[1] for col in columns]
-        
-        if 'processed_size' in column_names:
-            print("✅ Column 'processed_size' already exists. No migration needed.")
-        else:
-            # Add the new column
-            cursor.execute("ALTER TABLE uploaded_files ADD COLUMN processed_size VARCHAR")
-            conn.commit()
-            print("✅ Added 'processed_size' column to uploaded_files table")
-            print("✅ Migration completed successfully!")
+        for table, column, column_type in COLUMNS:
+            # Check if column already exists
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = cursor.fetchall()
+            column_names = [col[1] for col in columns]
+            
+            if not column_names:
+                print(f"ℹ️ Table '{table}' doesn't exist yet. It will be created on first run.")
+            elif column in column_names:
+                print(f"✅ Column '{column}' already exists. No migration needed.")
+            else:
+                # Add the new column
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+                conn.commit()
+                print(f"✅ Added '{column}' column to {table} table")
+        print("✅ Migration completed successfully!")
     
     except sqlite3.OperationalError as e:
-        if "no such table: uploaded_files" in str(e):
-            print("ℹ️ Table 'uploaded_files' doesn't exist yet. It will be created on first run.")
-        else:
-            print(f"❌ Error during migration: {e}")
-            print(f"ℹ️ Restore from backup if needed: {backup_path}")
-            return
+        print(f"❌ Error during migration: {e}")
+        print(f"ℹ️ Restore from backup if needed: {backup_path}")
+        return
     
     finally:
         conn.close()
@@ -0,0 +1,57 @@
+"""
+Shared fixtures: the app runs in a scratch directory with its own SQLite database.
+"""
+
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    # The app works relative to the current directory (static/assets, templates)
+    work_dir = tmp_path_factory.mktemp("backend")
+    (work_dir / "static" / "assets" / "thumbnails").mkdir(parents=True)
+    (work_dir / "templates").symlink_to(BACKEND_DIR / "templates")
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{work_dir / 'test.db'}"
+    os.environ["STORAGE_BACKEND"] = "local"
+    sys.path.insert(0, str(BACKEND_DIR))
+    try:
+        yield importlib.import_module("app")
+    finally:
+        sys.path.remove(str(BACKEND_DIR))
+        os.chdir(previous_dir)
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    db = app.SessionLocal()
+    db.add(app.User(username="tester", hashed_password=app.get_password_hash("secret"), is_admin=1))
+    db.commit()
+    db.close()
+    client = TestClient(app.app)
+    client.post("/login", data={"username": "tester", "password": "secret"})
+    return client
+
+
+@pytest.fixture(scope="session")
+def create_project(app):
+    """Add a project owned by the test user and return its id"""
+    def create(bounding_box, origin, table_dimension="0.6 x 1.0"):
+        db = app.SessionLocal()
+        project = app.Project(name="Test", description="Test project", bounding_box=bounding_box,
+                              origin=origin, table_dimension=table_dimension, created_by="tester")
+        db.add(project)
+        db.commit()
+        project_id = project.id
+        db.close()
+        return project_id
+    return create
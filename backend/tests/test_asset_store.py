@@ -0,0 +1,110 @@
+"""
+Identical uploads share one blob, and the collector only removes files nothing uses.
+
+Run from backend/:  python -m pytest -q tests
+"""
+
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+
+
+def upload_png(client, project_id, color, name):
+    png = io.BytesIO()
+    Image.new("RGB", (300, 200), color).save(png, "PNG")
+    response = client.post("/ingest/direct", data={"project_id": project_id, "bounding_box": "300 x 200",
+                                                   "origin": "1000, 2000"},
+                           files={"file": (name, png.getvalue(), "image/png")})
+    assert response.status_code == 200, response.json()
+    return response.json()["file_id"]
+
+
+def flat_stl(z):
+    corners = [(1000, 2000, z), (1300, 2000, z), (1300, 2200, z), (1000, 2200, z)]
+    stl = "solid flat\n"
+    for a, b, c in ((0, 1, 2), (0, 2, 3)):
+        stl += "facet normal 0 0 1\nouter loop\n"
+        stl += "".join(f"vertex {x} {y} {z}\n" for x, y, z in (corners[a], corners[b], corners[c]))
+        stl += "endloop\nendfacet\n"
+    return (stl + "endsolid flat\n").encode()
+
+
+def write(path, data=b"x"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (time.time() - 60, time.time() - 60))  # Past the grace period however coarse the clock
+    return path
+
+
+@pytest.fixture
+def collect(app, monkeypatch):
+    """Run the collector with no grace period, after any sweep a delete scheduled"""
+    monkeypatch.setattr(app, "ASSET_GC_GRACE", 0)
+    def run():
+        app.asset_gc_executor.submit(lambda: None).result()
+        return app.collect_orphaned_assets()
+    return run
+
+
+def blob_of(app, file_id):
+    db = app.SessionLocal()
+    try:
+        uploaded_file = db.get(app.UploadedFile, file_id)
+        return db.query(app.Blob).filter(app.Blob.path == app.source_asset_path(uploaded_file)).one()
+    finally:
+        db.close()
+
+
+def test_identical_uploads_share_one_blob(app, client, create_project, collect):
+    first = upload_png(client, create_project("300 x 200", "1000, 2000"), (10, 20, 30), "first.png")
+    second = upload_png(client, create_project("300 x 200", "1000, 2000"), (10, 20, 30), "second.png")
+    blob = blob_of(app, first)
+    assert blob.path == blob_of(app, second).path
+    assert blob.ref_count == 2
+    db = app.SessionLocal()
+    assert db.get(app.UploadedFile, first).file_path == db.get(app.UploadedFile, second).file_path
+    db.close()
+
+    # Deleting one upload keeps the blob and the shared derived files for the other
+    assert client.delete(f"/files/{first}").status_code == 200
+    collect()
+    assert blob_of(app, second).ref_count == 1
+    db = app.SessionLocal()
+    remaining = db.get(app.UploadedFile, second)
+    assert all(os.path.exists(key) for key in app.asset_keys(remaining))
+    db.close()
+
+    # Deleting the last one leaves both the blob file and its row to the collector
+    client.delete(f"/files/{second}")
+    collect()
+    assert not os.path.exists(blob.path)
+    db = app.SessionLocal()
+    assert db.query(app.Blob).filter(app.Blob.path == blob.path).first() is None
+    db.close()
+
+
+def test_collector_keeps_live_folders_and_removes_orphans(app, client, create_project, collect):
+    project_id = create_project("300 x 200", "1000, 2000")
+    response = client.post("/ingest/direct", data={"project_id": project_id},
+                           files={"file": ("flat.stl", flat_stl(7), "application/octet-stream")})
+    assert response.status_code == 200, response.json()
+    db = app.SessionLocal()
+    mesh_path = db.get(app.UploadedFile, response.json()["file_id"]).file_path
+    build = app.TileBuild(params="{}", status="done", project_id=project_id, created_by="tester")
+    db.add(build)
+    db.commit()
+    build_file = write(f"{app.build_dir(build.id)}/tiles/tile_0_0.stl")
+    db.close()
+
+    orphans = [write("static/assets/orphan_grid.png"), write("static/assets/thumbnails/orphan_thumb.jpg"),
+               write("static/assets/orphan_lod/lod.json"), write("static/assets/builds/999999/tiles/tile_0_0.stl")]
+    assert collect() >= len(orphans)
+    assert not any(os.path.exists(path) for path in orphans)
+    assert not os.path.exists("static/assets/builds/999999")
+    assert os.path.exists(build_file)
+    assert os.path.exists(f"{app.mesh_lod_dir(mesh_path)}/lod.json")
+    assert os.path.exists(mesh_path)
@@ -0,0 +1,29 @@
+"""
+Build tiles attached to a project sit where the pipeline prints them.
+
+Run from backend/:  python -m pytest -q tests
+"""
+
+import numpy as np
+
+
+def test_tiles_follow_print_size_on_uneven_table(app):
+    # 0.7 m is not a whole number of 0.2 m tiles: the pipeline prints 3 tiles of 0.2 m at 1:1000
+    project = app.Project(bounding_box="700 x 1000", origin="1000, 2000", table_dimension="0.7 x 1.0")
+    params = app.tile_build_params(project, tile_size=0.2)
+    assert (params["tiles_x"], params["tiles_y"]) == (3, 5)
+
+    tiles = app.build_tile_extents(project, params)
+    np.testing.assert_allclose(tiles[0, 0], (1000, 2000, 1200, 2200))
+    np.testing.assert_allclose(tiles[2, 4], (1400, 2800, 1600, 3000))
+
+
+def test_tile_height_ranges_use_tile_extents(app):
+    project = app.Project(bounding_box="700 x 1000", origin="0, 0", table_dimension="0.7 x 1.0")
+    # Three 0.25 m tiles reach 50 m past the right edge
+    tiles = app.build_tile_extents(project, app.tile_build_params(project, tile_size=0.25))
+    # 1 m pixels, row 0 at the top; heights rise with x
+    heights = np.tile(np.arange(700, dtype=np.float32), (1000, 1))
+    ranges = app.tile_height_ranges(heights, app.project_extent(project), tiles)
+    assert ranges["0,0"] == [0.0, 249.0]
+    assert ranges["2,3"] == [500.0, 699.0]  # Only the part inside the project counts
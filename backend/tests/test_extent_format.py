@@ -0,0 +1,53 @@
+"""
+Extent strings parse the same way in the backend and in the pipeline (scripts/extent_format.py).
+
+Run from backend/:  python -m pytest -q tests
+"""
+
+import ast
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent.parent / "scripts"
+sys.path.append(str(SCRIPTS_DIR))
+
+from extent_format import parse_bounding_box, parse_origin
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("750 x 1250", (750.0, 1250.0)),
+    ("750x1250", (750.0, 1250.0)),
+    ("0.6 × 1.0", (0.6, 1.0)),
+    ("200.0 X 100.0", (200.0, 100.0)),
+    ("240.0,140.0", (240.0, 140.0)),  # GeoPackage uploads
+    ("", (None, None)),
+    (None, (None, None)),
+    ("750 x 1250 x 3", (None, None)),
+    ("wide x tall", (None, None)),
+])
+def test_parse_bounding_box(value, expected):
+    assert parse_bounding_box(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("319470, 6397410", (319470.0, 6397410.0)),
+    ("(319470.5,6397410)", (319470.5, 6397410.0)),
+    ("", (None, None)),
+    (None, (None, None)),
+    ("319470", (None, None)),
+])
+def test_parse_origin(value, expected):
+    assert parse_origin(value) == expected
+
+
+@pytest.mark.parametrize("module", ["backend/app.py", "scripts/pipeline.py"])
+def test_no_private_copies(module):
+    # Both sides must import the shared parsers rather than define their own
+    tree = ast.parse((SCRIPTS_DIR.parent / module).read_text())
+    defined = {node.name for node in tree.body if isinstance(node, ast.FunctionDef)}
+    imported = {alias.name for node in tree.body if isinstance(node, ast.ImportFrom)
+                and node.module == "extent_format" for alias in node.names}
+    assert not defined & {"parse_bounding_box", "parse_origin"}
+    assert imported == {"parse_bounding_box", "parse_origin"}
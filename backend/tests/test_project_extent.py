@@ -0,0 +1,123 @@
+"""
+Editing a project's extent keeps its image layers on the project pixel grid.
+
+Run from backend/:  python -m pytest -q tests
+"""
+
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+
+def composite(client, project_id):
+    response = client.get(f"/projects/{project_id}/composite")
+    assert response.status_code == 200
+    return np.asarray(Image.open(io.BytesIO(response.content)).convert("RGB"))
+
+
+def test_extent_edit_keeps_image_layer_in_composite(app, client, create_project):
+    project_id = create_project("300 x 200", "1000, 2000")
+    png = io.BytesIO()
+    Image.new("RGB", (300, 200), (255, 0, 0)).save(png, "PNG")
+    response = client.post("/ingest/direct", data={"project_id": project_id, "bounding_box": "300 x 200",
+                                                   "origin": "1000, 2000"},
+                           files={"file": ("red.png", png.getvalue(), "image/png")})
+    assert response.status_code == 200, response.json()
+    file_id = response.json()["file_id"]
+    assert composite(client, project_id)[..., 0].min() == 255
+
+    # Shrink the project and move its origin into the image
+    response = client.put(f"/projects/{project_id}", data={"name": "Extent", "description": "Extent edit",
+                                                          "bounding_box": "200 x 100", "origin": "1050, 2050",
+                                                          "table_dimension": "0.6 x 1.0"})
+    assert response.status_code == 200
+
+    pixels = composite(client, project_id)
+    assert pixels.shape[:2] == (100, 200)
+    assert pixels[..., 0].min() == 255
+
+    db = app.SessionLocal()
+    uploaded_file = db.get(app.UploadedFile, file_id)
+    project = db.get(app.Project, project_id)
+    extent = app.extents_to_array([uploaded_file])[0]
+    assert uploaded_file.placement_status == app.PLACEMENT_VALID
+    assert uploaded_file.file_path == app.aligned_file_path(uploaded_file, extent, project)
+    db.close()
+
+
+def test_extent_edit_rerasterizes_geopackage_layer(app, client, create_project, tmp_path):
+    import geopandas as gpd
+    from shapely.geometry import box
+    project_id = create_project("300 x 200", "1000, 2000")
+    gpkg_path = tmp_path / "block.gpkg"
+    gpd.GeoDataFrame(geometry=[box(1020, 2020, 1260, 2160)], crs="EPSG:3006").to_file(gpkg_path, driver="GPKG")
+    response = client.post("/ingest/direct", data={"project_id": project_id},
+                           files={"file": ("block.gpkg", gpkg_path.read_bytes(), "application/octet-stream")})
+    assert response.status_code == 200, response.json()
+    file_id = response.json()["file_id"]
+    assert composite(client, project_id).max() > 0
+
+    client.put(f"/projects/{project_id}", data={"name": "Extent", "description": "Extent edit",
+                                                "bounding_box": "200 x 100", "origin": "1050, 2050",
+                                                "table_dimension": "0.6 x 1.0"})
+    pixels = composite(client, project_id)
+    assert pixels.shape[:2] == (100, 200)
+    assert pixels.max() > 0
+
+    db = app.SessionLocal()
+    uploaded_file = db.get(app.UploadedFile, file_id)
+    project = db.get(app.Project, project_id)
+    extent = app.extents_to_array([uploaded_file])[0]
+    np.testing.assert_allclose(extent, [1020, 2020, 1260, 2160])
+    assert uploaded_file.placement_status in (app.PLACEMENT_VALID, app.PLACEMENT_PARTIAL)
+    assert uploaded_file.file_path == app.aligned_file_path(uploaded_file, extent, project)
+    db.close()
+
+
+def test_extent_edit_flags_layer_that_cannot_be_rederived(app, client, create_project):
+    project_id = create_project("300 x 200", "1000, 2000")
+    png = io.BytesIO()
+    Image.new("RGB", (300, 200), (0, 255, 0)).save(png, "PNG")
+    file_id = client.post("/ingest/direct", data={"project_id": project_id, "bounding_box": "300 x 200",
+                                                  "origin": "1000, 2000"},
+                          files={"file": ("green.png", png.getvalue(), "image/png")}).json()["file_id"]
+    db = app.SessionLocal()
+    os.remove(app.source_asset_path(db.get(app.UploadedFile, file_id)))
+    db.close()
+
+    client.put(f"/projects/{project_id}", data={"name": "Extent", "description": "Extent edit",
+                                                "bounding_box": "200 x 100", "origin": "1050, 2050",
+                                                "table_dimension": "0.6 x 1.0"})
+    assert composite(client, project_id).max() == 0
+    db = app.SessionLocal()
+    assert db.get(app.UploadedFile, file_id).placement_status == app.PLACEMENT_MISALIGNED
+    db.close()
+
+
+def test_extent_edit_rerasterizes_mesh_heightmap(app, client, create_project):
+    project_id = create_project("300 x 200", "1000, 2000")
+    # Two triangles covering the project at z = 5
+    corners = [(1000, 2000, 5), (1300, 2000, 5), (1300, 2200, 5), (1000, 2200, 5)]
+    stl = "solid flat\n"
+    for a, b, c in ((0, 1, 2), (0, 2, 3)):
+        stl += "facet normal 0 0 1\nouter loop\n"
+        stl += "".join(f"vertex {x} {y} {z}\n" for x, y, z in (corners[a], corners[b], corners[c]))
+        stl += "endloop\nendfacet\n"
+    stl += "endsolid flat\n"
+    response = client.post("/ingest/direct", data={"project_id": project_id},
+                           files={"file": ("flat.stl", stl.encode(), "application/octet-stream")})
+    assert response.status_code == 200, response.json()
+
+    client.put(f"/projects/{project_id}", data={"name": "Extent", "description": "Extent edit",
+                                                "bounding_box": "200 x 100", "origin": "1050, 2050",
+                                                "table_dimension": "0.6 x 1.0"})
+    db = app.SessionLocal()
+    heightmap = db.query(app.UploadedFile).filter_by(project_id=project_id, file_type="heightmap").one()
+    assert (heightmap.bounding_box, heightmap.origin) == ("200.0 x 100.0", "1050.0, 2050.0")
+    heightmap_id = heightmap.id
+    db.close()
+    info = client.get(f"/files/{heightmap_id}/heightmap").json()
+    assert info["size"] == [200, 100]
+    assert abs(info["z_max"] - 5) < 1e-3
@@ -0,0 +1,97 @@
+"""
+The S3 storage driver against moto's in-memory S3, standing in for MinIO or AWS.
+
+Run from backend/:  python -m pytest -q tests
+"""
+
+import os
+from urllib.parse import urlparse
+
+import pytest
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+
+@pytest.fixture
+def s3(app, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(app, "S3_ENDPOINT_URL", None)
+    monkeypatch.setattr(app, "S3_REGION", "us-east-1")
+    monkeypatch.setattr(app, "S3_BUCKET", "dtcc-table-test")
+    monkeypatch.setattr(app, "S3_PREFIX", "test/")
+    with moto.mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="dtcc-table-test")
+        yield app.S3Storage()
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def objects(storage):
+    return sorted(key for key, _ in storage.list("static/assets/s3"))
+
+
+def test_put_fetch_round_trip(s3):
+    key = write("static/assets/s3/roundtrip/a.png", b"a" * 1000)
+    s3.put(key)
+    assert s3.exists(key)
+    assert s3.exists("static/assets/s3/roundtrip")  # A folder with a stored file
+    assert not s3.exists("static/assets/s3/round")  # Not a folder, only a prefix of one
+
+    os.remove(key)
+    assert s3.fetch(key) == key
+    with open(key, "rb") as f:
+        assert f.read() == b"a" * 1000
+    assert s3.fetch("static/assets/s3/roundtrip/missing.png") is None
+    assert not os.path.exists("static/assets/s3/roundtrip/missing.png")
+
+
+def test_eviction_skips_leased_and_unpublished_copies(app, s3, monkeypatch):
+    monkeypatch.setattr(app, "ASSET_CACHE_BYTES", 250)
+    monkeypatch.setattr(app, "ASSET_CACHE_LEASE", 3600)
+    a, b, c, d = (write(f"static/assets/s3/cache/{name}.bin", b"x" * 100) for name in "abcd")
+    for key in (a, b, c):
+        s3.put(key)
+    # Over the budget, but every copy was just used
+    assert all(os.path.exists(key) for key in (a, b, c))
+
+    # Leases run out; a is then rewritten locally and not uploaded again yet
+    for key, (size, mtime, used) in list(s3.cache.items()):
+        s3.cache[key] = (size, mtime, used - 7200)
+    write(a, b"y" * 100)
+    os.utime(a, (os.path.getatime(a), os.path.getmtime(a) + 5))
+    s3.put(d)
+
+    assert os.path.exists(a)  # Unpublished: no longer tracked, but kept
+    assert not os.path.exists(b)  # Least recently used
+    assert os.path.exists(c) and os.path.exists(d)
+    assert list(s3.cache) == [c, d] and s3.cache_bytes == 200
+    assert s3.fetch(b) == b  # Evicted copies come back from the bucket
+
+
+def test_presigned_url(app, s3, monkeypatch):
+    monkeypatch.setattr(app, "ASSET_URL_TTL", 120)
+    key = write("static/assets/s3/url/a.png", b"png")
+    s3.put(key)
+    url = urlparse(s3.url(key))
+    assert url.path.endswith("/test/static/assets/s3/url/a.png")
+    assert "Signature=" in url.query and "Expires=" in url.query
+
+
+def test_delete_build_prefix(s3):
+    files = [write(f"static/assets/s3/builds/{build}/tiles/tile_0_{i}.stl", b"stl") for build in (7, 70) for i in range(2)]
+    s3.put("static/assets/s3/builds/7")
+    s3.put("static/assets/s3/builds/70")
+    assert len(objects(s3)) == 4
+
+    s3.delete("static/assets/s3/builds/7")
+    assert objects(s3) == files[2:]  # builds/70 only shares the prefix
+    assert not os.path.exists("static/assets/s3/builds/7")
+    assert all(os.path.exists(path) for path in files[2:])
+    assert not any(key.startswith("static/assets/s3/builds/7/") for key in s3.cache)
@@ -0,0 +1,29 @@
+"""
+Uploads with bad form options are rejected before anything is stored.
+
+Run from backend/:  python -m pytest -q tests
+"""
+
+import os
+
+import pytest
+
+
+def stored_files():
+    return {os.path.join(root, name) for root, _, names in os.walk("static/assets") for name in names}
+
+
+@pytest.mark.parametrize("filename, form, error", [
+    ("roads.gpkg", {"raster_format": "bmp"}, "Unknown raster format"),
+    ("roads.gpkg", {"raster_colormap": "no-such-map"}, "Unknown colormap"),
+    ("photo.png", {}, "Bounding box and origin required"),
+    ("photo.png", {"bounding_box": "100 x 100", "origin": "5000, 5000"}, ""),
+])
+def test_bad_options_store_nothing(app, client, create_project, filename, form, error):
+    project_id = create_project("300 x 200", "1000, 2000")
+    before = stored_files()
+    response = client.post("/ingest/direct", data={"project_id": project_id, **form},
+                           files={"file": (filename, repr(form).encode(), "application/octet-stream")})
+    assert response.status_code == 400
+    assert error in response.json()["error"]
+    assert stored_files() == before
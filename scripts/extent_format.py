@@ -0,0 +1,41 @@
+"""
+Parse the extent strings stored on backend projects and uploads.
+
+Shared by backend/app.py and pipeline.py, so a format accepted by one is
+accepted by the other. Pure Python on purpose: the pipeline may run in a
+different environment from the backend.
+
+- bounding_box / table_dimension: 'width x height' (or 'width × height');
+  GeoPackage uploads store 'width,height'.
+- origin: 'x, y' or '(x, y)'.
+"""
+
+
+def parse_bounding_box(bbox_str):
+    """Parse bounding box string 'width x height' (GeoPackages store 'width,height') and return (width, height) as floats"""
+    if not bbox_str:
+        return None, None
+    try:
+        bbox_str = bbox_str.lower().replace('×', 'x')
+        parts = bbox_str.split('x') if 'x' in bbox_str else bbox_str.split(',')
+        if len(parts) != 2:
+            return None, None
+        width = float(parts[0].strip())
+        height = float(parts[1].strip())
+        return width, height
+    except (AttributeError, ValueError):
+        return None, None
+
+def parse_origin(origin_str):
+    """Parse origin string 'x, y' and return (x, y) as floats"""
+    if not origin_str:
+        return None, None
+    try:
+        parts = origin_str.replace('(', '').replace(')', '').split(',')
+        if len(parts) != 2:
+            return None, None
+        x = float(parts[0].strip())
+        y = float(parts[1].strip())
+        return x, y
+    except (AttributeError, ValueError):
+        return None, None
@@ -5,17 +5,34 @@ Generate a printable, scaled city mesh from pointcloud + footprints using DTCC.
 - Computes bounds from tile layout at a given print scale.
 - Downloads pointcloud, builds terrain, extracts roof points & heights.
 - Builds a city mesh, saves it, scales it to print scale, recenters to origin.
+- Caches the pointcloud, filtered pointcloud, terrain raster and building heights
+  in output/cache, keyed by the bounds and each stage's parameters. Only stages
+  downstream of a changed parameter re-run, and a seeded cache works offline.
+- Optionally (PARALLEL_TILES) meshes each print tile's region in its own process
+  and stitches the clipped pieces along the tile seams, so large tables scale
+  across cores and stay within RAM.
+- Optionally (DECIMATE) simplifies the scaled mesh down to what the print can
+  resolve (PRINT_TOLERANCE_M), without moving the tile seams or the mesh border.
 
 Requires:
   - dtcc, dtcc_core
   - trimesh
+  - pyfqmr, rtree (only with DECIMATE)
 
 Based on dtcc platform demo : https://github.com/dtcc-platform/dtcc/blob/develop/demos/build_city_mesh.py
 
 Author: Sanjay Somanath sanjay.somanath@chalmers.se
 """
 
+import hashlib
+import json
+import math
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+import numpy as np
 import dtcc
 from dtcc import GeometryType
 from dtcc_core.io import footprints as fp_io
@@ -34,6 +51,12 @@ BUILDINGS_KEPT    = BASE_DIR / "data" / "BuildingsKept.gpkg"
 OUTPUT_DIR        = BASE_DIR / "output"
 MESH_STL          = OUTPUT_DIR / "mesh.stl"         # raw DTCC mesh
 SCALED_MESH_STL   = OUTPUT_DIR / "scaled_mesh.stl"   # scaled + centered
+SAVE_RAW_MESH     = True                             # False skips writing mesh.stl
+SCALED_FORMATS    = ("stl", "ply")                   # scaled mesh formats: stl, ply, glb, 3mf
+
+# Stage cache (delete the folder, or set USE_CACHE = False, to recompute everything)
+CACHE_DIR         = OUTPUT_DIR / "cache"
+USE_CACHE         = True
 
 # Print/tiles
 SCALE             = 1250.0      # 1:1250 (printed : real)
@@ -59,6 +82,20 @@ MERGE_MAX_DIST    = 0.5
 MERGE_MIN_AREA    = 10.0
 SIMPLIFY_TOL      = 0.25
 CLEARANCE         = 0.5
+PARTITION_SIZE_M  = 500.0       # footprints are read and cleaned per partition of the area…
+PARTITION_HALO_M  = 25.0        # …plus this margin, so merges across partition edges still happen
+
+# Tile-parallel meshing (one process per print tile region, stitched at the seams)
+PARALLEL_TILES    = False
+WORKERS           = os.cpu_count() or 1
+TILE_OVERLAP_M    = 25.0        # extra data meshed around each tile, so seams see the same city
+SEAM_WIDTH_M      = 1.0         # width of the stitching strip on each tile's left/bottom seam
+SEAM_TOL          = 1e-4
+
+# Print-resolution decimation of the scaled mesh (before tiling)
+DECIMATE          = False
+PRINT_TOLERANCE_M = 0.0002      # max deviation on the print (0.2 mm = 0.25 m real at 1:1250)
+DECIMATE_SAMPLES  = 200_000     # original vertices per tile checked for the deviation
 
 SHOW_PREVIEW      = False  # set True to open the viewer
 
@@ -71,6 +108,14 @@ def ensure_paths():
         if not p.exists():
             raise FileNotFoundError(f"Missing input: {p}")
 
+def current_config():
+    """This script's upper-case constants, handed to pool workers (see apply_config)."""
+    return {k: v for k, v in globals().items() if k.isupper()}
+
+def apply_config(config):
+    """Pool initializer: use the parent's constants, which a caller such as pipeline.py may have changed."""
+    globals().update(config)
+
 # 2) --- Compute the area bounds from tiles, scale, and buffer ----------------
 
 def compute_bounds():
@@ -91,45 +136,190 @@ def compute_bounds():
         max_y + BUFFER_M,
     )
 
-# 3) --- Load data: pointcloud + building footprints -------------------------
+# 3) --- Stage cache -----------------------------------------------------------
+
+def stage_key(stage, *inputs):
+    """Key of a stage result: its name, its upstream keys and its own parameters."""
+    blob = json.dumps([stage, *inputs], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cached(stage, key, suffix, build, save, load):
+    """Load `stage` from the cache if present, else build it and store it."""
+    path = CACHE_DIR / f"{stage}_{key}{suffix}"
+    if USE_CACHE and path.exists():
+        print(f"Using cached {stage}: {path.name}")
+        return load(path)
+    value = build()
+    if USE_CACHE:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.stem}.tmp{suffix}")
+        save(value, tmp)
+        tmp.replace(path)   # a crash mid-write never leaves a truncated cache entry
+    return value
+
+def save_pointcloud(pc, path):
+    pc.save(str(path))
+
+def load_pointcloud(path):
+    return dtcc.load_pointcloud(str(path))
+
+def save_raster(raster, path):
+    raster.save(str(path))
+
+def load_raster(path):
+    return dtcc.load_raster(str(path))
+
+# 4) --- Load data: pointcloud + building footprints -------------------------
+
+def bounds_tuple(bounds):
+    return [bounds.xmin, bounds.ymin, bounds.xmax, bounds.ymax]
+
+def pointcloud_stage(bounds):
+    """
+    Key of the filtered pointcloud and a function that returns it.
+
+    Nothing is downloaded or loaded until the function is called, so runs whose
+    raster and heights are both cached never touch the pointcloud at all.
+    """
+    raw_key = stage_key("pointcloud", bounds_tuple(bounds))
+    key = stage_key("filtered", raw_key, OUTLIER_STDDEV)
+
+    def download():
+        print("Downloading pointcloud…")
+        return dtcc.download_pointcloud(bounds=bounds)
+
+    def remove_outliers():
+        pc = cached("pointcloud", raw_key, ".laz", download, save_pointcloud, load_pointcloud)
+        return pc.remove_global_outliers(OUTLIER_STDDEV)
+
+    @lru_cache(maxsize=None)
+    def pointcloud():
+        return cached("filtered", key, ".laz", remove_outliers, save_pointcloud, load_pointcloud)
+
+    return key, pointcloud
+
+def gpkg_feature_count(path, box):
+    """
+    Number of features whose R-tree entry intersects box (x0, y0, x1, y1),
+    or None if the GeoPackage has no spatial index to ask.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        table, column = conn.execute("SELECT table_name, column_name FROM gpkg_geometry_columns").fetchone()
+        return conn.execute(
+            f'SELECT COUNT(*) FROM "rtree_{table}_{column}" WHERE maxx >= ? AND minx <= ? AND maxy >= ? AND miny <= ?',
+            (box[0], box[2], box[1], box[3]),
+        ).fetchone()[0]
+    except (sqlite3.Error, TypeError):
+        return None
+    finally:
+        conn.close()
+
+def partitions(bounds):
+    """
+    Split the bounds into PARTITION_SIZE_M squares, as (core, read) boxes.
+
+    Each building belongs to the one core that contains its footprint center;
+    cores on the outside edge extend to infinity, so buildings that only
+    overlap the bounds are kept, as with a single read.
+    """
+    nx = max(1, math.ceil((bounds.xmax - bounds.xmin) / PARTITION_SIZE_M))
+    ny = max(1, math.ceil((bounds.ymax - bounds.ymin) / PARTITION_SIZE_M))
+    for i in range(nx):
+        for j in range(ny):
+            x0 = bounds.xmin + i * PARTITION_SIZE_M
+            y0 = bounds.ymin + j * PARTITION_SIZE_M
+            x1 = min(x0 + PARTITION_SIZE_M, bounds.xmax)
+            y1 = min(y0 + PARTITION_SIZE_M, bounds.ymax)
+            core = (x0 if i else -math.inf, y0 if j else -math.inf,
+                    x1 if i < nx - 1 else math.inf, y1 if j < ny - 1 else math.inf)
+            yield core, (x0, y0, x1, y1)
+
+def clean_footprints(buildings):
+    buildings = dtcc.merge_building_footprints(buildings, max_distance=MERGE_MAX_DIST, min_area=MERGE_MIN_AREA)
+    buildings = dtcc.simplify_building_footprints(buildings, tolerance=SIMPLIFY_TOL)
+    return dtcc.fix_building_footprint_clearance(buildings, CLEARANCE)
+
+def load_footprints(path, bounds, clean=False):
+    """
+    Read footprints partition by partition through the GeoPackage's R-tree.
+
+    With clean, each partition is merged/simplified with a PARTITION_HALO_M halo
+    of neighbours, then only the buildings centered in its core are kept. Memory
+    and time follow the partition size instead of the whole file.
+    """
+    halo = PARTITION_HALO_M if clean else 0.0
+    buildings = []
+    for core, box in partitions(bounds):
+        read = dtcc.Bounds(max(box[0] - halo, bounds.xmin), max(box[1] - halo, bounds.ymin),
+                           min(box[2] + halo, bounds.xmax), min(box[3] + halo, bounds.ymax))
+        if gpkg_feature_count(path, bounds_tuple(read)) == 0:
+            continue
+        chunk = fp_io.load(str(path), bounds=read)
+        if chunk and clean:
+            chunk = clean_footprints(chunk)
+        for b in chunk or []:
+            x, y = b.get_footprint(GeometryType.LOD0).vertices[:, :2].mean(axis=0)
+            if core[0] <= x < core[2] and core[1] <= y < core[3]:
+                buildings.append(b)
+    return buildings
 
 def load_data(bounds):
-    print("Downloading pointcloud…")
-    pc = dtcc.download_pointcloud(bounds=bounds)
-    pc = pc.remove_global_outliers(OUTLIER_STDDEV)
-
     print("Loading building footprints…")
-    b_removed = fp_io.load(str(BUILDINGS_REMOVED), bounds=bounds)
-    b_kept    = fp_io.load(str(BUILDINGS_KEPT),    bounds=bounds)
+    b_removed = load_footprints(BUILDINGS_REMOVED, bounds)
 
     # Clean/process the “kept” set for additional meshing detail
-    b_kept = dtcc.merge_building_footprints(b_kept, max_distance=MERGE_MAX_DIST, min_area=MERGE_MIN_AREA)
-    b_kept = dtcc.simplify_building_footprints(b_kept, tolerance=SIMPLIFY_TOL)
-    b_kept = dtcc.fix_building_footprint_clearance(b_kept, CLEARANCE)
+    b_kept = load_footprints(BUILDINGS_KEPT, bounds, clean=True)
 
     # Extract simple 2D outlines to guide meshing
     extra_footprints = [b.get_footprint(GeometryType.LOD0) for b in b_kept]
 
-    return pc, b_removed, extra_footprints
+    return pointcloud_stage(bounds), b_removed, extra_footprints
 
-# 4) --- Build terrain + compute building heights -----------------------------
+# 5) --- Build terrain + compute building heights -----------------------------
 
-def make_terrain_and_buildings(pointcloud, buildings_removed, bounds):
-    print("Building terrain raster…")
-    raster = dtcc.build_terrain_raster(
-        pointcloud,
-        cell_size=RASTER_CELL_SIZE,
-        radius=RASTER_RADIUS,
-        ground_only=True
-    )
+def make_terrain_and_buildings(pointcloud_stage, buildings_removed, bounds):
+    pc_key, pointcloud = pointcloud_stage
+
+    def build_raster():
+        print("Building terrain raster…")
+        return dtcc.build_terrain_raster(
+            pointcloud(),
+            cell_size=RASTER_CELL_SIZE,
+            radius=RASTER_RADIUS,
+            ground_only=True
+        )
+
+    raster_key = stage_key("terrain", pc_key, RASTER_CELL_SIZE, RASTER_RADIUS)
+    raster = cached("terrain", raster_key, ".tif", build_raster, save_raster, load_raster)
 
-    print("Extracting roof points + computing heights…")
-    buildings = dtcc.extract_roof_points(buildings_removed, pointcloud)
-    buildings = dtcc.compute_building_heights(buildings, raster, overwrite=True)
+    def build_heights():
+        print("Extracting roof points + computing heights…")
+        buildings = dtcc.extract_roof_points(buildings_removed, pointcloud())
+        buildings = dtcc.compute_building_heights(buildings, raster, overwrite=True)
+        return np.array([b.height for b in buildings], dtype=np.float64)
 
-    return raster, buildings
+    # Heights are stored per footprint, in the (deterministic) load order of the GeoPackage
+    heights_key = stage_key("heights", pc_key, raster_key, bounds_tuple(bounds), PARTITION_SIZE_M,
+                            file_digest(BUILDINGS_REMOVED))
+    heights = cached("heights", heights_key, ".npz", build_heights,
+                     lambda h, path: np.savez_compressed(path, heights=h),
+                     lambda path: np.load(path)["heights"])
+    if len(heights) != len(buildings_removed):
+        raise RuntimeError(f"Cached heights do not match the footprints; delete {CACHE_DIR} and re-run")
+    for b, h in zip(buildings_removed, heights):
+        b.height = float(h)
 
-# 5) --- Build city + mesh ----------------------------------------------------
+    return raster, buildings_removed
+
+# 6) --- Build city + mesh ----------------------------------------------------
 
 def make_mesh(raster, buildings, extra_footprints):
     print("Creating city and meshing…")
@@ -147,37 +337,247 @@ def make_mesh(raster, buildings, extra_footprints):
     )
     return mesh
 
-# 6) --- Save raw mesh, scale + center for printing ---------------------------
+# 7) --- Tile-parallel meshing + seam stitching --------------------------------
 
-def save_and_scale(mesh, ref_min_x, ref_min_y_unbuffered):
-    print("Saving raw mesh…")
-    mesh.save(str(MESH_STL))
+def tile_clip_box(row, col):
+    """
+    Real-world (x0, y0, x1, y1) of one tile's mesh piece.
 
-    print("Scaling and centering for print…")
-    tri = trimesh.load(str(MESH_STL))
+    Pieces end exactly on their right/top seam and start SEAM_WIDTH_M past
+    their left/bottom seam; that strip is filled when stitching. On the table
+    border they reach out to the buffer, like the single-mesh mode.
+    """
+    real_tile_size = TILE_SIZE_PRINT_M * SCALE
+    x0 = MIN_X + col * real_tile_size
+    y0 = MAX_Y - TILES_Y * real_tile_size + row * real_tile_size
+    x1, y1 = x0 + real_tile_size, y0 + real_tile_size
+    x0 = x0 + SEAM_WIDTH_M if col > 0 else x0 - BUFFER_M
+    y0 = y0 + SEAM_WIDTH_M if row > 0 else y0 - BUFFER_M
+    x1 = x1 if col < TILES_X - 1 else x1 + BUFFER_M
+    y1 = y1 if row < TILES_Y - 1 else y1 + BUFFER_M
+    return x0, y0, x1, y1
+
+def mesh_tile_piece(row, col):
+    """Worker: mesh one tile's region plus overlap, and clip it to its piece box."""
+    x0, y0, x1, y1 = tile_clip_box(row, col)
+    bounds = dtcc.Bounds(x0 - TILE_OVERLAP_M, y0 - TILE_OVERLAP_M, x1 + TILE_OVERLAP_M, y1 + TILE_OVERLAP_M)
+    pointcloud, buildings_removed, extra_footprints = load_data(bounds)
+    raster, buildings = make_terrain_and_buildings(pointcloud, buildings_removed, bounds)
+    mesh = make_mesh(raster, buildings, extra_footprints)
 
-    # scale down to print scale, e.g. 1/1250
-    tri.apply_scale(1.0 / SCALE)
+    piece = trimesh.Trimesh(np.asarray(mesh.vertices, dtype=np.float64), np.asarray(mesh.faces), process=False)
+    for normal, origin in (((1, 0, 0), (x0, 0, 0)), ((-1, 0, 0), (x1, 0, 0)),
+                           ((0, 1, 0), (0, y0, 0)), ((0, -1, 0), (0, y1, 0))):
+        piece = trimesh.intersections.slice_mesh_plane(piece, normal, origin)
+    piece.merge_vertices()
+    # Stitching assumes the surface faces up
+    if (piece.face_normals[:, 2] * piece.area_faces).sum() < 0:
+        piece.invert()
+    return np.asarray(piece.vertices), np.asarray(piece.faces)
+
+def boundary_edges(faces):
+    """Directed edges used by a single face, in that face's winding."""
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    return edges[trimesh.grouping.group_rows(np.sort(edges, axis=1), require_count=1)]
+
+def seam_chain(verts, faces, axis, value):
+    """Boundary vertices of a piece on the line `axis == value`, in order along the seam."""
+    edges = boundary_edges(faces)
+    on_seam = np.abs(verts[edges, axis] - value).max(axis=1) < SEAM_TOL
+    nxt = dict(edges[on_seam].tolist())
+    starts = set(nxt) - set(nxt.values())
+    if len(starts) != 1:
+        raise RuntimeError(f"Mesh boundary at {'xy'[axis]}={value:.2f} is not a single chain; "
+                           f"increase TILE_OVERLAP_M")
+    chain = [starts.pop()]
+    while chain[-1] in nxt:
+        chain.append(nxt[chain[-1]])
+    chain = np.array(chain)
+    t = verts[chain, 1 - axis]
+    return chain if t[-1] >= t[0] else chain[::-1]
+
+def zip_seam(p, q, t_p, t_q):
+    """
+    Triangle strip joining chain p (on a column seam) to chain q (set back past it),
+    both ordered by increasing y. Row seams use the same strip, reversed.
+    """
+    tris = []
+    i = j = 0
+    while i < len(p) - 1 or j < len(q) - 1:
+        if j == len(q) - 1 or (i < len(p) - 1 and t_p[i + 1] <= t_q[j + 1]):
+            tris.append((p[i + 1], p[i], q[j]))
+            i += 1
+        else:
+            tris.append((p[i], q[j], q[j + 1]))
+            j += 1
+    return np.array(tris, dtype=np.int64).reshape(-1, 3)
+
+def fill_seam_corners(verts, faces):
+    """Fan-fill the small holes left where four tiles meet."""
+    nxt = dict(boundary_edges(faces).tolist())
+    fill, seen = [], set()
+    for start in list(nxt):
+        if start in seen:
+            continue
+        loop = [start]
+        while nxt.get(loop[-1], start) != start and len(loop) <= len(nxt):
+            loop.append(nxt[loop[-1]])
+        seen.update(loop)
+        extent = np.ptp(verts[loop, :2], axis=0).max()
+        if 3 <= len(loop) and extent < 4 * SEAM_WIDTH_M:
+            fill += [(loop[0], loop[k + 1], loop[k]) for k in range(1, len(loop) - 1)]
+    return np.array(fill, dtype=np.int64).reshape(-1, 3)
+
+def stitch_pieces(pieces):
+    """Join the clipped tile pieces into one mesh, sharing vertices along every seam."""
+    offsets, n = {}, 0
+    for key, (v, _) in pieces.items():
+        offsets[key] = n
+        n += len(v)
+    verts = np.vstack([v for v, _ in pieces.values()])
+    faces = [f + offsets[key] for key, (_, f) in pieces.items()]
+
+    for (row, col), (v, f) in pieces.items():
+        x0, y0, x1, y1 = tile_clip_box(row, col)
+        if col + 1 < TILES_X:
+            right = (row, col + 1)
+            p = seam_chain(v, f, 0, x1) + offsets[(row, col)]
+            q = seam_chain(*pieces[right], 0, tile_clip_box(*right)[0]) + offsets[right]
+            faces.append(zip_seam(p, q, verts[p, 1], verts[q, 1]))
+        if row + 1 < TILES_Y:
+            up = (row + 1, col)
+            p = seam_chain(v, f, 1, y1) + offsets[(row, col)]
+            q = seam_chain(*pieces[up], 1, tile_clip_box(*up)[1]) + offsets[up]
+            faces.append(zip_seam(p, q, verts[p, 0], verts[q, 0])[:, ::-1])
+
+    faces = np.vstack(faces)
+    return verts, np.vstack([faces, fill_seam_corners(verts, faces)])
+
+def make_mesh_parallel():
+    tiles = [(r, c) for r in range(TILES_Y) for c in range(TILES_X)]
+    print(f"Meshing {len(tiles)} tile regions on {WORKERS} worker(s)…")
+    with ProcessPoolExecutor(max_workers=WORKERS, initializer=apply_config, initargs=(current_config(),)) as pool:
+        pieces = dict(zip(tiles, pool.map(mesh_tile_piece, *zip(*tiles))))
+
+    print("Stitching tile seams…")
+    verts, faces = stitch_pieces(pieces)
+    return dtcc.Mesh(vertices=verts, faces=faces)
+
+# 8) --- Print-resolution decimation ------------------------------------------
+
+def tile_patches(tri):
+    """Cut the scaled mesh along the inner tile seams, one patch per print tile."""
+    for row in range(TILES_Y):
+        for col in range(TILES_X):
+            x0, y0 = col * TILE_SIZE_PRINT_M, row * TILE_SIZE_PRINT_M
+            x1, y1 = x0 + TILE_SIZE_PRINT_M, y0 + TILE_SIZE_PRINT_M
+            patch = tri
+            # Outer tiles keep the buffer, as in the tiler
+            for cut, normal, origin in ((col > 0, (1, 0, 0), (x0, 0, 0)),
+                                        (col < TILES_X - 1, (-1, 0, 0), (x1, 0, 0)),
+                                        (row > 0, (0, 1, 0), (0, y0, 0)),
+                                        (row < TILES_Y - 1, (0, -1, 0), (0, y1, 0))):
+                if cut and len(patch.faces):
+                    patch = trimesh.intersections.slice_mesh_plane(patch, normal, origin)
+            yield np.asarray(patch.vertices), np.asarray(patch.faces)
+
+def max_deviation(verts, faces, simple_verts, simple_faces):
+    """
+    Largest distance between the two surfaces, measured from the original
+    vertices (up to DECIMATE_SAMPLES of them) and from every simplified vertex.
+    """
+    original = trimesh.Trimesh(verts, faces, process=False)
+    simple = trimesh.Trimesh(simple_verts, simple_faces, process=False)
+    sample = verts[::max(1, len(verts) // DECIMATE_SAMPLES)]
+    return max(trimesh.proximity.closest_point(simple, sample)[1].max(),
+               trimesh.proximity.closest_point(original, simple_verts)[1].max())
+
+def simplify_patch(verts, faces, target):
+    import pyfqmr
+
+    simplifier = pyfqmr.Simplify()
+    simplifier.setMesh(verts, faces)
+    simplifier.simplify_mesh(target_count=target, preserve_border=True, verbose=False)
+    simple_verts, simple_faces, _ = simplifier.getMesh()
+    return simple_verts, simple_faces, max_deviation(verts, faces, simple_verts, simple_faces)
+
+def decimate_patch(verts, faces):
+    """
+    Worker: quadric-decimate one tile patch as far as PRINT_TOLERANCE_M allows.
+
+    Edges are collapsed cheapest quadric error first, so flat terrain and roofs
+    go before building edges (a large error across the corner). Border vertices
+    are locked, which keeps the seams with the neighbouring tiles and the outer
+    edge exactly as they were. The triangle budget is halved while the measured
+    deviation stays within tolerance, then refined by bisection; a patch that
+    cannot be simplified within tolerance is kept unchanged.
+
+    Returns (verts, faces, deviation).
+    """
+    best = (verts, faces, 0.0)
+    fine, coarse = len(faces), None
+    while fine > 8:
+        target = fine // 2 if coarse is None else (fine + coarse) // 2
+        if coarse is not None and fine - coarse <= max(8, fine // 8):
+            break
+        result = simplify_patch(verts, faces, target)
+        if result[2] <= PRINT_TOLERANCE_M:
+            best, fine = result, target
+        else:
+            coarse = target
+    return best
+
+def decimate_for_print(tri):
+    """Simplify the scaled mesh tile by tile, and report what it cost."""
+    print(f"Decimating to print tolerance ({PRINT_TOLERANCE_M * 1000:.2f} mm)…")
+    patches = list(tile_patches(tri))
+    with ProcessPoolExecutor(max_workers=WORKERS, initializer=apply_config, initargs=(current_config(),)) as pool:
+        results = list(pool.map(decimate_patch, *zip(*patches)))
+
+    offsets = np.cumsum([0] + [len(v) for v, _, _ in results])
+    verts = np.vstack([v for v, _, _ in results])
+    faces = np.vstack([f + offset for (_, f, _), offset in zip(results, offsets)])
+    simple = trimesh.Trimesh(verts, faces, process=False)
+    simple.merge_vertices()   # re-join the patches along the (unchanged) tile seams
+
+    before, after = len(tri.faces), len(simple.faces)
+    deviation = max(d for _, _, d in results)
+    print(f"  Triangles: {before:,} → {after:,} ({100 * (after / max(before, 1) - 1):+.0f}%)")
+    print(f"  Max deviation: {deviation * 1000:.3f} mm on the print ({deviation * SCALE:.2f} m real)")
+    return simple
+
+# 9) --- Save raw mesh, scale + center for printing ---------------------------
 
-    # move origin to (min_x,min_y) and lift so ground = Z 0
-    tri.apply_translation([
-        -ref_min_x / SCALE,
-        -ref_min_y_unbuffered / SCALE,
-        -tri.bounds[0][2]            # shift so min Z -> 0
-    ])
+def save_and_scale(mesh, ref_min_x, ref_min_y_unbuffered):
+    if SAVE_RAW_MESH:
+        print("Saving raw mesh…")
+        mesh.save(str(MESH_STL))
 
-    tri.export(str(SCALED_MESH_STL))
-    print(f"Done.\n  Raw:    {MESH_STL}\n  Scaled: {SCALED_MESH_STL}")
+    print("Scaling and centering for print…")
+    verts = np.asarray(mesh.vertices, dtype=np.float64)
+
+    # move origin to (min_x,min_y), lift so ground = Z 0 and scale down to print
+    # scale (e.g. 1/1250), in one pass over the vertex array
+    offset = np.array([ref_min_x, ref_min_y_unbuffered, verts[:, 2].min()])
+    tri = trimesh.Trimesh((verts - offset) * (1.0 / SCALE), np.asarray(mesh.faces), process=False)
+    if DECIMATE:
+        tri = decimate_for_print(tri)
+
+    # STL for tiling; indexed formats (PLY/GLB/3MF) share vertices and are much smaller
+    outputs = [SCALED_MESH_STL.with_suffix(f".{fmt}") for fmt in SCALED_FORMATS]
+    for path in outputs:
+        tri.export(str(path))
+    print("Done.")
+    if SAVE_RAW_MESH:
+        print(f"  Raw:    {MESH_STL}")
+    for path in outputs:
+        print(f"  Scaled: {path}")
 
 # --- Main --------------------------------------------------------------------
 
 def main():
     ensure_paths()
 
-    bounds = compute_bounds()
-    pointcloud, buildings_removed, extra_footprints = load_data(bounds)
-    raster, buildings = make_terrain_and_buildings(pointcloud, buildings_removed, bounds)
-
     # ref_min_y_unbuffered = bounds.ymin + (bounds.ymax - BUFFER_M)
     # Note: In the original logic this calculated a min_y before buffer.
     # Here we reconstruct that explicitly:
@@ -185,7 +585,13 @@ def main():
     area_height = TILES_Y * real_tile_size
     ref_min_y_unbuffered = MAX_Y - area_height
 
-    mesh = make_mesh(raster, buildings, extra_footprints)
+    if PARALLEL_TILES:
+        mesh = make_mesh_parallel()
+    else:
+        bounds = compute_bounds()
+        pointcloud, buildings_removed, extra_footprints = load_data(bounds)
+        raster, buildings = make_terrain_and_buildings(pointcloud, buildings_removed, bounds)
+        mesh = make_mesh(raster, buildings, extra_footprints)
 
     if SHOW_PREVIEW:
         mesh.view()  # optional preview
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Run the city mesh + tiling pipeline for one or many table jobs.
+
+- A job overrides any constant of get_city_mesh.py / tile_city_mesh.py by its
+  lower-case name (`scale`, `min_x`, `raster_cell_size`, `magnet_radius`, ...).
+  `tile_size`, `tiles_x` and `tiles_y` set both scripts at once.
+- Jobs come from a TOML/YAML spec, from --set flags, or from a backend Project.
+- Jobs run concurrently in a process pool; all of them share the stage cache
+  of get_city_mesh.py, so sites and parameter sweeps reuse each other's work.
+- Each job writes to output/jobs/<name>/ (mesh, tiles/ and job.json).
+
+Spec (TOML; YAML with the same layout also works):
+
+  scale = 1250.0             # top-level keys are defaults for every job
+
+  [[jobs]]
+  name  = "centrum"
+  min_x = 319470.0
+  max_y = 6398660.0
+
+  [[jobs]]
+  name          = "centrum-fine"
+  min_x         = 319470.0
+  max_y         = 6398660.0
+  max_mesh_size = 2.5
+
+Usage:
+  python scripts/pipeline.py jobs.toml --jobs 4
+  python scripts/pipeline.py --name site --set min_x=319470 --set max_y=6398660
+  python scripts/pipeline.py --project 3 --db backend/users.db
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+import get_city_mesh as city
+import tile_city_mesh as tiles
+from extent_format import parse_bounding_box, parse_origin
+
+# 0) --- Setup (edit these as needed) -----------------------------------------
+
+JOBS_DIR     = city.OUTPUT_DIR / "jobs"
+CACHE_DIR    = city.CACHE_DIR            # shared by all jobs
+JOBS         = 2
+TILE_WORKERS = 2                         # trimesh tiling processes per job
+
+# Keys that set a constant in both scripts
+SHARED_PARAMS = {
+    "tile_size": ("TILE_SIZE_PRINT_M", "TILE_SIZE"),
+    "tiles_x":   ("TILES_X", "TILES_X"),
+    "tiles_y":   ("TILES_Y", "TILES_Y"),
+}
+# Constants the pipeline sets itself, per job
+MANAGED = {
+    "BASE_DIR", "OUTPUT_DIR", "MESH_STL", "SCALED_MESH_STL", "CACHE_DIR", "SHOW_PREVIEW",
+    "CITY_MESH_PATH", "BUILD_MANIFEST_PATH", "SINGLE_TILE_MODE", "SINGLE_TILE_ROW", "SINGLE_TILE_COL",
+    "TABLE_MANIFEST_PATH", "TABLE_3MF_PATH", "TABLE_GLB_PATH",
+}
+# Job keys that are not script constants
+JOB_KEYS = {"name", "output_dir", "tiles", "tile_workers", "project_id"}
+# Import-time constants, restored before each job: pool workers run several jobs in turn
+DEFAULTS = {city: city.current_config(), tiles: tiles.current_config()}
+
+
+# 1) --- Job specs -------------------------------------------------------------
+
+def param_target(key):
+    """(module, constant) pairs a job key sets, or [] if it is not a parameter."""
+    if key in SHARED_PARAMS:
+        return [(city, SHARED_PARAMS[key][0]), (tiles, SHARED_PARAMS[key][1])]
+    name = key.upper()
+    if name in MANAGED:
+        return []
+    return [(m, name) for m in (city, tiles) if name.isupper() and hasattr(m, name)]
+
+def coerce(key, value, default):
+    """Check `value` against the type of the constant's default, converting where lossless."""
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ValueError(f"{key}: expected true/false, got {value!r}")
+        return value
+    if isinstance(default, int):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"{key}: expected an integer, got {value!r}")
+        return value
+    if isinstance(default, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{key}: expected a number, got {value!r}")
+        return float(value)
+    if isinstance(default, Path):
+        if not isinstance(value, str):
+            raise ValueError(f"{key}: expected a path, got {value!r}")
+        return Path(value)
+    if isinstance(default, tuple):
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"{key}: expected a list, got {value!r}")
+        return tuple(value)
+    if not isinstance(value, type(default)):
+        raise ValueError(f"{key}: expected {type(default).__name__}, got {value!r}")
+    return value
+
+def validate_job(job):
+    """Return a normalized copy of `job`, raising ValueError on unknown keys or bad values."""
+    job = dict(job)
+    name = job.get("name")
+    if not isinstance(name, str) or not name or "/" in name or name.startswith("."):
+        raise ValueError(f"Job needs a simple 'name', got {name!r}")
+
+    params = {}
+    for key, value in job.items():
+        if key in JOB_KEYS:
+            continue
+        targets = param_target(key)
+        if not targets:
+            raise ValueError(f"{name}: unknown parameter '{key}'")
+        module, constant = targets[0]
+        params[key] = coerce(f"{name}: {key}", value, getattr(module, constant))
+
+    for key in ("scale", "tile_size", "tiles_x", "tiles_y", "max_mesh_size", "raster_cell_size", "print_tolerance_m"):
+        if key in params and params[key] <= 0:
+            raise ValueError(f"{name}: {key} must be positive")
+
+    return {
+        "name": name,
+        "output_dir": str(job.get("output_dir") or JOBS_DIR / name),
+        "tiles": bool(job.get("tiles", True)),
+        "tile_workers": int(job.get("tile_workers", TILE_WORKERS)),
+        "project_id": job.get("project_id"),
+        "params": params,
+    }
+
+def load_spec(path):
+    """Jobs from a TOML or YAML spec: top-level keys are defaults, `jobs` is the list of jobs."""
+    path = Path(path)
+    if path.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("YAML specs need PyYAML (pip install pyyaml), or use TOML")
+        with open(path) as f:
+            spec = yaml.safe_load(f) or {}
+    else:
+        with open(path, "rb") as f:
+            spec = tomllib.load(f)
+
+    defaults = {k: v for k, v in spec.items() if k != "jobs"}
+    jobs = spec.get("jobs") or [{"name": path.stem}]
+    return [{**defaults, **job} for job in jobs]
+
+def parse_set(items):
+    """--set key=value flags; values are read as TOML (numbers, booleans, lists), else as strings."""
+    values = {}
+    for item in items or []:
+        key, sep, raw = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--set expects key=value, got {item!r}")
+        try:
+            values[key.strip()] = tomllib.loads(f"v = {raw}")["v"]
+        except tomllib.TOMLDecodeError:
+            values[key.strip()] = raw
+    return values
+
+
+# 2) --- Backend projects ------------------------------------------------------
+
+def job_from_project(project, tile_size=None):
+    """
+    A job for a backend Project (a row or any object with origin, bounding_box
+    and table_dimension). The origin is the lower-left corner of the bounding box
+    in the data CRS; the table dimension is the printed size.
+    """
+    get = project.get if isinstance(project, dict) else lambda k: getattr(project, k, None)
+    tile_size = tile_size or city.TILE_SIZE_PRINT_M
+    width, height = parse_bounding_box(get("bounding_box"))
+    table_w, table_h = parse_bounding_box(get("table_dimension"))
+    x, y = parse_origin(get("origin"))
+    if None in (width, height, table_w, table_h):
+        raise ValueError(f"Project {get('id')} needs a bounding box and a table dimension")
+    if x is None:
+        x, y = 0.0, 0.0
+
+    tiles_x = max(1, round(table_w / tile_size))
+    tiles_y = max(1, round(table_h / tile_size))
+    scale = width / table_w
+    if abs(height / table_h - scale) > 0.01 * scale:
+        print(f"Warning: project {get('id')} bounding box and table differ in aspect; using the width scale 1:{scale:.0f}")
+    if abs(tiles_x * tile_size - table_w) > 1e-6 or abs(tiles_y * tile_size - table_h) > 1e-6:
+        print(f"Warning: table {table_w} x {table_h} m is not a whole number of {tile_size} m tiles; "
+              f"using {tiles_x} x {tiles_y} tiles")
+
+    return {
+        "name": f"project_{get('id')}",
+        "project_id": get("id"),
+        "scale": scale,
+        "tile_size": tile_size,
+        "tiles_x": tiles_x,
+        "tiles_y": tiles_y,
+        "min_x": x,
+        "max_y": y + height,
+    }
+
+def load_project(db_path, project_id):
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute(
+            "SELECT id, name, origin, bounding_box, table_dimension FROM projects WHERE id = ?", (project_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise SystemExit(f"Project {project_id} not found in {db_path}")
+    return dict(row)
+
+
+# 3) --- Running jobs ----------------------------------------------------------
+
+def configure(job):
+    """
+    Point both scripts' constants at this job.
+
+    Workers run one job after another, so every constant is first reset to its
+    import-time value; nothing a previous job overrode carries over. The
+    scripts' own process pools get the result through their initializers.
+    """
+    out = Path(job["output_dir"])
+    for module, config in DEFAULTS.items():
+        module.apply_config(config)
+    tiles.magnet_cutter_template_trimesh.cache_clear()  # Built from the magnet constants
+    for key, value in job["params"].items():
+        for module, constant in param_target(key):
+            setattr(module, constant, value)
+
+    city.OUTPUT_DIR = out
+    city.MESH_STL = out / "mesh.stl"
+    city.SCALED_MESH_STL = out / "scaled_mesh.stl"
+    city.CACHE_DIR = CACHE_DIR
+    city.SHOW_PREVIEW = False
+
+    tiles.CITY_MESH_PATH = city.SCALED_MESH_STL
+    tiles.OUTPUT_DIR = out / "tiles"
+    tiles.BUILD_MANIFEST_PATH = tiles.OUTPUT_DIR / "build_manifest.json"
+    tiles.TABLE_MANIFEST_PATH = tiles.OUTPUT_DIR / "table.json"
+    tiles.TABLE_3MF_PATH = tiles.OUTPUT_DIR / "table.3mf"
+    tiles.TABLE_GLB_PATH = tiles.OUTPUT_DIR / "table.glb"
+    tiles.SINGLE_TILE_MODE = False
+    return out
+
+def run_job(job):
+    """Worker: build the city mesh and (optionally) its tiles for one job. Returns a summary."""
+    out = configure(job)
+    out.mkdir(parents=True, exist_ok=True)
+    with open(out / "job.json", "w") as f:
+        json.dump(job, f, indent=2, default=str)
+
+    start = time.time()
+    city.main()
+    if job["tiles"]:
+        tiles.main_trimesh(argparse.Namespace(tiles=None, workers=job["tile_workers"], force=False,
+                                              fallback=False))
+
+    stls = sorted(str(p) for p in tiles.OUTPUT_DIR.glob("tile_*.stl")) if job["tiles"] else []
+    return {"name": job["name"], "output_dir": str(out), "mesh": str(city.SCALED_MESH_STL),
+            "tiles": stls, "seconds": round(time.time() - start, 1)}
+
+def run_jobs(jobs, workers):
+    """Run validated jobs in a process pool. Returns (results, failures)."""
+    results, failures = [], []
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            name = futures[future]["name"]
+            try:
+                result = future.result()
+            except Exception as e:
+                failures.append((name, str(e)))
+                print(f"JOB_FAILED {name} {e}", flush=True)
+                continue
+            results.append(result)
+            print(f"JOB_OK {name} {result['output_dir']}", flush=True)
+    return results, failures
+
+
+# 4) --- Main ------------------------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build city meshes and tiles for one or many jobs.")
+    parser.add_argument("spec", nargs="?", help="TOML/YAML job spec")
+    parser.add_argument("--name", help="job name when using --set without a spec")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE",
+                        help="parameter override, applied to every job (repeatable)")
+    parser.add_argument("--project", type=int, help="build the job for this backend project id")
+    parser.add_argument("--db", type=Path, default=Path("backend/users.db"), help="backend database")
+    parser.add_argument("--jobs", type=int, default=JOBS, help="jobs run at once")
+    parser.add_argument("--no-tiles", action="store_true", help="only build the city mesh")
+    parser.add_argument("--check", action="store_true", help="validate the jobs and exit")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    overrides = parse_set(args.set)
+
+    if args.spec:
+        jobs = load_spec(args.spec)
+    elif args.project is not None:
+        jobs = [job_from_project(load_project(args.db, args.project), overrides.get("tile_size"))]
+    else:
+        jobs = [{"name": args.name or "default"}]
+    jobs = [{**job, **overrides, **({"tiles": False} if args.no_tiles else {})} for job in jobs]
+
+    try:
+        jobs = [validate_job(job) for job in jobs]
+    except ValueError as e:
+        raise SystemExit(f"Invalid job spec: {e}")
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        raise SystemExit("Invalid job spec: job names must be unique")
+
+    if args.check:
+        print(json.dumps(jobs, indent=2, default=str))
+        return
+
+    print(f"Running {len(jobs)} job(s) on {max(1, args.jobs)} worker(s)…")
+    results, failures = run_jobs(jobs, args.jobs)
+    for result in sorted(results, key=lambda r: r["name"]):
+        print(f"  {result['name']}: {len(result['tiles'])} tile(s) in {result['seconds']}s -> {result['output_dir']}")
+    if failures:
+        print("Failed jobs: " + ", ".join(name for name, _ in failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,41 @@
 # Blender 3.x
 # Build printable tiles from a city mesh, with 2 cm-quantized undersides + corner magnet holes.
+#
+#   blender -b -P scripts/tile_city_mesh.py                     # tiles from the config below
+#   blender -b -P scripts/tile_city_mesh.py -- --tiles "0,1;2,3" # only these row,col tiles
+#   python scripts/tile_city_mesh.py --backend trimesh --workers 8  # no Blender (trimesh + manifold3d)
+#
+# Tiles whose cropped city geometry and parameters are unchanged since the last build
+# (see BUILD_MANIFEST_PATH) are kept as they are; pass --force to rebuild them anyway.
+# --fallback switches to the fallback boolean solver (see validate_tiles.py).
+#
+# Each tile is also written as 3MF and GLB (EXPORT_FORMATS), and a full run writes
+# table.json / table.3mf / table.glb covering every tile.
+#
+# One status line is printed per tile (TILE_OK / TILE_EMPTY / TILE_FAILED), which
+# tile_parallel.py uses to drive several Blender workers at once.
 
-import bpy
+import argparse
+import hashlib
+import json
 import os
+import sys
+import time
 import math
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    import bpy
+    import bmesh
+    from mathutils import Matrix
+except ImportError:
+    # Imported outside Blender only for the config (e.g. by tile_parallel.py)
+    bpy = None
+
+import numpy as np  # bundled with Blender
+
 # =========================
 # 0) CONFIG — edit safely
 # =========================
@@ -31,6 +61,29 @@ MAGNET_PERIM_OFFSET_MM = 4       # mm (inset from outer edges)
 MAGNET_SAFETY          = 0.001   # 1 mm min margin to edges (m)
 COUNTERSINK_SHOULDER   = 0.001   # 1 mm radial shoulder before cone (m)
 
+# City mesh repair (before tiling)
+WELD_DISTANCE          = 0.0001  # 0.1 mm: vertices closer than this are merged
+MAX_HOLE_EDGES         = 8       # holes with more boundary edges are left open
+
+# Per-tile crop of the city before the boolean
+CROP_MARGIN            = 0.005   # 5 mm of city kept around each tile
+
+# Incremental builds: per-tile input hashes, so unchanged tiles are not rebuilt
+BUILD_MANIFEST_PATH    = OUTPUT_DIR / "build_manifest.json"
+
+# Extra tile formats next to each STL: "3mf" (mm, centered on the build plate), "glb" (web preview)
+EXPORT_FORMATS         = ("3mf", "glb")
+PLATE_SIZE             = 0.256   # build plate width/length
+TABLE_MANIFEST_PATH    = OUTPUT_DIR / "table.json"   # all tiles at once, with table.3mf / table.glb
+TABLE_3MF_PATH         = OUTPUT_DIR / "table.3mf"
+TABLE_GLB_PATH         = OUTPUT_DIR / "table.glb"
+
+# Boolean solvers (the fallback is used with --fallback, for tiles that failed validation)
+BOOLEAN_SOLVER         = 'EXACT'     # Blender: EXACT or FAST
+FALLBACK_SOLVER        = 'FAST'
+TRIMESH_ENGINE         = "manifold"  # trimesh backend: manifold or blender
+FALLBACK_ENGINE        = "blender"
+
 # Single-tile mode
 SINGLE_TILE_MODE = True
 SINGLE_TILE_ROW  = 1
@@ -47,6 +100,14 @@ def ensure_dirs():
     if not OUTPUT_DIR.exists():
         raise FileNotFoundError(f"Output directory not found: {OUTPUT_DIR}")
 
+def current_config():
+    """This script's upper-case constants, handed to pool workers (see apply_config)."""
+    return {k: v for k, v in globals().items() if k.isupper()}
+
+def apply_config(config):
+    """Pool initializer: use the parent's constants, which a caller such as pipeline.py may have changed."""
+    globals().update(config)
+
 def clear_scene():
     bpy.ops.object.select_all(action='SELECT')
     bpy.ops.object.delete(use_global=False)
@@ -58,19 +119,201 @@ def import_city_mesh(path: Path):
     obj.name = "CityMesh"
     return obj
 
+def weld_vertices(verts, faces, distance):
+    """
+    Merge vertices closer than `distance`, with a hash grid of that cell size.
+
+    Each occupied cell is compared with its 26 neighbours, so pairs that
+    straddle a cell border are still found. Returns the welded vertices and
+    the faces remapped onto them.
+    """
+    cells = np.floor((verts - verts.min(axis=0)) / distance).astype(np.int64) + 1
+    span = cells.max(axis=0) + 2
+
+    def cell_key(c):
+        return (c[:, 0] * span[1] + c[:, 1]) * span[2] + c[:, 2]
+
+    keys, first, inverse = np.unique(cell_key(cells), return_index=True, return_inverse=True)
+    rep = verts[first]
+
+    # Join neighbouring cells whose representatives are within `distance`
+    label = np.arange(len(keys))
+    pairs = []
+    for offset in ((1, -1, -1), (1, -1, 0), (1, -1, 1), (1, 0, -1), (1, 0, 0), (1, 0, 1), (1, 1, -1),
+                   (1, 1, 0), (1, 1, 1), (0, 1, -1), (0, 1, 0), (0, 1, 1), (0, 0, 1)):
+        other = np.searchsorted(keys, cell_key(cells[first] + offset))
+        other[other == len(keys)] = 0
+        hit = np.flatnonzero(keys[other] == cell_key(cells[first] + offset))
+        close = np.linalg.norm(rep[hit] - rep[other[hit]], axis=1) <= distance
+        pairs.append((hit[close], other[hit][close]))
+    p = np.concatenate([a for a, _ in pairs])
+    q = np.concatenate([b for _, b in pairs])
+    while p.size:
+        low = np.minimum(label[p], label[q])
+        if (low == label[p]).all() and (low == label[q]).all():
+            break
+        np.minimum.at(label, p, low)
+        np.minimum.at(label, q, low)
+        label = label[label]
+
+    _, label = np.unique(label, return_inverse=True)
+    welded = np.zeros((label.max() + 1, 3))
+    welded[label] = rep
+    return welded, label[inverse.reshape(-1)][faces]
+
+def edge_runs(faces):
+    """
+    Group the directed edges of `faces` by undirected edge.
+
+    Returns (a, b, face_id, order, starts, counts): edge k runs a[k] -> b[k] in
+    face face_id[k]; order sorts the edges so that each undirected edge is one
+    run of counts[r] entries starting at starts[r].
+    """
+    a = faces.T.reshape(-1)
+    b = np.roll(faces, -1, axis=1).T.reshape(-1)
+    face_id = np.tile(np.arange(len(faces)), 3)
+    n = int(faces.max()) + 1 if len(faces) else 1
+    key = np.minimum(a, b) * n + np.maximum(a, b)
+    order = np.argsort(key, kind="stable")
+    _, starts, counts = np.unique(key[order], return_index=True, return_counts=True)
+    return a, b, face_id, order, starts, counts
+
+def orient_faces(verts, faces):
+    """
+    Give each connected patch of faces a consistent winding, facing up.
+
+    Flips propagate breadth-first over the face adjacency (faces sharing a
+    manifold edge), one frontier per step. Closed parts are then turned to
+    enclose a positive volume, open ones to face up on average.
+
+    Returns (faces, flipped, components, non_manifold, conflicts).
+    """
+    a, b, face_id, order, starts, counts = edge_runs(faces)
+    pairs = starts[counts == 2]
+    i, j = order[pairs], order[pairs + 1]
+    p, q = face_id[i], face_id[j]
+    same = (a[i] == a[j]).astype(np.int8)   # traversed the same way: one of the two must flip
+
+    # Symmetric face adjacency in CSR form
+    src = np.concatenate([p, q])
+    by_src = np.argsort(src, kind="stable")
+    dst = np.concatenate([q, p])[by_src]
+    rel = np.concatenate([same, same])[by_src]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=len(faces)))])
+
+    flip = np.zeros(len(faces), dtype=np.int8)
+    comp = np.full(len(faces), -1, dtype=np.int64)
+    components = seed = 0
+    while True:
+        while seed < len(faces) and comp[seed] >= 0:
+            seed += 1
+        if seed == len(faces):
+            break
+        comp[seed] = components
+        frontier = np.array([seed])
+        while frontier.size:
+            lo, hi = indptr[frontier], indptr[frontier + 1]
+            n = hi - lo
+            idx = np.repeat(hi - np.cumsum(n), n) + np.arange(n.sum())
+            nb = dst[idx]
+            nb_flip = np.repeat(flip[frontier], n) ^ rel[idx]
+            new = comp[nb] < 0
+            nb, first = np.unique(nb[new], return_index=True)
+            flip[nb] = nb_flip[new][first]
+            comp[nb] = components
+            frontier = nb
+        components += 1
+    conflicts = int(((flip[p] ^ flip[q]) != same).sum())
+
+    # Closed parts enclose positive volume, open parts face up
+    tri = verts[faces]
+    cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    sign = 1 - 2 * flip.astype(np.float64)
+    volume = np.bincount(comp, weights=sign * np.einsum("ij,ij->i", tri[:, 0], cross), minlength=components)
+    up = np.bincount(comp, weights=sign * cross[:, 2], minlength=components)
+    boundary = face_id[order[starts[counts == 1]]]
+    closed = np.bincount(comp[boundary], minlength=components) == 0
+    flip ^= np.where(closed, volume < 0, up < 0)[comp].astype(np.int8)
+
+    faces = faces.copy()
+    faces[flip == 1] = faces[flip == 1][:, ::-1]
+    return faces, int(flip.sum()), components, int((counts > 2).sum()), conflicts
+
+def fill_small_holes(faces, max_edges):
+    """
+    Fan-fill boundary loops of at most `max_edges` edges.
+
+    Returns (faces, filled, left_open); the mesh's outer border and any larger
+    opening count as left open.
+    """
+    a, b, face_id, order, starts, counts = edge_runs(faces)
+    single = order[starts[counts == 1]]
+    nxt = dict(zip(a[single].tolist(), b[single].tolist()))
+    fill, seen, filled, left_open = [], set(), 0, 0
+    for start in list(nxt):
+        if start in seen:
+            continue
+        loop = [start]
+        while nxt.get(loop[-1], start) != start and len(loop) <= len(nxt):
+            loop.append(nxt[loop[-1]])
+        seen.update(loop)
+        if 3 <= len(loop) <= max_edges and nxt.get(loop[-1]) == start:
+            fill += [(loop[0], loop[k + 1], loop[k]) for k in range(1, len(loop) - 1)]
+            filled += 1
+        else:
+            left_open += 1
+    fill = np.array(fill, dtype=faces.dtype).reshape(-1, 3)
+    return np.vstack([faces, fill]), filled, left_open
+
+def repair_mesh(verts, faces):
+    """
+    Weld, clean, orient and patch a triangle mesh, in NumPy only.
+
+    Replaces Blender's remove_doubles / fill_holes / normals_make_consistent,
+    and reports what it changed. Returns (verts, faces) with faces facing up.
+    """
+    start = time.time()
+    n_verts, n_faces = len(verts), len(faces)
+    verts, faces = weld_vertices(np.asarray(verts, dtype=np.float64), np.asarray(faces, dtype=np.int64),
+                                 WELD_DISTANCE)
+
+    # Faces collapsed by the weld, then faces repeated over the same three vertices
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])]
+    degenerate = n_faces - len(faces)
+    _, keep = np.unique(np.sort(faces, axis=1), axis=0, return_index=True)
+    duplicate = len(faces) - len(keep)
+    faces = faces[np.sort(keep)]
+
+    faces, flipped, components, non_manifold, conflicts = orient_faces(verts, faces)
+    faces, filled, left_open = fill_small_holes(faces, MAX_HOLE_EDGES)
+
+    print(f"Repair: welded {n_verts - len(verts):,} vertices, removed {degenerate:,} degenerate and "
+          f"{duplicate:,} duplicate faces, flipped {flipped:,} faces in {components:,} part(s), "
+          f"filled {filled:,} hole(s) ({left_open:,} boundary loop(s) left open), "
+          f"{non_manifold:,} non-manifold and {conflicts:,} non-orientable edge(s) "
+          f"[{time.time() - start:.2f}s]")
+    return verts, faces
+
 def cleanup_normals(obj):
-    bpy.context.view_layer.objects.active = obj
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.select_all(action='SELECT')
-    # Merge by distance (formerly remove_doubles)
-    bpy.ops.mesh.remove_doubles(threshold=0.0001)
-    try:
-        bpy.ops.mesh.fill_holes()  # may fail on complex meshes—safe to ignore
-    except Exception:
-        pass
-    bpy.ops.mesh.normals_make_consistent(inside=False)
-    bpy.ops.mesh.flip_normals()
-    bpy.ops.object.mode_set(mode='OBJECT')
+    """Repair the imported city in place, without entering edit mode."""
+    mesh = obj.data
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+    mesh.vertices.foreach_get("co", co)
+    verts, faces = repair_mesh(co.reshape(-1, 3), mesh_triangles(obj))
+
+    # The city is subtracted from the tile block, so its normals must face down:
+    # the side they point away from (above the surface) is what gets cut away
+    faces = faces[:, ::-1]
+
+    mesh.clear_geometry()
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set("co", verts.astype(np.float32).ravel())
+    mesh.loops.add(faces.size)
+    mesh.loops.foreach_set("vertex_index", faces.astype(np.int32).ravel())
+    mesh.polygons.add(len(faces))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, faces.size, 3, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(faces), 3, dtype=np.int32))
+    mesh.update(calc_edges=True)  # Rebuilt from loops and polygons only; derive the edges
 
 def tile_aabb(row, col):
     """Returns (min_x, max_x, min_y, max_y) for the tile in local coords."""
@@ -80,12 +323,83 @@ def tile_aabb(row, col):
     max_y = (row + 1) * TILE_SIZE
     return min_x, max_x, min_y, max_y
 
-def min_z_in_tile(city_obj, row, col):
+def world_vertices(obj):
+    """Bulk-read all vertex coordinates and return them in world space as an (N, 3) array."""
+    mesh = obj.data
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+    m = np.array(obj.matrix_world, dtype=np.float64)
+    return co @ m[:3, :3].T + m[:3, 3]
+
+def tile_min_z_grid(verts_world):
+    """
+    Lowest Z per tile in one pass. Returns a (TILES_Y, TILES_X) array, NaN for empty tiles.
+
+    Tile bounds are inclusive like tile_aabb, so a vertex on a shared edge
+    counts for both neighbouring tiles.
+    """
+    x, y, z = verts_world[:, 0] / TILE_SIZE, verts_world[:, 1] / TILE_SIZE, verts_world[:, 2]
+    grid = np.full(TILES_Y * TILES_X, np.inf)
+    # floor() bins interior vertices; ceil()-1 adds the lower/left tile for edge vertices
+    for cols in (np.floor(x), np.ceil(x) - 1):
+        for rows in (np.floor(y), np.ceil(y) - 1):
+            ok = (cols >= 0) & (cols < TILES_X) & (rows >= 0) & (rows < TILES_Y)
+            np.minimum.at(grid, (rows[ok] * TILES_X + cols[ok]).astype(np.int64), z[ok])
+    grid[np.isinf(grid)] = np.nan
+    return grid.reshape(TILES_Y, TILES_X)
+
+def mesh_triangles(obj):
+    """Bulk-read the triangulated faces as an (F, 3) vertex index array."""
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+    tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tris)
+    return tris.reshape(-1, 3)
+
+def face_tile_ranges(verts_world, tris):
+    """Per face, the inclusive (col_lo, col_hi, row_lo, row_hi) tiles its margin-padded XY bounds touch."""
+    corners = verts_world[tris][:, :, :2]
+    lo = np.floor((corners.min(axis=1) - CROP_MARGIN) / TILE_SIZE).astype(np.int32)
+    hi = np.floor((corners.max(axis=1) + CROP_MARGIN) / TILE_SIZE).astype(np.int32)
+    return np.stack([lo[:, 0], hi[:, 0], lo[:, 1], hi[:, 1]], axis=1)
+
+def crop_faces(city_arrays, row, col):
+    """
+    Only the city faces near one tile, as compacted (verts, faces) arrays.
+
+    The crop boundary lies CROP_MARGIN outside the tile, so the boolean result
+    inside the tile is unchanged while the solver only sees local triangles.
+    """
+    verts_world, tris, ranges = city_arrays
+    keep = (ranges[:, 0] <= col) & (ranges[:, 1] >= col) & (ranges[:, 2] <= row) & (ranges[:, 3] >= row)
+    used, faces = np.unique(tris[keep], return_inverse=True)
+    return verts_world[used], faces.reshape(-1, 3).astype(np.int32)
+
+def crop_city(city_arrays, row, col):
+    """Copy the city faces near one tile into a temporary object."""
+    verts, faces = crop_faces(city_arrays, row, col)
+
+    mesh = bpy.data.meshes.new(f"CityCrop_{col}_{row}")
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set("co", verts.astype(np.float32).ravel())
+    mesh.loops.add(faces.size)
+    mesh.loops.foreach_set("vertex_index", faces.ravel())
+    mesh.polygons.add(len(faces))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, faces.size, 3, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(faces), 3, dtype=np.int32))
+    mesh.update(calc_edges=True)  # foreach_set leaves the mesh without edges; the boolean needs them
+
+    obj = bpy.data.objects.new(mesh.name, mesh)
+    bpy.context.collection.objects.link(obj)
+    return obj
+
+def min_z_in_tile(min_z_grid, row, col):
     """Find the lowest Z among city verts within the tile XY bounds. Returns None if empty."""
-    min_x, max_x, min_y, max_y = tile_aabb(row, col)
-    verts_world = [city_obj.matrix_world @ v.co for v in city_obj.data.vertices]
-    zs = [v.z for v in verts_world if (min_x <= v.x <= max_x and min_y <= v.y <= max_y)]
-    return min(zs) if zs else None
+    if not (0 <= row < TILES_Y and 0 <= col < TILES_X):
+        return None
+    z = min_z_grid[row, col]
+    return None if np.isnan(z) else float(z)
 
 def quantized_bottom(min_z):
     """Compute cube_bottom using either a single layer under min_z or quantization to 2 cm multiples."""
@@ -96,17 +410,116 @@ def quantized_bottom(min_z):
     snapped = QUANTIZE_ANCHOR_Z + math.floor((pre_base - QUANTIZE_ANCHOR_Z) / step) * step
     return snapped - EPS
 
+def tile_block(min_z_grid, row, col):
+    """Placement of a tile's block below the city: center, bottom, top and height. None if empty."""
+    min_z = min_z_in_tile(min_z_grid, row, col)
+    if min_z is None:
+        return None
+    x = col * TILE_SIZE + TILE_SIZE / 2
+    y = row * TILE_SIZE + TILE_SIZE / 2
+    cube_bottom = quantized_bottom(min_z)
+    cube_top = min_z + TILE_SIZE / 2
+    cube_height = cube_top - cube_bottom
+    z = cube_bottom + cube_height / 2
+    return {"center": (x, y, z), "bottom": cube_bottom, "top": cube_top, "height": cube_height}
+
+def tile_input_hash(verts, faces, block, backend):
+    """
+    Hash of everything a tile is built from: its cropped city triangles, its block
+    and the parameters that shape the cut. Triangles are put in a canonical order
+    (and each starts at its smallest corner, keeping the winding), so re-exporting
+    an unchanged city in a different face order keeps the hash.
+    """
+    tri = np.round(verts, 7)[faces]
+    first = np.lexsort(tri[:, :, ::-1].transpose(2, 0, 1), axis=-1)[:, 0]
+    tri = tri[np.arange(len(tri))[:, None], (first[:, None] + np.arange(3)) % 3].reshape(-1, 9)
+    tri = tri[np.lexsort(tri.T[::-1])]
+
+    params = {
+        "backend": backend, "block": block, "tile_size": TILE_SIZE,
+        "base_depth": MIN_MODEL_BASE_DEPTH, "fill_layer": FILL_LAYER_THICKNESS,
+        "quantize": QUANTIZE_FILL, "quantize_anchor": QUANTIZE_ANCHOR_Z,
+        "magnet": [MAGNET_RADIUS, MAGNET_HEIGHT, MAGNET_PERIM_OFFSET_MM, MAGNET_SAFETY, COUNTERSINK_SHOULDER],
+    }
+    h = hashlib.sha256(np.ascontiguousarray(tri, dtype=np.float64).tobytes())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+def load_build_manifest():
+    if BUILD_MANIFEST_PATH.exists():
+        with open(BUILD_MANIFEST_PATH) as f:
+            return json.load(f)
+    return {"tiles": {}}
+
+@contextmanager
+def build_manifest_lock(stale_after=60):
+    """Cross-process lock, so parallel workers can update the build manifest safely."""
+    lock = BUILD_MANIFEST_PATH.with_suffix(".lock")
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock.stat().st_mtime > stale_after:
+                    lock.unlink()   # left behind by a crashed worker
+            except FileNotFoundError:
+                pass
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        lock.unlink()
+
+def record_tile_build(row, col, input_hash, path, block=None, solver=None):
+    """
+    Store (or with input_hash=None, drop) a tile's entry in the build manifest.
+
+    The block and solver are kept for validate_tiles.py.
+    """
+    with build_manifest_lock():
+        manifest = load_build_manifest()
+        key = f"{row},{col}"
+        if input_hash is None:
+            manifest["tiles"].pop(key, None)
+        else:
+            manifest["tiles"][key] = {"hash": input_hash, "path": str(path), "block": block, "solver": solver}
+        tmp = BUILD_MANIFEST_PATH.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        tmp.replace(BUILD_MANIFEST_PATH)
+
+def unchanged_tile(manifest, row, col, input_hash):
+    """STL path of a tile already built from the same inputs, else None."""
+    entry = manifest["tiles"].get(f"{row},{col}", {})
+    if entry.get("hash") == input_hash and Path(entry["path"]).exists():
+        return entry["path"]
+    return None
+
+def drop_empty_tile(manifest, row, col):
+    """A tile that is now empty must not keep an STL from an earlier city mesh."""
+    entry = manifest["tiles"].get(f"{row},{col}")
+    if entry:
+        Path(entry["path"]).unlink(missing_ok=True)
+        record_tile_build(row, col, None, None)
+
 def add_boolean(mod_owner, cutter, name, op='DIFFERENCE'):
     m = mod_owner.modifiers.new(name=name, type='BOOLEAN')
     m.object = cutter
     m.operation = op
-    m.solver = 'EXACT'
+    m.solver = BOOLEAN_SOLVER
     # Keep scene tidy; booleans will be applied later
     cutter.hide_set(True)
     return m
 
-def add_corner_magnets(cube, row, col, x, y, z, cube_height):
-    """Four magnet holes + 45° countersinks near tile corners (booleans)."""
+def magnet_layout(x, y, z, cube_height):
+    """
+    Placement of the four magnet holes + 45° countersinks near the tile corners.
+
+    Returns one dict per corner with the hole cylinder (center, depth) and the
+    countersink cone (base radius, height, center) shared by both backends.
+    """
     offset_m = max(MAGNET_PERIM_OFFSET_MM / 1000.0, MAGNET_RADIUS + MAGNET_SAFETY)
 
     # Cylinders extended below tile for robust boolean ops
@@ -116,46 +529,75 @@ def add_corner_magnets(cube, row, col, x, y, z, cube_height):
     tile_bottom_z = z - (cube_height / 2)
     magnet_center_z = tile_bottom_z + (MAGNET_HEIGHT / 2) - (extra / 2)
 
+    # Countersink (45° cone) with a small radial shoulder
+    cone_base_radius = max(MAGNET_RADIUS - COUNTERSINK_SHOULDER, 0.0005)
+    cone_h = cone_base_radius  # 45° -> height = radius
+    cone_base_z = tile_bottom_z + MAGNET_HEIGHT - 0.0005  # small overlap
+    cone_center_z = cone_base_z + cone_h / 2
+
     half = TILE_SIZE / 2
     dx = half - offset_m
     dy = half - offset_m
     corners = [(x - dx, y - dy), (x + dx, y - dy), (x - dx, y + dy), (x + dx, y + dy)]
 
-    for i, (cx, cy) in enumerate(corners):
-        # Hole
-        bpy.ops.mesh.primitive_cylinder_add(radius=MAGNET_RADIUS, depth=depth, location=(cx, cy, magnet_center_z))
-        cyl = bpy.context.active_object
-        cyl.name = f"MagnetHole_{col}_{row}_{i}"
-        add_boolean(cube, cyl, f"MagnetHole_{i}")
-
-        # Countersink (45° cone) with a small radial shoulder
-        cone_base_radius = max(MAGNET_RADIUS - COUNTERSINK_SHOULDER, 0.0005)
-        cone_h = cone_base_radius  # 45° -> height = radius
-        cone_base_z = tile_bottom_z + MAGNET_HEIGHT - 0.0005  # small overlap
-        cone_center_z = cone_base_z + cone_h / 2
-
-        bpy.ops.mesh.primitive_cone_add(
-            radius1=cone_base_radius,
-            radius2=0.0,
-            depth=cone_h,
-            location=(cx, cy, cone_center_z),
-            rotation=(0.0, 0.0, 0.0),
-        )
-        cone = bpy.context.active_object
-        cone.name = f"MagnetCountersink_{col}_{row}_{i}"
-        add_boolean(cube, cone, f"MagnetCountersink_{i}")
+    return [
+        {
+            "hole_center": (cx, cy, magnet_center_z),
+            "hole_depth": depth,
+            "cone_radius": cone_base_radius,
+            "cone_height": cone_h,
+            "cone_center": (cx, cy, cone_center_z),
+        }
+        for cx, cy in corners
+    ]
+
+def magnet_cutter_mesh():
+    """
+    All four magnet holes + countersinks as one mesh, built once per run.
+
+    The cutter is laid out around a tile centered on the origin with its bottom
+    at z=0; every tile instances this same mesh at its own position.
+    """
+    mesh = bpy.data.meshes.get("MagnetCutter")
+    if mesh is not None:
+        return mesh
+
+    bm = bmesh.new()
+    for magnet in magnet_layout(0.0, 0.0, 0.0, 0.0):
+        # Same 32-segment geometry as primitive_cylinder_add / primitive_cone_add
+        bmesh.ops.create_cone(bm, cap_ends=True, segments=32,
+                              radius1=MAGNET_RADIUS, radius2=MAGNET_RADIUS, depth=magnet["hole_depth"],
+                              matrix=Matrix.Translation(magnet["hole_center"]))
+        bmesh.ops.create_cone(bm, cap_ends=True, segments=32,
+                              radius1=magnet["cone_radius"], radius2=0.0, depth=magnet["cone_height"],
+                              matrix=Matrix.Translation(magnet["cone_center"]))
+    mesh = bpy.data.meshes.new("MagnetCutter")
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.use_fake_user = True   # survives the orphan cleanup between tiles
+    return mesh
+
+def add_corner_magnets(cube, row, col, x, y, z, cube_height):
+    """Four magnet holes + 45° countersinks near tile corners, as a single boolean."""
+    cutter = bpy.data.objects.new(f"MagnetCutter_{col}_{row}", magnet_cutter_mesh())
+    cutter.location = (x, y, z - cube_height / 2)
+    bpy.context.collection.objects.link(cutter)
+    # Each hole overlaps its countersink, so the cutter intersects itself
+    add_boolean(cube, cutter, "Magnets").use_self = True
 
 def apply_modifiers(obj, names=None):
     bpy.context.view_layer.objects.active = obj
     bpy.ops.object.mode_set(mode='OBJECT')
     if names is None:
         names = [m.name for m in obj.modifiers]
+    failed = []
     for name in names:
         try:
             bpy.ops.object.modifier_apply(modifier=name)
         except RuntimeError:
-            # Boolean may fail if already applied or invalid; continue
-            pass
+            # Boolean may fail if already applied or invalid; report and continue
+            failed.append(name)
+    return failed
 
 def export_tile(obj, row, col):
     obj.hide_set(False)
@@ -164,23 +606,29 @@ def export_tile(obj, row, col):
     obj.hide_set(True)
     return out
 
+def remove_tile_objects(row, col):
+    """Delete a tile and its magnet cutters so the next tile starts from a clean scene."""
+    for obj in list(bpy.data.objects):
+        if obj.name in (f"Tile_{col}_{row}", f"CityCrop_{col}_{row}", f"MagnetCutter_{col}_{row}"):
+            bpy.data.objects.remove(obj, do_unlink=True)
+    # Free the mesh data left behind by the removed objects
+    for mesh in list(bpy.data.meshes):
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+
 
 # =========================
 # 2) MAIN
 # =========================
-def process_tile(city_obj, row, col, tiles):
-    min_z = min_z_in_tile(city_obj, row, col)
-    if min_z is None:
+def process_tile(city_arrays, min_z_grid, row, col, tiles):
+    block = tile_block(min_z_grid, row, col)
+    if block is None:
         # No geometry overlaps this tile; skip creating an empty tile
         return
 
     # Cube placement
-    x = col * TILE_SIZE + TILE_SIZE / 2
-    y = row * TILE_SIZE + TILE_SIZE / 2
-    cube_bottom = quantized_bottom(min_z)
-    cube_top = min_z + TILE_SIZE / 2
-    cube_height = cube_top - cube_bottom
-    z = cube_bottom + cube_height / 2
+    x, y, z = block["center"]
+    cube_height = block["height"]
 
     # Create cube and scale Z to desired height
     bpy.ops.mesh.primitive_cube_add(size=TILE_SIZE, location=(x, y, z))
@@ -188,15 +636,413 @@ def process_tile(city_obj, row, col, tiles):
     cube.name = f"Tile_{col}_{row}"
     cube.scale.z = cube_height / TILE_SIZE
 
-    # City difference
-    add_boolean(cube, city_obj, "Difference")
+    # City difference, against only the faces around this tile
+    add_boolean(cube, crop_city(city_arrays, row, col), "Difference")
 
     # Magnets
     add_corner_magnets(cube, row, col, x, y, z, cube_height)
 
     tiles.append(cube)
 
+def build_tile(city_arrays, min_z_grid, row, col):
+    """Create, cut and export one tile. Returns the STL path, or None if the tile is empty."""
+    tiles = []
+    process_tile(city_arrays, min_z_grid, row, col, tiles)
+    if not tiles:
+        return None
+    t = tiles[0]
+
+    # Hide while we apply modifiers & export
+    t.hide_set(True)
+
+    # Apply the city difference first
+    failed = apply_modifiers(t, names=["Difference"])
+    # Then the magnet holes + countersinks, in one boolean
+    failed += apply_modifiers(t, names=["Magnets"])
+    if failed or not t.data.polygons:
+        raise RuntimeError(f"boolean failed: {', '.join(failed) or 'empty result'}")
+
+    return export_tile(t, row, col)
+
+
+# =========================
+# 3) BLENDER-FREE BACKEND (trimesh + manifold3d)
+# =========================
+def load_city_trimesh(path: Path):
+    import trimesh
+    city = trimesh.load(str(path), force="mesh")
+    # The tile solid is built below the surface, so its normals must face up
+    verts, faces = repair_mesh(city.vertices, city.faces)
+    return trimesh.Trimesh(verts, faces, process=False)
+
+def tile_solid_trimesh(verts, faces, row, col, block, engine="manifold"):
+    """
+    Closed solid of the city surface over one tile, cut to the tile block.
+
+    The cropped surface is trimmed exactly to the tile square, its boundary is
+    extruded down to a flat floor and the result is intersected with the block.
+    This is the manifold equivalent of the block minus everything above the city.
+
+    Where the surface has holes or does not cover the whole tile, its rim loops
+    are open inside the tile. The floor is then the surface's own triangulation
+    flattened (so every loop closes), and a slab up to the tile's lowest city
+    point fills the gaps and uncovered edges as flat ground.
+    """
+    import trimesh
+    min_x, max_x, min_y, max_y = tile_aabb(row, col)
+    patch = trimesh.Trimesh(verts, faces, process=False)
+    for normal, origin in (((1, 0, 0), (min_x, 0, 0)), ((-1, 0, 0), (max_x, 0, 0)),
+                           ((0, 1, 0), (0, min_y, 0)), ((0, -1, 0), (0, max_y, 0))):
+        patch = trimesh.intersections.slice_mesh_plane(patch, normal, origin)
+    patch.merge_vertices()
+    if len(patch.faces) == 0:
+        raise RuntimeError("no city surface inside the tile")
+
+    # Boundary edges are used by one face only; with normals up they run counter-clockwise
+    edges = patch.edges[trimesh.grouping.group_rows(patch.edges_sorted, require_count=1)]
+    rim = patch.vertices[np.unique(edges)]
+    on_rim = (np.isclose(rim[:, 0], min_x, atol=1e-5) | np.isclose(rim[:, 0], max_x, atol=1e-5) |
+              np.isclose(rim[:, 1], min_y, atol=1e-5) | np.isclose(rim[:, 1], max_y, atol=1e-5))
+    covered = on_rim.all()
+
+    # Walls from each boundary edge down to the floor, and a fan floor around the tile center
+    n = len(patch.vertices)
+    floor_z = block["bottom"] - TILE_SIZE
+    floor = patch.vertices.copy()
+    floor[:, 2] = floor_z
+    center = [[(min_x + max_x) / 2, (min_y + max_y) / 2, floor_z]]
+    a, b = edges[:, 0], edges[:, 1]
+    if covered:
+        floor_faces = np.column_stack([np.full(len(a), 2 * n), b + n, a + n])
+    else:
+        floor_faces = patch.faces[:, ::-1] + n
+    solid = trimesh.Trimesh(
+        np.vstack([patch.vertices, floor, center]),
+        np.vstack([
+            patch.faces,
+            np.column_stack([a, a + n, b + n]),
+            np.column_stack([a, b + n, b]),
+            floor_faces,
+        ]),
+        process=False,
+    )
+    solid.remove_unreferenced_vertices()
+
+    cube = trimesh.creation.box(bounds=[[min_x, min_y, block["bottom"]], [max_x, max_y, block["top"]]])
+    if not covered:
+        slab_top = block["top"] - TILE_SIZE / 2  # The tile's lowest city point (see tile_block)
+        slab = trimesh.creation.box(bounds=[[min_x, min_y, floor_z], [max_x, max_y, slab_top]])
+        solid = trimesh.boolean.union([solid, slab], engine=engine)
+    return trimesh.boolean.intersection([solid, cube], engine=engine)
+
+@lru_cache(maxsize=None)
+def magnet_cutter_template_trimesh():
+    """All magnet holes + countersinks as one solid, around a tile centered on the origin with its bottom at z=0."""
+    import trimesh
+    from trimesh.transformations import translation_matrix
+    parts = []
+    for magnet in magnet_layout(0.0, 0.0, 0.0, 0.0):
+        parts.append(trimesh.creation.cylinder(
+            radius=MAGNET_RADIUS, height=magnet["hole_depth"], sections=32,
+            transform=translation_matrix(magnet["hole_center"]),
+        ))
+        # trimesh cones sit on their base; Blender's are centered
+        cx, cy, cz = magnet["cone_center"]
+        parts.append(trimesh.creation.cone(
+            radius=magnet["cone_radius"], height=magnet["cone_height"], sections=32,
+            transform=translation_matrix((cx, cy, cz - magnet["cone_height"] / 2)),
+        ))
+    return trimesh.boolean.union(parts, engine="manifold")
+
+def magnet_cutter_trimesh(block):
+    """The shared magnet cutter, moved under one tile."""
+    x, y, _ = block["center"]
+    return magnet_cutter_template_trimesh().copy().apply_translation((x, y, block["bottom"]))
+
+def build_tile_trimesh(job):
+    """Process-pool worker: cut and export one tile. Returns (row, col, status, detail)."""
+    import trimesh
+    row, col, block = job["row"], job["col"], job["block"]
+    try:
+        tile = tile_solid_trimesh(job["verts"], job["faces"], row, col, block, job["engine"])
+        tile = trimesh.boolean.difference([tile, magnet_cutter_trimesh(block)], engine=job["engine"])
+        if tile.is_empty:
+            raise RuntimeError("empty result")
+    except Exception as e:
+        return row, col, "TILE_FAILED", f"boolean failed: {e}"
+    out = OUTPUT_DIR / f"tile_{col}_{row}.stl"
+    tile.export(str(out))
+    export_tile_formats(out, row, col)
+    return row, col, "TILE_OK", str(out)
+
+def main_trimesh(args):
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    ensure_dirs()
+
+    # Import and clean city mesh
+    city = load_city_trimesh(CITY_MESH_PATH)
+    verts = np.asarray(city.vertices)
+    tris = np.asarray(city.faces)
+    min_z_grid = tile_min_z_grid(verts)
+    city_arrays = (verts, tris, face_tile_ranges(verts, tris))
+
+    # Crop in the parent so workers only receive their own tile's triangles
+    manifest = load_build_manifest()
+    jobs = []
+    for row, col in tiles_to_build(args):
+        block = tile_block(min_z_grid, row, col)
+        if block is None:
+            drop_empty_tile(manifest, row, col)
+            print(f"TILE_EMPTY {row} {col}", flush=True)
+            continue
+        patch_verts, patch_faces = crop_faces(city_arrays, row, col)
+        input_hash = tile_input_hash(patch_verts, patch_faces, block, "trimesh")
+        out = None if args.force else unchanged_tile(manifest, row, col, input_hash)
+        if out:
+            export_tile_formats(out, row, col, only_missing=True)
+            print(f"Unchanged: {out}")
+            print(f"TILE_OK {row} {col} {out}", flush=True)
+            continue
+        jobs.append({"row": row, "col": col, "block": block, "verts": patch_verts, "faces": patch_faces,
+                     "hash": input_hash, "engine": FALLBACK_ENGINE if args.fallback else TRIMESH_ENGINE})
+
+    count = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=apply_config, initargs=(current_config(),)) as pool:
+        futures = {pool.submit(build_tile_trimesh, job): job for job in jobs}
+        for future in as_completed(futures):
+            row, col, status, detail = future.result()
+            if status == "TILE_OK":
+                count += 1
+                job = futures[future]
+                record_tile_build(row, col, job["hash"], detail, job["block"], job["engine"])
+                print(f"Exported: {detail}")
+            print(f"{status} {row} {col} {detail}", flush=True)
+
+    print(f"Created {count} tile(s) with city cut, 2 cm-quantized underside, and four corner magnet holes.")
+    if not args.tiles:
+        write_table_exports()
+
+
+# =========================
+# 4) EXPORT FORMATS (3MF, GLB, table manifest)
+# =========================
+def read_stl(path):
+    """Binary STL as indexed (verts, faces), with identical corners shared."""
+    data = np.fromfile(str(path), dtype=np.uint8)
+    count = int(data[80:84].view("<u4")[0])
+    record = np.dtype([("normal", "<f4", 3), ("corners", "<f4", (3, 3)), ("attr", "<u2")])
+    corners = np.frombuffer(data[84:84 + count * record.itemsize].tobytes(), dtype=record)["corners"]
+    verts, inverse = np.unique(corners.reshape(-1, 3), axis=0, return_inverse=True)
+    return verts.astype(np.float64), inverse.reshape(-1, 3)
+
+def model_3mf(objects, placements):
+    """
+    3MF model XML in millimeters. objects are (name, verts, faces) in meters,
+    placements (object index, (x, y, z) offset in meters) build items.
+    """
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<model unit="millimeter" xml:lang="en-US" '
+           'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+           '<metadata name="Application">dtcc-table tile_city_mesh.py</metadata><resources>']
+    for i, (name, verts, faces) in enumerate(objects, 1):
+        xml.append(f'<object id="{i}" name="{name}" type="model"><mesh><vertices>')
+        xml.append("".join(f'<vertex x="{x:.4f}" y="{y:.4f}" z="{z:.4f}"/>' for x, y, z in (verts * 1000).tolist()))
+        xml.append("</vertices><triangles>")
+        xml.append("".join(f'<triangle v1="{a}" v2="{b}" v3="{c}"/>' for a, b, c in faces.tolist()))
+        xml.append("</triangles></mesh></object>")
+    xml.append("</resources><build>")
+    for i, (x, y, z) in placements:
+        xml.append(f'<item objectid="{i + 1}" transform="1 0 0 0 1 0 0 0 1 {x * 1000:.4f} {y * 1000:.4f} {z * 1000:.4f}"/>')
+    xml.append("</build></model>")
+    return "".join(xml)
+
+def write_3mf(path, objects, placements):
+    import zipfile
+    content_types = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                     '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+                     '</Types>')
+    rels = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+            'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/></Relationships>')
+    tmp = path.with_name(path.name + ".tmp")
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", content_types)
+        z.writestr("_rels/.rels", rels)
+        z.writestr("3D/3dmodel.model", model_3mf(objects, placements))
+    tmp.replace(path)
+
+def tile_local(verts, row, col):
+    """Vertices moved so the tile's corner is at x=y=0 and its bottom at z=0."""
+    min_x, _, min_y, _ = tile_aabb(row, col)
+    return verts - (min_x, min_y, verts[:, 2].min())
+
+def glb_bytes(meshes):
+    """
+    Binary glTF with one node per (name, verts, faces) mesh, in meters, Z up.
+
+    Positions are quantized to 16 bits over each mesh's bounding box
+    (KHR_mesh_quantization) and each node's scale/translation maps them back,
+    so vertices take 8 bytes instead of 12 while staying within a few µm.
+    """
+    import struct
+    binary, views, accessors, gltf_meshes, nodes = bytearray(), [], [], [], []
+
+    def add_view(data, target, stride=None):
+        binary.extend(b"\0" * (-len(binary) % 4))
+        view = {"buffer": 0, "byteOffset": len(binary), "byteLength": len(data), "target": target}
+        if stride:
+            view["byteStride"] = stride
+        views.append(view)
+        binary.extend(data)
+        return len(views) - 1
+
+    for name, verts, faces in meshes:
+        lo = verts.min(axis=0)
+        extent = np.maximum(verts.max(axis=0) - lo, 1e-9)
+        q = np.zeros((len(verts), 4), dtype="<u2")   # padded to a 4-byte aligned stride
+        q[:, :3] = np.round((verts - lo) / extent * 65535)
+        accessors.append({"bufferView": add_view(q.tobytes(), 34962, 8), "componentType": 5123,
+                          "normalized": True, "count": len(verts), "type": "VEC3",
+                          "min": q[:, :3].min(axis=0).tolist(), "max": q[:, :3].max(axis=0).tolist()})
+        index_type, component = ("<u2", 5123) if len(verts) < 65536 else ("<u4", 5125)
+        accessors.append({"bufferView": add_view(faces.astype(index_type).tobytes(), 34963),
+                          "componentType": component, "count": faces.size, "type": "SCALAR"})
+        gltf_meshes.append({"name": name, "primitives": [
+            {"attributes": {"POSITION": len(accessors) - 2}, "indices": len(accessors) - 1, "material": 0}]})
+        nodes.append({"name": name, "mesh": len(gltf_meshes) - 1, "translation": lo.tolist(), "scale": extent.tolist()})
+
+    # glTF is Y up; one root node turns the Z-up table upright
+    nodes.append({"name": "table", "rotation": [-0.7071068, 0.0, 0.0, 0.7071068], "children": list(range(len(meshes)))})
+    gltf = {
+        "asset": {"version": "2.0", "generator": "dtcc-table tile_city_mesh.py"},
+        "extensionsUsed": ["KHR_mesh_quantization"], "extensionsRequired": ["KHR_mesh_quantization"],
+        "scene": 0, "scenes": [{"nodes": [len(nodes) - 1]}], "nodes": nodes, "meshes": gltf_meshes,
+        "materials": [{"pbrMetallicRoughness": {"baseColorFactor": [0.85, 0.85, 0.85, 1.0],
+                                                "metallicFactor": 0.0, "roughnessFactor": 0.9}}],
+        "accessors": accessors, "bufferViews": views, "buffers": [{"byteLength": len(binary)}],
+    }
+    binary.extend(b"\0" * (-len(binary) % 4))
+    body = json.dumps(gltf, separators=(",", ":")).encode()
+    body += b" " * (-len(body) % 4)
+    return b"".join([
+        struct.pack("<4sII", b"glTF", 2, 12 + 8 + len(body) + 8 + len(binary)),
+        struct.pack("<I4s", len(body), b"JSON"), body,
+        struct.pack("<I4s", len(binary), b"BIN\0"), bytes(binary),
+    ])
+
+def write_glb(path, meshes):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(glb_bytes(meshes))
+    tmp.replace(path)
+
+def export_tile_formats(stl_path, row, col, only_missing=False):
+    """Write the tile's EXPORT_FORMATS next to its STL: 3MF centered on the build plate, GLB in place."""
+    stl_path = Path(stl_path)
+    todo = {fmt: stl_path.with_suffix(f".{fmt}") for fmt in EXPORT_FORMATS}
+    todo = {fmt: p for fmt, p in todo.items() if not (only_missing and p.exists())}
+    if not todo:
+        return
+    verts, faces = read_stl(stl_path)
+    name = stl_path.stem
+    if "3mf" in todo:
+        margin = (PLATE_SIZE - TILE_SIZE) / 2
+        write_3mf(todo["3mf"], [(name, tile_local(verts, row, col), faces)], [(0, (margin, margin, 0.0))])
+    if "glb" in todo:
+        write_glb(todo["glb"], [(name, verts, faces)])
+
+def write_table_exports():
+    """
+    table.3mf, table.glb and table.json for every tile in the build manifest,
+    so a slicer or the web viewer can load the whole table in one fetch.
+
+    In table.3mf the tiles keep their place on the table with their bottoms on
+    the plate; table.glb keeps them in table coordinates.
+    """
+    manifest = load_build_manifest()
+    tiles, objects, placements = [], [], []
+    for key in sorted(manifest["tiles"], key=lambda k: tuple(int(v) for v in k.split(","))):
+        entry = manifest["tiles"][key]
+        stl_path = Path(entry["path"])
+        if not stl_path.exists():
+            continue
+        row, col = (int(v) for v in key.split(","))
+        verts, faces = read_stl(stl_path)
+        min_x, _, min_y, _ = tile_aabb(row, col)
+        objects.append((stl_path.stem, tile_local(verts, row, col), faces))
+        placements.append((len(objects) - 1, (min_x, min_y, 0.0)))
+        tiles.append({
+            "row": row, "col": col, "name": stl_path.stem,
+            "bounds": [verts.min(axis=0).tolist(), verts.max(axis=0).tolist()],
+            "vertices": int(len(verts)), "triangles": int(len(faces)),
+            "files": {fmt: stl_path.with_suffix(f".{fmt}").name
+                      for fmt in ("stl",) + tuple(EXPORT_FORMATS) if stl_path.with_suffix(f".{fmt}").exists()},
+            "hash": entry.get("hash"),
+        })
+    if not tiles:
+        return None
+
+    write_3mf(TABLE_3MF_PATH, objects, placements)
+    write_glb(TABLE_GLB_PATH, [(name, verts + (x, y, 0.0), faces)
+                               for (name, verts, faces), (_, (x, y, _z)) in zip(objects, placements)])
+    table = {
+        "unit": "m", "tile_size": TILE_SIZE, "tiles_x": TILES_X, "tiles_y": TILES_Y,
+        "files": {"3mf": TABLE_3MF_PATH.name, "glb": TABLE_GLB_PATH.name},
+        "tiles": tiles,
+    }
+    tmp = TABLE_MANIFEST_PATH.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(table, f, indent=2)
+    tmp.replace(TABLE_MANIFEST_PATH)
+    print(f"Table: {TABLE_MANIFEST_PATH} ({len(tiles)} tile(s))")
+    return TABLE_MANIFEST_PATH
+
+
+# =========================
+# 5) ENTRY POINT
+# =========================
+def parse_args():
+    """Arguments after '--' on the Blender command line, or all arguments under plain Python."""
+    if "--" in sys.argv:
+        argv = sys.argv[sys.argv.index("--") + 1:]
+    else:
+        argv = [] if bpy else sys.argv[1:]
+    parser = argparse.ArgumentParser(prog="tile_city_mesh.py")
+    parser.add_argument("--tiles", help='row,col pairs separated by ";" (overrides SINGLE_TILE_MODE)')
+    parser.add_argument("--backend", choices=("blender", "trimesh"), default="blender" if bpy else "trimesh",
+                        help="boolean backend (default: blender inside Blender, trimesh otherwise)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="parallel tiles for the trimesh backend")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild tiles even if their inputs are unchanged since the last build")
+    parser.add_argument("--formats", help='extra formats next to the STLs, e.g. "3mf,glb" ("" for none; '
+                                          'default: EXPORT_FORMATS)')
+    parser.add_argument("--fallback", action="store_true",
+                        help=f"use the fallback boolean solver ({FALLBACK_SOLVER} in Blender, "
+                             f"{FALLBACK_ENGINE} for the trimesh backend)")
+    return parser.parse_args(argv)
+
+def tiles_to_build(args):
+    if args.tiles:
+        return [tuple(int(v) for v in pair.split(",")) for pair in args.tiles.split(";") if pair.strip()]
+    if SINGLE_TILE_MODE:
+        return [(SINGLE_TILE_ROW, SINGLE_TILE_COL)]
+    return [(r, c) for r in range(TILES_Y) for c in range(TILES_X)]
+
 def main():
+    global BOOLEAN_SOLVER, EXPORT_FORMATS
+    args = parse_args()
+    if args.formats is not None:
+        EXPORT_FORMATS = tuple(fmt for fmt in args.formats.split(",") if fmt)
+    if set(EXPORT_FORMATS) - {"3mf", "glb"}:
+        raise SystemExit(f"Unknown export format in {EXPORT_FORMATS}; use 3mf and/or glb")
+    if args.backend == "trimesh":
+        return main_trimesh(args)
+    if args.fallback:
+        BOOLEAN_SOLVER = FALLBACK_SOLVER
+
     ensure_dirs()
     clear_scene()
 
@@ -204,33 +1050,48 @@ def main():
     city = import_city_mesh(CITY_MESH_PATH)
     cleanup_normals(city)
 
-    tiles = []
-
-    if SINGLE_TILE_MODE:
-        process_tile(city, SINGLE_TILE_ROW, SINGLE_TILE_COL, tiles)
-    else:
-        for r in range(TILES_Y):
-            for c in range(TILES_X):
-                process_tile(city, r, c, tiles)
+    # Plan every tile's underside from a single vectorized pass over the mesh
+    verts_world = world_vertices(city)
+    min_z_grid = tile_min_z_grid(verts_world)
 
-    # Hide all while we apply modifiers & export
-    for t in tiles:
-        t.hide_set(True)
+    # Bucket faces by tile once, for the per-tile crops
+    tris = mesh_triangles(city)
+    city_arrays = (verts_world, tris, face_tile_ranges(verts_world, tris))
     city.hide_set(True)
 
-    # Apply modifiers + export each
-    for t in tiles:
-        # Apply the city difference first
-        apply_modifiers(t, names=["Difference"])
-        # Then apply all magnet booleans (holes + countersinks)
-        magnet_mods = [m.name for m in t.modifiers if m.name.startswith(("MagnetHole", "MagnetCountersink"))]
-        apply_modifiers(t, names=magnet_mods)
+    # Build, export and drop each tile in turn, skipping tiles whose inputs are unchanged
+    manifest = load_build_manifest()
+    count = 0
+    for row, col in tiles_to_build(args):
+        block = tile_block(min_z_grid, row, col)
+        if block is None:
+            drop_empty_tile(manifest, row, col)
+            print(f"TILE_EMPTY {row} {col}", flush=True)
+            continue
+        input_hash = tile_input_hash(*crop_faces(city_arrays, row, col), block, "blender")
+        out = None if args.force else unchanged_tile(manifest, row, col, input_hash)
+        if out:
+            export_tile_formats(out, row, col, only_missing=True)
+            print(f"Unchanged: {out}")
+            print(f"TILE_OK {row} {col} {out}", flush=True)
+            continue
 
-        out = export_tile(t, row=int(t.name.split("_")[2]), col=int(t.name.split("_")[1]))
+        try:
+            out = build_tile(city_arrays, min_z_grid, row, col)
+        except RuntimeError as e:
+            print(f"TILE_FAILED {row} {col} {e}", flush=True)
+            continue
+        finally:
+            remove_tile_objects(row, col)
+        count += 1
+        export_tile_formats(out, row, col)
+        record_tile_build(row, col, input_hash, out, block, BOOLEAN_SOLVER)
         print(f"Exported: {out}")
+        print(f"TILE_OK {row} {col} {out}", flush=True)
 
-    count = 1 if SINGLE_TILE_MODE else (TILES_X * TILES_Y)
     print(f"Created {count} tile(s) with city cut, 2 cm-quantized underside, and four corner magnet holes.")
+    if not args.tiles:
+        write_table_exports()
 
 if __name__ == "__main__":
     main()
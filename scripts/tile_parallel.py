@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Build all tiles in parallel across several headless Blender processes.
+
+- Splits the (row, col) tile grid from tile_city_mesh.py over N workers,
+  each running `blender -b -P tile_city_mesh.py -- --tiles ...`.
+- Streams per-tile progress from the workers into one manifest.
+- Retries tiles whose boolean failed or whose worker crashed.
+- Writes table.json / table.3mf / table.glb over every built tile at the end.
+- Tiles whose inputs are unchanged are not rebuilt by the workers (see the build
+  manifest in tile_city_mesh.py); use --force to rebuild them anyway.
+
+Usage:
+  python scripts/tile_parallel.py --workers 4
+  python scripts/tile_parallel.py --workers 4 --tiles "0,1;2,3" --blender /opt/blender/blender
+
+Run from the project root, like tile_city_mesh.py (paths are relative to it).
+"""
+
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from tile_city_mesh import TILES_X, TILES_Y, OUTPUT_DIR, write_table_exports
+
+# 0) --- Setup (edit these as needed) -----------------------------------------
+
+TILE_SCRIPT   = Path(__file__).resolve().parent / "tile_city_mesh.py"
+BLENDER       = os.getenv("BLENDER", "blender")
+WORKERS       = os.cpu_count() or 1
+RETRIES       = 2                    # extra attempts per failed tile
+MANIFEST_PATH = OUTPUT_DIR / "manifest.json"
+
+
+# 1) --- Manifest --------------------------------------------------------------
+
+def tile_key(row, col):
+    return f"{row},{col}"
+
+def load_manifest(path):
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {"tiles": {}}
+
+def save_manifest(manifest, path):
+    manifest["updated"] = datetime.now().isoformat(timespec="seconds")
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    tmp.replace(path)   # atomic, so a crash never leaves a half-written manifest
+
+
+# 2) --- Workers ---------------------------------------------------------------
+
+def split_tiles(tiles, n):
+    """Round-robin so neighbouring (similarly dense) tiles land on different workers."""
+    chunks = [tiles[i::n] for i in range(n)]
+    return [c for c in chunks if c]
+
+def start_worker(blender, tiles, events, worker_id, force=False):
+    """Launch one headless Blender on a tile subset; its status lines are put on `events`."""
+    cmd = [
+        blender, "-b", "-P", str(TILE_SCRIPT), "--",
+        "--tiles", ";".join(f"{r},{c}" for r, c in tiles),
+    ] + (["--force"] if force else [])
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+
+    def pump():
+        for line in proc.stdout:
+            parts = line.strip().split(" ", 3)
+            if parts and parts[0] in ("TILE_OK", "TILE_EMPTY", "TILE_FAILED"):
+                events.put((worker_id, parts[0], int(parts[1]), int(parts[2]), parts[3] if len(parts) > 3 else ""))
+        events.put((worker_id, "EXIT", proc.wait(), None, None))
+
+    threading.Thread(target=pump, daemon=True).start()
+    return proc
+
+def run_round(blender, tiles, workers, manifest, manifest_path, progress, force=False):
+    """Run one pass over `tiles`. Returns the tiles that failed in this pass."""
+    events = queue.Queue()
+    chunks = split_tiles(tiles, workers)
+    pending = {i: set(chunk) for i, chunk in enumerate(chunks)}
+    for i, chunk in enumerate(chunks):
+        start_worker(blender, chunk, events, i, force)
+
+    failed = []
+    running = len(chunks)
+    while running:
+        worker_id, kind, row, col, detail = events.get()
+        if kind == "EXIT":
+            running -= 1
+            # Anything this worker never reported on was lost with the process
+            for r, c in sorted(pending[worker_id]):
+                failed.append((r, c))
+                entry = manifest["tiles"].setdefault(tile_key(r, c), {"row": r, "col": c, "attempts": 0})
+                entry.update(status="failed", error=f"worker exited with code {row}")
+                entry["attempts"] += 1
+            pending[worker_id].clear()
+            save_manifest(manifest, manifest_path)
+            continue
+
+        pending[worker_id].discard((row, col))
+        entry = manifest["tiles"].setdefault(tile_key(row, col), {"row": row, "col": col, "attempts": 0})
+        entry["attempts"] += 1
+        if kind == "TILE_OK":
+            entry.update(status="ok", path=detail, error=None)
+        elif kind == "TILE_EMPTY":
+            entry.update(status="empty", path=None, error=None)
+        else:
+            entry.update(status="failed", error=detail)
+            failed.append((row, col))
+        save_manifest(manifest, manifest_path)
+
+        progress["done"] += kind != "TILE_FAILED"
+        print(f"[{progress['done']}/{progress['total']}] tile row={row} col={col}: "
+              f"{kind[5:].lower()}{' - ' + detail if kind == 'TILE_FAILED' else ''} (worker {worker_id})")
+    return failed
+
+
+# 3) --- Main ------------------------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build tiles with parallel headless Blender workers.")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="number of Blender processes")
+    parser.add_argument("--blender", default=BLENDER, help="Blender executable (or set $BLENDER)")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="extra attempts for failed tiles")
+    parser.add_argument("--tiles", help='row,col pairs separated by ";" (default: the full grid)')
+    parser.add_argument("--manifest", type=Path, default=MANIFEST_PATH)
+    parser.add_argument("--force", action="store_true", help="rebuild tiles even if their inputs are unchanged")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(args.manifest)
+
+    if args.tiles:
+        tiles = [tuple(int(v) for v in pair.split(",")) for pair in args.tiles.split(";") if pair.strip()]
+    else:
+        tiles = [(r, c) for r in range(TILES_Y) for c in range(TILES_X)]
+
+    progress = {"done": 0, "total": len(tiles)}
+    start = time.time()
+    for attempt in range(args.retries + 1):
+        if not tiles:
+            break
+        if attempt:
+            print(f"Retrying {len(tiles)} failed tile(s) (attempt {attempt + 1})…")
+        tiles = run_round(args.blender, tiles, max(1, args.workers), manifest, args.manifest, progress, args.force)
+
+    print(f"Done in {time.time() - start:.0f}s. Manifest: {args.manifest}")
+    write_table_exports()
+    if tiles:
+        print("Failed tiles: " + ", ".join(f"row={r} col={c}" for r, c in tiles))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
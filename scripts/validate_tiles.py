@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Check the exported tiles before they go to the printer, and rebuild the ones that fail.
+
+- Validates every tile in the build manifest (see tile_city_mesh.py) in a process pool:
+  watertight, no non-manifold edges, consistent winding, positive volume, a bounding
+  box that matches the tile's block, and enough material around each magnet pocket (floor, roof and side walls).
+- Writes the results to output/tiles/validation_report.json.
+- Rebuilds failed tiles with the fallback boolean solver (tile_city_mesh.py --fallback)
+  and checks them again.
+
+Usage:
+  python scripts/validate_tiles.py
+  python scripts/validate_tiles.py --tiles "0,1;2,3" --no-retry
+  python scripts/validate_tiles.py --blender /opt/blender/blender   # for tiles built in Blender
+
+Run from the project root, like tile_city_mesh.py (paths are relative to it).
+Requires trimesh and rtree.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import trimesh
+
+import tile_city_mesh as tiles
+from tile_city_mesh import OUTPUT_DIR
+
+# 0) --- Setup (edit these as needed) -----------------------------------------
+
+TILE_SCRIPT        = Path(__file__).resolve().parent / "tile_city_mesh.py"
+BLENDER            = os.getenv("BLENDER", "blender")
+WORKERS            = os.cpu_count() or 1
+REPORT_PATH        = OUTPUT_DIR / "validation_report.json"
+MIN_WALL_THICKNESS = 0.001     # 1 mm of material left around each magnet pocket
+BBOX_TOL           = 1e-4      # 0.1 mm
+WALL_SAMPLES       = 12        # rays per ring around each magnet
+
+
+# 1) --- Checks ----------------------------------------------------------------
+
+def edge_counts(mesh):
+    """How many faces use each undirected edge."""
+    _, counts = np.unique(mesh.edges_sorted, axis=0, return_counts=True)
+    return counts
+
+def magnet_wall_thickness(mesh, block):
+    """
+    Thinnest material found around any magnet pocket.
+
+    Rays go up from below the tile through rings of points covering the pocket
+    and its safety margin; the first run of material along each ray is the tile
+    floor beside the pocket, or the roof above it. Rays also go sideways from
+    the middle of each pocket towards its corner of the tile; the first run of
+    material along those is the side wall between the pocket and the tile edges
+    (the one MAGNET_SAFETY is meant to keep).
+    """
+    x, y, z = block["center"]
+    radii = np.linspace(0.0, tiles.MAGNET_RADIUS + tiles.MAGNET_SAFETY, 4)
+    angles = np.linspace(0.0, 2 * np.pi, WALL_SAMPLES, endpoint=False)
+    ring = np.stack([np.outer(radii, np.cos(angles)).ravel(), np.outer(radii, np.sin(angles)).ravel()], axis=1)
+    fan = np.linspace(0.0, np.pi / 2, WALL_SAMPLES)
+
+    thinnest = np.inf
+    for magnet in tiles.magnet_layout(x, y, z, block["height"]):
+        cx, cy, _ = magnet["hole_center"]
+        origins = np.column_stack([ring + (cx, cy), np.full(len(ring), block["bottom"] - 0.001)])
+        directions = np.tile((0.0, 0.0, 1.0), (len(origins), 1))
+        hits, ray, _ = mesh.ray.intersects_location(origins, directions, multiple_hits=True)
+        for i in range(len(origins)):
+            z_hits = np.unique(np.round(hits[ray == i, 2], 7))
+            if len(z_hits) >= 2:
+                thinnest = min(thinnest, z_hits[1] - z_hits[0])
+
+        # Side walls, from inside the pocket out through the corner quadrant
+        sx, sy = np.sign(cx - x), np.sign(cy - y)
+        directions = np.column_stack([sx * np.cos(fan), sy * np.sin(fan), np.zeros(len(fan))])
+        origins = np.tile((cx, cy, block["bottom"] + tiles.MAGNET_HEIGHT / 2), (len(fan), 1))
+        hits, ray, _ = mesh.ray.intersects_location(origins, directions, multiple_hits=True)
+        for i in range(len(origins)):
+            distances = np.unique(np.round(np.linalg.norm(hits[ray == i] - origins[i], axis=1), 7))
+            if len(distances) >= 2:
+                thinnest = min(thinnest, distances[1] - distances[0])
+    return float(thinnest)
+
+def validate_tile(row, col, entry):
+    """Process-pool worker: check one exported tile. Returns its report entry."""
+    result = {"row": row, "col": col, "path": entry.get("path"), "solver": entry.get("solver"), "errors": []}
+    errors = result["errors"]
+    path = Path(entry.get("path") or "")
+    if not path.is_file():
+        errors.append("tile file is missing")
+        result["ok"] = False
+        return result
+    try:
+        mesh = trimesh.load(str(path), force="mesh")
+    except Exception as e:
+        errors.append(f"cannot read tile: {e}")
+        result["ok"] = False
+        return result
+
+    counts = edge_counts(mesh)
+    bounds = mesh.bounds if len(mesh.faces) else np.zeros((2, 3))
+    result.update(
+        faces=int(len(mesh.faces)),
+        boundary_edges=int((counts == 1).sum()),
+        non_manifold_edges=int((counts > 2).sum()),
+        winding_consistent=bool(mesh.is_winding_consistent),
+        volume=float(mesh.volume) if len(mesh.faces) else 0.0,
+        bounds=bounds.tolist(),
+    )
+    if not len(mesh.faces):
+        errors.append("tile is empty")
+    if result["boundary_edges"]:
+        errors.append(f"not watertight ({result['boundary_edges']} open edges)")
+    if result["non_manifold_edges"]:
+        errors.append(f"{result['non_manifold_edges']} non-manifold edges")
+    if not result["winding_consistent"]:
+        errors.append("inconsistent face winding")
+
+    block = entry.get("block")
+    if block:
+        min_x, max_x, min_y, max_y = tiles.tile_aabb(row, col)
+        expected = np.array([[min_x, min_y, block["bottom"]], [max_x, max_y, block["top"]]])
+        # The top may sit below the block where the city cut away everything above it
+        off = np.abs(bounds - expected)
+        off[1, 2] = max(bounds[1, 2] - expected[1, 2], 0.0)
+        if (off > BBOX_TOL).any():
+            errors.append(f"bounding box is off the tile block by {off.max() * 1000:.2f} mm")
+        box_volume = (max_x - min_x) * (max_y - min_y) * block["height"]
+        if not 0 < result["volume"] <= box_volume * (1 + 1e-6):
+            errors.append(f"volume {result['volume']:.3e} m³ outside (0, {box_volume:.3e}]")
+        if not errors:
+            result["min_magnet_wall"] = magnet_wall_thickness(mesh, block)
+            if result["min_magnet_wall"] < MIN_WALL_THICKNESS:
+                errors.append(f"only {result['min_magnet_wall'] * 1000:.2f} mm of material around a magnet pocket")
+    else:
+        errors.append("no block in the build manifest; rebuild the tile to record it")
+
+    result["ok"] = not errors
+    return result
+
+def validate(entries, workers):
+    """Check (row, col) -> manifest entry in parallel; returns the report entries."""
+    keys = sorted(entries)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(validate_tile, *zip(*[(r, c, entries[(r, c)]) for r, c in keys])))
+
+
+# 2) --- Retry with the fallback solver ----------------------------------------
+
+def rebuild_fallback(failed, manifest, blender):
+    """Rebuild failed tiles with the fallback solver of the backend that built them."""
+    by_backend = {}
+    for row, col in failed:
+        solver = (manifest["tiles"].get(f"{row},{col}") or {}).get("solver")
+        backend = "trimesh" if solver in ("manifold", "blender") else "blender"
+        by_backend.setdefault(backend, []).append((row, col))
+
+    for backend, todo in by_backend.items():
+        args = ["--tiles", ";".join(f"{r},{c}" for r, c in todo), "--force", "--fallback"]
+        if backend == "trimesh":
+            cmd = [sys.executable, str(TILE_SCRIPT), "--backend", "trimesh"] + args
+        else:
+            cmd = [blender, "-b", "-P", str(TILE_SCRIPT), "--"] + args
+        print(f"Rebuilding {len(todo)} tile(s) with the fallback solver ({backend})…")
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        for line in proc.stdout.splitlines():
+            if line.startswith(("TILE_OK", "TILE_FAILED", "TILE_EMPTY")):
+                print(f"  {line}")
+
+
+# 3) --- Main ------------------------------------------------------------------
+
+def load_report(path):
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {"tiles": {}}
+
+def save_report(report, path):
+    report["updated"] = datetime.now().isoformat(timespec="seconds")
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    tmp.replace(path)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Validate exported tiles and rebuild the ones that fail.")
+    parser.add_argument("--tiles", help='row,col pairs separated by ";" (default: every tile in the build manifest)')
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--report", type=Path, default=REPORT_PATH)
+    parser.add_argument("--no-retry", action="store_true", help="only report, do not rebuild failed tiles")
+    parser.add_argument("--blender", default=BLENDER, help="Blender executable for tiles built in Blender")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    manifest = tiles.load_build_manifest()
+    if args.tiles:
+        keys = [tuple(int(v) for v in pair.split(",")) for pair in args.tiles.split(";") if pair.strip()]
+    else:
+        keys = [tuple(int(v) for v in key.split(",")) for key in manifest["tiles"]]
+    if not keys:
+        print(f"No tiles to validate in {tiles.BUILD_MANIFEST_PATH}")
+        return
+
+    start = time.time()
+    entries = {k: manifest["tiles"].get(f"{k[0]},{k[1]}", {}) for k in keys}
+    results = {(r["row"], r["col"]): dict(r, attempts=1) for r in validate(entries, max(1, args.workers))}
+
+    # A thin magnet wall is a design limit, not a solver failure, so it is not retried
+    failed = [k for k, r in results.items() if not r["ok"] and "min_magnet_wall" not in r]
+    if failed and not args.no_retry:
+        rebuild_fallback(failed, manifest, args.blender)
+        tiles.write_table_exports()
+        manifest = tiles.load_build_manifest()
+        for r in validate({k: manifest["tiles"].get(f"{k[0]},{k[1]}", {}) for k in failed}, max(1, args.workers)):
+            results[(r["row"], r["col"])] = dict(r, attempts=2, first_errors=results[(r["row"], r["col"])]["errors"])
+
+    failed = sorted(k for k, r in results.items() if not r["ok"])
+    # With --tiles, the other tiles keep their earlier results
+    report = load_report(args.report) if args.tiles else {"tiles": {}}
+    report["tiles"].update({f"{r},{c}": results[(r, c)] for r, c in sorted(results)})
+    report["failed"] = sorted(key for key, r in report["tiles"].items() if not r["ok"])
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    save_report(report, args.report)
+
+    for (row, col), r in sorted(results.items()):
+        status = "ok" if r["ok"] else "FAILED - " + "; ".join(r["errors"])
+        retried = " (after a fallback-solver retry)" if r["attempts"] > 1 else ""
+        print(f"tile row={row} col={col}: {status}{retried}")
+    print(f"Validated {len(results)} tile(s) in {time.time() - start:.0f}s. Report: {args.report}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()